@@ -1,5 +1,6 @@
 """Pypetkit: A Python library for interfacing with PetKit"""
 
+from .changes import EntityChange
 from .client import PetKitClient
 from .command import (
     DeviceAction,
@@ -46,6 +47,7 @@ from .const import (
 from .containers import IotInfo, LiveFeed, NewIotInfo, Pet, RegionServerGroup
 from .exceptions import (
     PetkitAuthenticationUnregisteredEmailError,
+    PetkitMqttError,
     PetkitRegionalServerNotFoundError,
     PetkitSessionError,
     PetkitSessionExpiredError,
@@ -61,7 +63,14 @@ from .litter_container import (
     WorkState,
 )
 from .media import DownloadDecryptMedia, MediaCloud, MediaFile, MediaManager
+from .media_index import MediaIndex
+from .media_retention import MediaRetention, RetentionLimits
+from .media_scheduler import DownloadProgress, MediaDownloadScheduler
+from .mqtt import PetkitEventStream
 from .purifier_container import Purifier
+from .roster import RosterDiff
+from .scheduler import PollScheduler
+from .session_store import CallbackSessionStore, FileSessionStore, SessionStore
 from .water_fountain_container import WaterFountain
 
 __version__ = "1.28.0"
@@ -94,11 +103,15 @@ __all__ = [
     "W5",
     "W7H",
     "BluetoothState",
+    "CallbackSessionStore",
     "DeviceAction",
     "DeviceCommand",
     "DownloadDecryptMedia",
+    "DownloadProgress",
+    "EntityChange",
     "Feeder",
     "FeederCommand",
+    "FileSessionStore",
     "FountainActionWIFI",
     "FountainCommand",
     "IotInfo",
@@ -108,8 +121,11 @@ __all__ = [
     "LitterRecord",
     "LiveFeed",
     "MediaCloud",
+    "MediaDownloadScheduler",
     "MediaFile",
+    "MediaIndex",
     "MediaManager",
+    "MediaRetention",
     "MediaType",
     "NewIotInfo",
     "PackageInfoResult",
@@ -118,16 +134,22 @@ __all__ = [
     "PetCommand",
     "PetKitClient",
     "PetkitAuthenticationUnregisteredEmailError",
+    "PetkitEventStream",
+    "PetkitMqttError",
     "PetkitRegionalServerNotFoundError",
     "PetkitSessionError",
     "PetkitSessionExpiredError",
     "PetkitTimeoutError",
+    "PollScheduler",
     "PurMode",
     "Purifier",
     "PypetkitError",
     "RecordType",
     "RecordsItems",
     "RegionServerGroup",
+    "RetentionLimits",
+    "RosterDiff",
+    "SessionStore",
     "WaterFountain",
     "WorkState",
 ]
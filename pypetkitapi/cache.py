@@ -0,0 +1,103 @@
+"""Persistent cache of the PetKit region server list."""
+
+import json
+import logging
+from pathlib import Path
+import time
+from typing import Any
+
+import aiofiles
+import aiofiles.os
+from pydantic import ValidationError
+
+from pypetkitapi.containers import RegionInfo
+
+_LOGGER = logging.getLogger(__name__)
+
+REGION_CACHE_FILE = "region_servers.json"
+
+
+class RegionServerCache:
+    """Cache of /v1/regionservers, kept in memory and optionally on disk.
+
+    Entries are indexed by lowercase country id and name, so resolving the
+    gateway of a region is a dict lookup. Once ``ttl`` has elapsed the list
+    is revalidated with the ETag returned by the server.
+    """
+
+    def __init__(self, cache_dir: Path | str | None, ttl: int) -> None:
+        """Initialize the cache.
+        :param cache_dir: Directory of the cache file, None to keep it in memory only.
+        :param ttl: Seconds during which the list is used without asking the server.
+        """
+        self.path = Path(cache_dir) / REGION_CACHE_FILE if cache_dir else None
+        self.ttl = ttl
+        self.etag: str | None = None
+        self.fetched_at = 0.0
+        self.entries: list[dict[str, Any]] = []
+        self._index: dict[str, RegionInfo] = {}
+        self._loaded = False
+
+    def is_fresh(self) -> bool:
+        """Return True if the list can be used without revalidation."""
+        return bool(self._index) and time.time() - self.fetched_at < self.ttl
+
+    def find(self, region: str) -> RegionInfo | None:
+        """Return the server of a region (country id or name, any case)."""
+        return self._index.get(region.lower())
+
+    def payload(self) -> dict[str, Any]:
+        """Return the cached list in the shape of the API response."""
+        return {"list": self.entries}
+
+    def update(self, payload: dict[str, Any], etag: str | None) -> None:
+        """Replace the cached list with a new API response."""
+        self._set_entries(payload.get("list", []))
+        self.etag = etag
+        self.fetched_at = time.time()
+
+    def touch(self) -> None:
+        """Mark the cached list as confirmed by the server (HTTP 304)."""
+        self.fetched_at = time.time()
+
+    def _set_entries(self, entries: list[dict[str, Any]]) -> None:
+        """Set the raw entries and rebuild the lookup index."""
+        index: dict[str, RegionInfo] = {}
+        for entry in entries:
+            info = RegionInfo(**entry)
+            index.setdefault(info.id.lower(), info)
+            index.setdefault(info.name.lower(), info)
+        self.entries = entries
+        self._index = index
+
+    async def load(self) -> None:
+        """Load the cache file once, ignoring a missing or corrupted file."""
+        if self._loaded or self.path is None:
+            return
+        self._loaded = True
+        if not await aiofiles.os.path.exists(self.path):
+            return
+        try:
+            async with aiofiles.open(self.path, encoding="utf-8") as file:
+                data = json.loads(await file.read())
+            self._set_entries(data.get("list", []))
+            self.etag = data.get("etag")
+            self.fetched_at = float(data.get("fetched_at", 0))
+        except (OSError, ValueError, TypeError, AttributeError, ValidationError) as e:
+            _LOGGER.warning("Ignoring unreadable region cache %s: %s", self.path, e)
+            self._set_entries([])
+            self.fetched_at = 0.0
+            return
+        _LOGGER.debug("Loaded %s region servers from %s", len(self.entries), self.path)
+
+    async def save(self) -> None:
+        """Write the cache file."""
+        if self.path is None:
+            return
+        data = {"fetched_at": self.fetched_at, "etag": self.etag, "list": self.entries}
+        try:
+            await aiofiles.os.makedirs(self.path.parent, exist_ok=True)
+            async with aiofiles.open(self.path, "w", encoding="utf-8") as file:
+                await file.write(json.dumps(data))
+        except OSError as e:
+            _LOGGER.warning("Failed to write region cache %s: %s", self.path, e)
@@ -0,0 +1,85 @@
+"""Change detection on the entities of the PetKit client."""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+from typing import Any
+
+from pydantic import BaseModel
+
+from pypetkitapi.utils import payload_digest
+
+
+@dataclass(frozen=True)
+class EntityChange:
+    """Dataclass EntityChange.
+    A value of an entity which changed since the previous poll.
+    """
+
+    entity_id: int
+    path: str  # Dotted field path, e.g. "state.feed_state"
+    old: Any
+    new: Any
+
+
+def _dump(value: Any) -> Any:
+    """Return a JSON-like copy of a field value."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, list):
+        return [_dump(item) for item in value]
+    return value
+
+
+def _diff_values(
+    entity_id: int, path: str, old: Any, new: Any, changes: list[EntityChange]
+) -> None:
+    """Append the changes between two dumped values, down to the leaf keys."""
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key in old.keys() | new.keys():
+            if old.get(key) != new.get(key):
+                _diff_values(
+                    entity_id, f"{path}.{key}", old.get(key), new.get(key), changes
+                )
+    else:
+        changes.append(EntityChange(entity_id, path, old, new))
+
+
+class ChangeTracker:
+    """Snapshots of the entity fields, to report what changed between polls.
+
+    Each top level field is stored with the digest of its dumped value, so an
+    unchanged field is skipped after a digest comparison. Only changed fields
+    are walked to find the changed leaf values.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        self._snapshots: dict[int, dict[str, tuple[str, Any]]] = {}
+
+    def diff(
+        self, entity_id: int, entity: BaseModel, fields: Iterable[str]
+    ) -> list[EntityChange]:
+        """Update the snapshot of an entity and return the changed values.
+        :param entity_id: ID of the entity.
+        :param entity: Entity.
+        :param fields: Names of the fields to compare.
+        :return: Changed values, with their dotted path.
+        """
+        snapshot = self._snapshots.setdefault(entity_id, {})
+        changes: list[EntityChange] = []
+        for name in fields:
+            value = _dump(getattr(entity, name, None))
+            digest = payload_digest(value)
+            previous = snapshot.get(name)
+            if previous is not None and previous[0] == digest:
+                continue
+            snapshot[name] = (digest, value)
+            old = previous[1] if previous is not None else None
+            if old is None and value is None:
+                continue
+            _diff_values(entity_id, name, old, value, changes)
+        return changes
+
+    def forget(self, entity_id: int) -> None:
+        """Drop the snapshot of a removed entity."""
+        self._snapshots.pop(entity_id, None)
@@ -1,13 +1,18 @@
 """Pypetkit Client: A Python library for interfacing with PetKit"""
 
 import asyncio
+from collections import defaultdict
+from collections.abc import Callable, Iterable
 from datetime import datetime, timedelta
 from enum import StrEnum
 import hashlib
-from http import HTTPMethod
+from http import HTTPMethod, HTTPStatus
 import logging
+from pathlib import Path
 import statistics
+import time
 from typing import Any
+from urllib.parse import urlparse
 
 import aiohttp
 from aiohttp import ContentTypeError
@@ -22,10 +27,19 @@ from tenacity import (
 
 from pypetkitapi import utils
 from pypetkitapi.bluetooth import BluetoothManager
+from pypetkitapi.cache import RegionServerCache
+from pypetkitapi.changes import ChangeTracker, EntityChange
 from pypetkitapi.command import ACTIONS_MAP
 from pypetkitapi.const import (
+    ADAPTIVE_POLL,
+    CACHE_DIR,
     CLIENT_NFO,
     DEFAULT_COUNTRY,
+    DEFAULT_MAX_CONCURRENT_DEVICES,
+    DEFAULT_MAX_CONCURRENT_REQUESTS,
+    DEFAULT_MAX_REQUESTS_PER_HOST,
+    DEFAULT_REGION_CACHE_TTL,
+    DEFAULT_SESSION_REFRESH_RATIO,
     DEFAULT_TZ,
     DEVICE_DATA,
     DEVICE_RECORDS,
@@ -41,12 +55,24 @@ from pypetkitapi.const import (
     LITTER_WITH_CAMERA,
     LIVE_DATA,
     LOGIN_DATA,
+    MAX_CONCURRENT_DEVICES,
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_HOST,
     PACKAGE_INFO,
     PACKAGE_LIST,
     PET,
+    PIPELINE_POLL,
+    POLL_INTERVALS,
     PTK_DBG,
+    REGION_CACHE_TTL,
     REGION_SERVER_LABELS,
+    REQUESTS_PER_SECOND,
     RES_KEY,
+    ROSTER_REFRESH_INTERVAL,
+    SESSION_REFRESH_RATIO,
+    SESSION_REFRESH_RETRY_SECS,
+    SESSION_STORE,
+    SESSION_STORE_VERSION,
     T3,
     T4,
     T5,
@@ -81,6 +107,7 @@ from pypetkitapi.exceptions import (
     PypetkitError,
 )
 from pypetkitapi.feeder_container import Feeder, FeederRecord, SoundList
+from pypetkitapi.limiter import RequestLimiter
 from pypetkitapi.litter_container import (
     Litter,
     LitterRecord,
@@ -90,11 +117,26 @@ from pypetkitapi.litter_container import (
     PetOutGraph,
 )
 from pypetkitapi.purifier_container import Purifier
+from pypetkitapi.roster import PET_ROSTER_FIELDS, RosterDiff, diff_roster
+from pypetkitapi.scheduler import PollScheduler
+from pypetkitapi.session_store import SessionStore
 from pypetkitapi.utils import get_timezone_offset
 from pypetkitapi.water_fountain_container import WaterFountain, WaterFountainRecord
 
 data_handlers: dict[str, Any] = {}
 
+# Entity fields filled by other fetches than the device data itself
+_SUB_DATA_FIELDS = (
+    "device_records",
+    "device_stats",
+    "device_pet_graph_out",
+    "live_feed",
+    "package_info",
+    "package_list",
+    "medias",
+    "sound_list",
+)
+
 
 def data_handler(data_type):
     """Register a data handler for a specific data type."""
@@ -148,6 +190,34 @@ def _group_region_servers(payload: dict) -> list[RegionServerGroup]:
     return groups
 
 
+async def _refresh_region_servers(req: "PrepReq", cache: RegionServerCache) -> None:
+    """Make sure the region server cache is loaded and up to date.
+
+    A fresh cache is used as is. A stale one is revalidated with its ETag, and
+    kept if the server cannot be reached.
+    """
+    await cache.load()
+    if cache.is_fresh():
+        return
+    try:
+        response, etag = await req.request_if_none_match(
+            url=PetkitEndpoint.REGION_SERVERS,
+            etag=cache.etag if cache.entries else None,
+        )
+    except PypetkitError as e:
+        if not cache.entries:
+            raise
+        _LOGGER.warning("Cannot refresh region servers, using cached list: %s", e)
+        return
+
+    if response is None:
+        _LOGGER.debug("Region server list not modified")
+        cache.touch()
+    else:
+        cache.update(response, etag)
+    await cache.save()
+
+
 class PetKitClient:
     """Petkit Client"""
 
@@ -172,11 +242,33 @@ class PetKitClient:
         self.region = region.lower()
         self.timezone = timezone
         self._session: SessionInfo | None = None
+        self._session_lock = asyncio.Lock()
+        self._session_refresh_ratio: float | None = kwargs.get(
+            SESSION_REFRESH_RATIO, DEFAULT_SESSION_REFRESH_RATIO
+        )
+        self._refresh_task: asyncio.Task | None = None
+        self._refresh_retry_at = 0.0
+        self._session_store: SessionStore | None = kwargs.get(SESSION_STORE)
+        self._session_store_loaded = False
         self.account_data: list[AccountData] = []
         self.petkit_entities: dict[
             int, Feeder | Litter | WaterFountain | Purifier | Pet
         ] = {}
         self.available_device_models: list[DeviceModelInfo] = []
+        self._roster_refresh_interval: float | None = kwargs.get(
+            ROSTER_REFRESH_INTERVAL
+        )
+        self._roster_refresh_at = 0.0
+        self._roster_task: asyncio.Task | None = None
+        self._roster_lock = asyncio.Lock()
+        self._roster_listeners: list[Callable[[RosterDiff], None]] = []
+        self._change_tracker = ChangeTracker()
+        self._change_listeners: list[Callable[[list[EntityChange]], None]] = []
+        self._pending_changes: list[EntityChange] = []
+        self._region_cache = RegionServerCache(
+            kwargs.get(CACHE_DIR),
+            kwargs.get(REGION_CACHE_TTL, DEFAULT_REGION_CACHE_TTL),
+        )
         self.req = PrepReq(
             base_url=PetkitDomain.PASSPORT_PETKIT,
             session=session,
@@ -185,6 +277,15 @@ class PetKitClient:
         )
         self.bluetooth_manager = BluetoothManager(self, **kwargs)
         self._debug_test = kwargs.get(PTK_DBG, False)
+        self._pipeline_poll = kwargs.get(PIPELINE_POLL, True)
+        self.poll_scheduler: PollScheduler | None = (
+            PollScheduler(kwargs.get(POLL_INTERVALS))
+            if kwargs.get(ADAPTIVE_POLL, False)
+            else None
+        )
+        self._device_semaphore = asyncio.Semaphore(
+            kwargs.get(MAX_CONCURRENT_DEVICES, DEFAULT_MAX_CONCURRENT_DEVICES)
+        )
         from pypetkitapi import MediaManager
 
         from . import __version__
@@ -212,26 +313,21 @@ class PetKitClient:
             _LOGGER.debug("Using specific China server: %s", PetkitDomain.CHINA_SRV)
             return
 
-        response = await self.req.request(
-            method=HTTPMethod.GET,
-            url=PetkitEndpoint.REGION_SERVERS,
-        )
+        await _refresh_region_servers(self.req, self._region_cache)
 
-        # Filter the servers by region
-        for region in response.get("list", []):
-            server = RegionInfo(**region)
-            if server.name.lower() == self.region or server.id.lower() == self.region:
-                self.region = server.id.lower()
-                self.req.base_url = server.gateway
-                _LOGGER.debug("Found matching server: %s", server)
-                return
-        raise PetkitRegionalServerNotFoundError(self.region)
+        server = self._region_cache.find(self.region)
+        if server is None:
+            raise PetkitRegionalServerNotFoundError(self.region)
+        self.region = server.id.lower()
+        self.req.base_url = server.gateway
+        _LOGGER.debug("Found matching server: %s", server)
 
     @classmethod
     async def fetch_region_servers(
         cls,
         session: aiohttp.ClientSession,
         timezone: str = DEFAULT_TZ,
+        cache_dir: Path | str | None = None,
     ) -> list[RegionServerGroup]:
         """Return PetKit's regional gateways grouped with friendly labels.
 
@@ -243,6 +339,10 @@ class PetKitClient:
         ``representative_country`` that callers can pass back as the
         ``region`` argument of :class:`PetKitClient`.
 
+        With ``cache_dir``, the list is shared with the on-disk cache used
+        by :class:`PetKitClient` and a cached copy is returned when the
+        server cannot be reached.
+
         Network failures raise the same exceptions as any other
         :class:`PetKitClient` call (e.g. :class:`PetkitTimeoutError`); the
         caller decides whether to surface the error or fall back to a
@@ -253,11 +353,9 @@ class PetKitClient:
             session=session,
             timezone=timezone,
         )
-        response = await req.request(
-            method=HTTPMethod.GET,
-            url=PetkitEndpoint.REGION_SERVERS,
-        )
-        return _group_region_servers(response)
+        cache = RegionServerCache(cache_dir, DEFAULT_REGION_CACHE_TTL)
+        await _refresh_region_servers(req, cache)
+        return _group_region_servers(cache.payload())
 
     async def request_login_code(self) -> bool:
         """Request a login code to be sent to the user's email."""
@@ -276,6 +374,13 @@ class PetKitClient:
         """Login to the PetKit service and retrieve the appropriate server.
         :param valid_code: The valid code sent to the user's email.
         """
+        async with self._session_lock:
+            await self._login(valid_code)
+
+    async def _login(self, valid_code: str | None = None) -> None:
+        """Login to the PetKit service, the caller must hold the session lock.
+        :param valid_code: The valid code sent to the user's email.
+        """
         # Retrieve the list of servers
         self._session = None
         await self._get_base_url()
@@ -310,43 +415,154 @@ class PetKitClient:
         self._session = SessionInfo(**session_data)
         expiration_date = datetime.now() + timedelta(seconds=self._session.expires_in)
         _LOGGER.debug("Login successful (token expiration %s)", expiration_date)
+        await self._save_session_state()
 
     async def refresh_session(self) -> None:
         """Refresh the session."""
+        async with self._session_lock:
+            await self._refresh_session()
+
+    async def _refresh_session(self) -> None:
+        """Refresh the session, the caller must hold the session lock."""
+        if self._session is None or self._session_expired():
+            _LOGGER.debug("No valid token to refresh, logging in")
+            await self._login()
+            return
+
         _LOGGER.debug("Refreshing session")
         response = await self.req.request(
             method=HTTPMethod.POST,
             url=PetkitEndpoint.REFRESH_SESSION,
             data=LOGIN_DATA,
-            headers=await self.get_session_id(),
+            headers=self._session_headers(),
         )
         session_data = response["session"]
         self._session = SessionInfo(**session_data)
-        self._session.refreshed_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")
+        self._session.mark_refreshed()
         _LOGGER.debug("Session refreshed at %s", self._session.refreshed_at)
+        await self._save_session_state()
 
-    async def validate_session(self) -> None:
-        """Check if the session is still valid and refresh or re-login if necessary."""
+    def _session_expired(self) -> bool:
+        """Return True if the current session token has expired."""
+        return self._session is None or self._session.is_expired()
+
+    def _session_refresh_due(self) -> bool:
+        """Return True if the session reached the proactive refresh threshold."""
+        if self._session is None or not self._session_refresh_ratio:
+            return False
+        return time.monotonic() >= self._session.refresh_at(self._session_refresh_ratio)
+
+    def _session_headers(self) -> dict:
+        """Return the session headers of the current session."""
         if self._session is None:
-            _LOGGER.debug("No token, logging in")
-            await self.login()
+            raise PetkitSessionError("No session ID available")
+        return {"F-Session": self._session.id, "X-Session": self._session.id}
+
+    async def validate_session(self) -> None:
+        """Check if the session is still valid and refresh or re-login if necessary.
+
+        Concurrent callers share a single login: they wait on the session lock
+        and re-check the session once they get it. A session past the
+        ``session_refresh_ratio`` of its lifetime is refreshed in the background
+        so that callers never wait for it.
+        """
+        if self._session is not None and not self._session_expired():
+            if self._session_refresh_due():
+                self._schedule_session_refresh()
             return
 
-        created = datetime.strptime(self._session.created_at, "%Y-%m-%dT%H:%M:%S.%f%z")
-        is_expired = datetime.now(tz=created.tzinfo) - created >= timedelta(
-            seconds=self._session.expires_in
-        )
+        async with self._session_lock:
+            await self._load_session_state()
+            # Another caller may have logged in while we were waiting for the lock
+            if self._session is None:
+                _LOGGER.debug("No token, logging in")
+                await self._login()
+            elif self._session_expired():
+                _LOGGER.debug("Token expired, re-logging in")
+                await self._login()
+
+    async def _save_session_state(self) -> None:
+        """Save the session, gateway and account data to the session store."""
+        if self._session_store is None or self._session is None:
+            return
+        data = {
+            "version": SESSION_STORE_VERSION,
+            "username": self.username,
+            "region": self.region,
+            "base_url": str(self.req.base_url),
+            "session": self._session.model_dump(by_alias=True),
+            "account_data": [
+                account.model_dump(by_alias=True) for account in self.account_data
+            ],
+        }
+        try:
+            await self._session_store.save(data)
+        except (OSError, TypeError, ValueError) as e:
+            _LOGGER.warning("Failed to save the session state: %s", e)
+
+    async def _load_session_state(self) -> None:
+        """Restore the session, gateway and account data from the session store.
+        Only done once, and only if the client has no session yet.
+        """
+        if self._session_store_loaded or self._session_store is None:
+            return
+        self._session_store_loaded = True
+        if self._session is not None:
+            return
+
+        try:
+            data = await self._session_store.load()
+            if not data:
+                return
+            if (
+                data.get("version") != SESSION_STORE_VERSION
+                or data.get("username") != self.username
+            ):
+                _LOGGER.debug("Stored session belongs to another account, ignored")
+                return
+            session = SessionInfo(**data["session"])
+            account_data = [AccountData(**a) for a in data.get("account_data", [])]
+        except (OSError, KeyError, TypeError, ValueError) as e:
+            _LOGGER.warning("Ignoring unreadable stored session: %s", e)
+            return
+
+        if session.is_expired():
+            _LOGGER.debug("Stored session has expired, a login is needed")
+            return
+
+        self._session = session
+        self.region = data.get("region", self.region)
+        self.req.base_url = data.get("base_url", self.req.base_url)
+        if account_data and not self.account_data:
+            self.account_data = account_data
+            self._register_pets()
+        _LOGGER.debug("Session restored from the session store")
+
+    def _schedule_session_refresh(self) -> None:
+        """Start a background session refresh, unless one is already running."""
+        if time.monotonic() < self._refresh_retry_at:
+            return
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._background_refresh())
 
-        if is_expired:
-            _LOGGER.debug("Token expired, re-logging in")
-            await self.login()
+    async def _background_refresh(self) -> None:
+        """Refresh the session ahead of its expiration."""
+        async with self._session_lock:
+            if not self._session_refresh_due() or self._session_expired():
+                return
+            try:
+                await self._refresh_session()
+            except (PypetkitError, aiohttp.ClientError, TimeoutError) as err:
+                self._refresh_retry_at = time.monotonic() + SESSION_REFRESH_RETRY_SECS
+                _LOGGER.warning(
+                    "Proactive session refresh failed, will login again on expiry: %s",
+                    err,
+                )
 
     async def get_session_id(self) -> dict:
         """Return the session ID."""
         await self.validate_session()
-        if self._session is None:
-            raise PetkitSessionError("No session ID available")
-        return {"F-Session": self._session.id, "X-Session": self._session.id}
+        return self._session_headers()
 
     async def get_iot_device_info(self) -> NewIotInfo:
         """Fetch IoT/MQTT connection information for the current account.
@@ -423,6 +639,13 @@ class PetKitClient:
                 f"Device with ID {device_id} not found, or has no device_nfo."
             )
         device_type = entity.device_nfo.device_type
+        cached = getattr(entity, "sound_list", None)
+        if (
+            self.poll_scheduler
+            and cached is not None
+            and not self.poll_scheduler.is_due(device_id, SoundList.__name__)
+        ):
+            return cached
         _LOGGER.debug(
             "Fetching sound list on demand for device %s (%s)", device_id, device_type
         )
@@ -432,6 +655,8 @@ class PetKitClient:
             params=SoundList.query_param(entity.device_nfo, entity),
             headers=await self.get_session_id(),
         )
+        if self.poll_scheduler:
+            self.poll_scheduler.record(device_id, SoundList.__name__, response)
 
         if not isinstance(response, list):
             _LOGGER.error("Unexpected response type %s for sound list", type(response))
@@ -568,16 +793,26 @@ class PetKitClient:
 
     async def _get_account_data(self) -> None:
         """Get the account data from the PetKit service."""
+        self.account_data = await self._fetch_account_data()
+        self._register_pets()
+        await self._update_pet_details()
+        self._roster_fetched()
+        await self._save_session_state()
+
+    async def _fetch_account_data(self) -> list[AccountData]:
+        """Fetch the groups of the account with their devices and pets.
+        :return: List of account data.
+        """
         _LOGGER.debug("Fetching account data")
         response = await self.req.request(
             method=HTTPMethod.GET,
             url=PetkitEndpoint.FAMILY_LIST,
             headers=await self.get_session_id(),
         )
-        self.account_data = [AccountData(**account) for account in response]
+        account_data = [AccountData(**account) for account in response]
 
         # Fetch shared devices for groups with empty device lists
-        for account in self.account_data:
+        for account in account_data:
             if not account.device_list:
                 shared_devices = await self._get_shared_devices(account)
                 if shared_devices:
@@ -590,7 +825,7 @@ class PetKitClient:
 
         await self.get_device_info()
 
-        for account in self.account_data:
+        for account in account_data:
             if account.device_list:
                 for device in account.device_list:
                     for model_info in self.available_device_models:
@@ -606,8 +841,161 @@ class PetKitClient:
                             )
                             device.modele_name = model_info.label_name.title()
                             break
+        return account_data
+
+    async def _update_pet_details(self) -> None:
+        """Fetch pet details and update pet information."""
+        pet_details_list = await self._get_pet_details()
+        for pet_details in pet_details_list:
+            pet_id = pet_details.id
+            if pet_id in self.petkit_entities:
+                self.petkit_entities[pet_id].pet_details = pet_details
+
+    async def refresh_roster(self) -> RosterDiff:
+        """Fetch the device and pet lists again and apply the differences.
+        Removed devices and pets are dropped from petkit_entities, added
+        devices are polled by the next get_devices_data call.
+        :return: Devices and pets added, removed or changed.
+        """
+        async with self._roster_lock:
+            account_data = await self._fetch_account_data()
+            diff = diff_roster(self.account_data, account_data)
+            for device in diff.removed_devices:
+                self.petkit_entities.pop(device.device_id, None)
+                self._change_tracker.forget(device.device_id)
+            for pet in diff.removed_pets:
+                self.petkit_entities.pop(pet.pet_id, None)
+                self._change_tracker.forget(pet.pet_id)
+            for device in diff.changed_devices:
+                entity = self.petkit_entities.get(device.device_id)
+                if entity is not None:
+                    entity.device_nfo = device
+            self._keep_pet_entities(account_data)
+            self.account_data = account_data
+            self._register_pets()
+            await self._update_pet_details()
+            self._roster_fetched()
+            if diff:
+                await self._save_session_state()
+
+        if diff:
+            _LOGGER.info(
+                "Roster changed: %d device(s) added, %d removed, %d changed, "
+                "%d pet(s) added, %d removed, %d changed",
+                len(diff.added_devices),
+                len(diff.removed_devices),
+                len(diff.changed_devices),
+                len(diff.added_pets),
+                len(diff.removed_pets),
+                len(diff.changed_pets),
+            )
+            for listener in list(self._roster_listeners):
+                try:
+                    listener(diff)
+                except Exception:
+                    _LOGGER.exception("Error in roster listener %s", listener)
+        return diff
+
+    def _keep_pet_entities(self, account_data: list[AccountData]) -> None:
+        """Reuse the known Pet objects, so their stats survive a roster refresh."""
+        for account in account_data:
+            for index, pet in enumerate(account.pet_list or []):
+                current = self.petkit_entities.get(pet.pet_id)
+                if not isinstance(current, Pet):
+                    continue
+                for name, value in pet.model_dump(
+                    include=PET_ROSTER_FIELDS | {"name"}
+                ).items():
+                    setattr(current, name, value)
+                account.pet_list[index] = current  # type: ignore[index]
+
+    def add_roster_listener(
+        self, callback: Callable[[RosterDiff], None]
+    ) -> Callable[[], None]:
+        """Call ``callback`` with the differences each time the roster changes.
+        :param callback: Function receiving a RosterDiff.
+        :return: Function removing the listener.
+        """
+        self._roster_listeners.append(callback)
+
+        def remove_listener() -> None:
+            if callback in self._roster_listeners:
+                self._roster_listeners.remove(callback)
+
+        return remove_listener
+
+    def subscribe_changes(
+        self, callback: Callable[[list[EntityChange]], None]
+    ) -> Callable[[], None]:
+        """Call ``callback`` with the values changed by each poll.
+        :param callback: Function receiving the list of EntityChange.
+        :return: Function removing the subscription.
+        """
+        self._change_listeners.append(callback)
+
+        def unsubscribe() -> None:
+            if callback in self._change_listeners:
+                self._change_listeners.remove(callback)
+
+        return unsubscribe
+
+    def _track_changes(self, entity_id: int, fields: Iterable[str]) -> None:
+        """Queue the changed values of an entity, if anyone listens to them."""
+        entity = self.petkit_entities.get(entity_id)
+        if not self._change_listeners or entity is None:
+            return
+        self._pending_changes.extend(
+            self._change_tracker.diff(entity_id, entity, fields)
+        )
+
+    def _track_pet_changes(self) -> None:
+        """Queue the changed values of the pets, once their stats are updated.
+        The stats of a pet are fed by several devices, so they are compared
+        once per poll rather than after each device.
+        """
+        if not self._change_listeners:
+            return
+        for entity_id, entity in self.petkit_entities.items():
+            if isinstance(entity, Pet):
+                self._track_changes(entity_id, type(entity).model_fields)
+
+    def _emit_changes(self) -> None:
+        """Send the queued changes to the subscribers."""
+        if not self._pending_changes:
+            return
+        changes, self._pending_changes = self._pending_changes, []
+        for listener in list(self._change_listeners):
+            try:
+                listener(changes)
+            except Exception:
+                _LOGGER.exception("Error in change listener %s", listener)
+
+    def _roster_fetched(self) -> None:
+        """Plan the next background roster refresh."""
+        if self._roster_refresh_interval:
+            self._roster_refresh_at = time.monotonic() + self._roster_refresh_interval
 
-        # Add pets to device_list
+    def _schedule_roster_refresh(self) -> None:
+        """Start a background roster refresh if one is due."""
+        if (
+            not self._roster_refresh_interval
+            or time.monotonic() < self._roster_refresh_at
+        ):
+            return
+        if self._roster_task is None or self._roster_task.done():
+            # Failures are retried after a full interval, not on every poll
+            self._roster_fetched()
+            self._roster_task = asyncio.create_task(self._background_roster_refresh())
+
+    async def _background_roster_refresh(self) -> None:
+        """Refresh the roster without delaying the current poll."""
+        try:
+            await self.refresh_roster()
+        except (PypetkitError, aiohttp.ClientError, TimeoutError) as err:
+            _LOGGER.warning("Roster refresh failed: %s", err)
+
+    def _register_pets(self) -> None:
+        """Add the pets of the account data to petkit_entities."""
         for account in self.account_data:
             if account.pet_list:
                 for pet in account.pet_list:
@@ -623,13 +1011,6 @@ class PetKitClient:
                         uniqueId=str(pet.sn),
                     )
 
-        # Fetch pet details and update pet information
-        pet_details_list = await self._get_pet_details()
-        for pet_details in pet_details_list:
-            pet_id = pet_details.id
-            if pet_id in self.petkit_entities:
-                self.petkit_entities[pet_id].pet_details = pet_details
-
     async def _safe_gather(self, tasks: list[Any], label: str) -> bool:
         if not tasks:
             return True
@@ -638,6 +1019,10 @@ class PetKitClient:
         has_errors = False
 
         for result in results:
+            if isinstance(result, PetkitSessionExpiredError):
+                # The token was revoked server side (e.g. a restored session
+                # used elsewhere): login again on the next request
+                self._session = None
             if isinstance(result, Exception):
                 has_errors = True
                 _LOGGER.error(
@@ -651,20 +1036,30 @@ class PetKitClient:
     async def get_devices_data(self, device_id: int | None = None) -> None:
         """Get the devices data from the PetKit servers."""
         start_time = datetime.now()
+        if not self.account_data:
+            async with self._session_lock:
+                await self._load_session_state()
         if not self.account_data:
             await self._get_account_data()
+        else:
+            self._schedule_roster_refresh()
 
         device_list = self._collect_devices()
-        main_tasks, record_tasks, media_tasks = self._prepare_tasks(
-            device_list, device_id
-        )
+        if self._pipeline_poll:
+            results = await self._run_device_pipelines(device_list, device_id)
+        else:
+            main_tasks, record_tasks, media_tasks = self._prepare_tasks(
+                device_list, device_id
+            )
 
-        results = [
-            await self._safe_gather(main_tasks, "main_tasks"),
-            await self._safe_gather(record_tasks, "record_tasks"),
-            await self._safe_gather(media_tasks, "media_tasks"),
-        ]
-        await self._execute_stats_tasks()
+            results = [
+                await self._safe_gather(main_tasks, "main_tasks"),
+                await self._safe_gather(record_tasks, "record_tasks"),
+                await self._safe_gather(media_tasks, "media_tasks"),
+            ]
+            await self._execute_stats_tasks()
+        self._track_pet_changes()
+        self._emit_changes()
 
         end_time = datetime.now()
         elapsed = end_time - start_time
@@ -690,6 +1085,56 @@ class PetKitClient:
                 _LOGGER.debug("Found %s devices", len(account.device_list))
         return device_list
 
+    async def _run_device_pipelines(
+        self, device_list: list[Device], device_id: int | None
+    ) -> list[bool]:
+        """Run every device through its own data -> records -> media -> stats chain.
+
+        Devices do not wait for each other between stages, so the poll lasts
+        about as long as the slowest single device chain. The number of chains
+        running at once is capped by the ``max_concurrent_devices`` option.
+        :param device_list: List of devices.
+        :param device_id: Only poll this device if set.
+        :return: One success flag per device.
+        """
+        # One pet list for all the devices of the poll
+        pets = await self.get_pets_list()
+        pipelines = [
+            self._run_device_pipeline(device, pets)
+            for device in device_list
+            if device_id is None or device.device_id == device_id
+        ]
+        return list(await asyncio.gather(*pipelines))
+
+    async def _run_device_pipeline(
+        self, device: Device, pets: list[Pet] | None = None
+    ) -> bool:
+        """Fetch data, records, media and stats for a single device, in order.
+        :param device: Device data.
+        :param pets: List of pets, read from the entities if None.
+        :return: True if every stage succeeded.
+        """
+        async with self._device_semaphore:
+            main_tasks, record_tasks, media_tasks = self._prepare_device_tasks(device)
+            results = [
+                await self._safe_gather(
+                    main_tasks, f"main_tasks (device {device.device_id})"
+                ),
+                await self._safe_gather(
+                    record_tasks, f"record_tasks (device {device.device_id})"
+                ),
+                await self._safe_gather(
+                    media_tasks, f"media_tasks (device {device.device_id})"
+                ),
+            ]
+            await self._safe_gather(
+                self._prepare_stats_tasks(
+                    self.petkit_entities.get(device.device_id), pets
+                ),
+                f"stats_tasks (device {device.device_id})",
+            )
+        return all(results)
+
     def _prepare_tasks(
         self, device_list: list[Device], device_id: int | None
     ) -> tuple[list, list, list]:
@@ -700,113 +1145,174 @@ class PetKitClient:
         main_tasks: list = []
         record_tasks: list = []
         media_tasks: list = []
+        media_devices: list[Device] = []
 
         for device in device_list:
-            device_type = device.device_type
-
             if device_id is not None and device.device_id != device_id:
                 continue
 
-            if device_type in DEVICES_FEEDER:
-                main_tasks.append(self._fetch_device_data(device, Feeder))
-                record_tasks.append(self._fetch_device_data(device, FeederRecord))
-                self._add_feeder_task_by_type(media_tasks, device_type, device)
+            device_main, device_records, _ = self._prepare_device_tasks(
+                device, media=False
+            )
+            main_tasks.extend(device_main)
+            record_tasks.extend(device_records)
+            if self._has_camera(device):
+                media_devices.append(device)
 
-            elif device_type in DEVICES_LITTER_BOX:
-                main_tasks.append(self._fetch_device_data(device, Litter))
-                record_tasks.append(self._fetch_device_data(device, LitterRecord))
-                self._add_lb_task_by_type(
-                    record_tasks, media_tasks, device_type, device
-                )
+        if media_devices:
+            # The media of all the devices are built in one batch
+            media_tasks.append(self._fetch_media(media_devices))
 
-            elif device_type in DEVICES_WATER_FOUNTAIN:
-                main_tasks.append(self._fetch_device_data(device, WaterFountain))
-                record_tasks.append(
-                    self._fetch_device_data(device, WaterFountainRecord)
-                )
-                self._add_fountain_task_by_type(
-                    record_tasks, media_tasks, device_type, device
-                )
+        return main_tasks, record_tasks, media_tasks
+
+    def _prepare_device_tasks(
+        self, device: Device, media: bool = True
+    ) -> tuple[list, list, list]:
+        """Prepare main, record and media tasks for a single device.
+        :param device: Device data.
+        :param media: Prepare the media task of the device.
+        :return: Tuple of main tasks, record tasks and media tasks.
+        """
+        main_tasks: list = []
+        record_tasks: list = []
+        media_tasks: list = []
+
+        for data_class in self._device_data_classes(device.device_type):
+            tasks = main_tasks if data_class.data_type == DEVICE_DATA else record_tasks
+            tasks.append(self._fetch_device_data(device, data_class))
 
-            elif device_type in DEVICES_PURIFIER:
-                main_tasks.append(self._fetch_device_data(device, Purifier))
+        if media and self._has_camera(device):
+            media_tasks.append(self._fetch_media([device]))
 
         return main_tasks, record_tasks, media_tasks
 
-    def _add_lb_task_by_type(
-        self,
-        record_tasks: list,
-        media_tasks: list,
-        device_type: str,
-        device: Device,
-    ) -> None:
-        """Add specific tasks for litter box devices.
-        :param record_tasks: List of record tasks.
-        :param media_tasks: List of media tasks.
-        :param device_type: Device type.
+    @staticmethod
+    def _has_camera(device: Device) -> bool:
+        """Return True if the device records media files.
         :param device: Device data.
         """
-        if device_type in LITTER_NO_CAMERA:
-            record_tasks.append(self._fetch_device_data(device, LitterStats))
-        if device_type in LITTER_WITH_CAMERA:
-            record_tasks.append(self._fetch_device_data(device, PetOutGraph))
-            media_tasks.append(self._fetch_media(device))
-        if device_type == T6:
-            record_tasks.append(self._fetch_device_data(device, PackageInfoResult))
-            record_tasks.append(self._fetch_device_data(device, PackageListResult))
-
-    def _add_feeder_task_by_type(
-        self, media_tasks: list, device_type: str, device: Device
-    ) -> None:
-        """Add specific tasks for feeder box devices.
-        :param media_tasks: List of media tasks.
+        return device.device_type in (
+            *FEEDER_WITH_CAMERA,
+            *LITTER_WITH_CAMERA,
+            *FOUNTAIN_WITH_CAMERA,
+        )
+
+    @staticmethod
+    def _device_data_classes(device_type: str) -> list[Any]:
+        """Return the data classes fetched for a device type, device data first.
         :param device_type: Device type.
-        :param device: Device data.
+        :return: List of data classes.
         """
-        if device_type in FEEDER_WITH_CAMERA:
-            media_tasks.append(self._fetch_media(device))
+        if device_type in DEVICES_FEEDER:
+            return [Feeder, FeederRecord]
 
-    def _add_fountain_task_by_type(
-        self,
-        record_tasks: list,
-        media_tasks: list,
-        device_type: str,
-        device: Device,
-    ) -> None:
-        """Add specific tasks fountain devices.
-        :param record_tasks: List of record tasks.
-        :param media_tasks: List of media tasks.
-        :param device_type: Device type.
-        :param device: Device data.
+        if device_type in DEVICES_LITTER_BOX:
+            classes: list[Any] = [Litter, LitterRecord]
+            if device_type in LITTER_NO_CAMERA:
+                classes.append(LitterStats)
+            if device_type in LITTER_WITH_CAMERA:
+                classes.append(PetOutGraph)
+            if device_type == T6:
+                classes += [PackageInfoResult, PackageListResult]
+            return classes
+
+        if device_type in DEVICES_WATER_FOUNTAIN:
+            return [WaterFountain, WaterFountainRecord]
+
+        if device_type in DEVICES_PURIFIER:
+            return [Purifier]
+
+        return []
+
+    async def refresh_device(
+        self, device_id: int, data_types: Iterable[str] | None = None
+    ) -> bool:
+        """Fetch again the data of a single device, e.g. after a push event.
+        :param device_id: ID of the device.
+        :param data_types: Only fetch the data classes of these types
+            (DEVICE_DATA, DEVICE_RECORDS...), all of them if None.
+        :return: True if every fetch succeeded.
         """
-        if device_type in FOUNTAIN_WITH_CAMERA:
-            media_tasks.append(self._fetch_media(device))
+        device = next(
+            (d for d in self._collect_devices() if d.device_id == device_id), None
+        )
+        if device is None:
+            _LOGGER.debug("Ignoring refresh of unknown device %s", device_id)
+            return False
+
+        wanted = set(data_types) if data_types is not None else None
+        data_classes = [
+            data_class
+            for data_class in self._device_data_classes(device.device_type)
+            if wanted is None or data_class.data_type in wanted
+        ]
+        if self.poll_scheduler:
+            for data_class in data_classes:
+                self.poll_scheduler.mark_dirty(device_id, data_class.__name__)
+
+        result = await self._safe_gather(
+            [self._fetch_device_data(device, cls) for cls in data_classes],
+            f"refresh (device {device_id})",
+        )
+        await self._safe_gather(
+            self._prepare_stats_tasks(self.petkit_entities.get(device_id)),
+            f"stats_tasks (device {device_id})",
+        )
+        self._track_pet_changes()
+        self._emit_changes()
+        return result
 
     async def _execute_stats_tasks(self) -> None:
         """Execute tasks to populate pet stats."""
+        # One pet list for all the devices of the poll
+        pets = await self.get_pets_list()
         stats_tasks: list = [
-            self.populate_pet_stats(entity)
-            for device_id, entity in self.petkit_entities.items()
+            task
+            for entity in self.petkit_entities.values()
             if isinstance(entity, Litter)
+            for task in self._prepare_stats_tasks(entity, pets)
         ]
         stats_tasks += [
-            self.populate_pet_feeder_stats(entity)
-            for device_id, entity in self.petkit_entities.items()
+            task
+            for entity in self.petkit_entities.values()
             if isinstance(entity, Feeder)
+            for task in self._prepare_stats_tasks(entity, pets)
         ]
         await self._safe_gather(stats_tasks, "stats_tasks")
 
-    async def _fetch_media(self, device: Device) -> None:
-        """Fetch media data from the PetKit servers.
-        :param device: Device data.
+    def _prepare_stats_tasks(self, entity: Any, pets: list[Pet] | None = None) -> list:
+        """Prepare the pet stats tasks fed by a single device entity.
+        :param entity: Device entity.
+        :param pets: List of pets, read from the entities if None.
+        :return: List of stats tasks.
         """
-        _LOGGER.debug("Fetching media data for device: %s", device.device_id)
-
-        device_entity = self.petkit_entities[device.device_id]
-        device_entity.medias = await self.media_manager.gather_all_media_from_cloud(
-            [device_entity]
+        if isinstance(entity, Litter):
+            return [self.populate_pet_stats(entity, pets)]
+        if isinstance(entity, Feeder):
+            return [self.populate_pet_feeder_stats(entity, pets)]
+        return []
+
+    async def _fetch_media(self, devices: list[Device]) -> None:
+        """Build the media lists of devices from their fetched records.
+        :param devices: Devices with a camera.
+        """
+        _LOGGER.debug(
+            "Fetching media data for devices: %s", [d.device_id for d in devices]
         )
 
+        entities = {
+            device.device_id: entity
+            for device in devices
+            if isinstance(
+                entity := self.petkit_entities.get(device.device_id),
+                Feeder | Litter | WaterFountain,
+            )
+        }
+        batch = self.media_manager.build_media_batch(list(entities.values()))
+        for device_id, entity in entities.items():
+            entity.medias = batch.get(entity.id, [])
+            self._track_changes(device_id, ("medias",))
+
     async def _fetch_device_data(
         self,
         device: Device,
@@ -838,6 +1344,16 @@ class PetKitClient:
             _LOGGER.debug("Endpoint not found for device type: %s", device_type)
             return
 
+        if self.poll_scheduler and not self.poll_scheduler.is_due(
+            device.device_id, data_class.__name__
+        ):
+            _LOGGER.debug(
+                "Skipping %s for device %s, not due yet",
+                data_class.__name__,
+                device.device_id,
+            )
+            return
+
         # Specific device ask for data from the device
         device_cont = None
         if self.petkit_entities.get(device.device_id, None):
@@ -851,6 +1367,8 @@ class PetKitClient:
             params=query_param,
             headers=await self.get_session_id(),
         )
+        if self.poll_scheduler:
+            self.poll_scheduler.record(device.device_id, data_class.__name__, response)
 
         # Workaround for the litter box T6 and Fountain AI W7H (LitterRecord wraps items in {"list": [...]})
         if (
@@ -889,8 +1407,25 @@ class PetKitClient:
         device_type: str,
     ):
         """Handle device data."""
+        previous = self.petkit_entities.get(device.device_id)
+        if type(previous) is type(device_data):
+            # Keep the records, stats... until they are fetched again, which
+            # may be later than the device data with adaptive polling
+            for name in _SUB_DATA_FIELDS:
+                if getattr(device_data, name, None) is None:
+                    value = getattr(previous, name, None)
+                    if value is not None:
+                        setattr(device_data, name, value)
         self.petkit_entities[device.device_id] = device_data
         self.petkit_entities[device.device_id].device_nfo = device
+        self._track_changes(
+            device.device_id,
+            (
+                name
+                for name in type(device_data).model_fields
+                if name not in _SUB_DATA_FIELDS
+            ),
+        )
         _LOGGER.debug("Device data fetched OK for %s", device_type)
 
     @data_handler(DEVICE_RECORDS)
@@ -901,6 +1436,7 @@ class PetKitClient:
         entity = self.petkit_entities.get(device.device_id)
         if entity and isinstance(entity, (Feeder, Litter, WaterFountain)):
             entity.device_records = device_data
+            self._track_changes(device.device_id, ("device_records",))
             _LOGGER.debug("Device records fetched OK for %s", device_type)
         else:
             _LOGGER.warning(
@@ -915,8 +1451,10 @@ class PetKitClient:
         if isinstance(entity, Litter):
             if device_type in LITTER_NO_CAMERA:
                 entity.device_stats = device_data
+                self._track_changes(device.device_id, ("device_stats",))
             if device_type in LITTER_WITH_CAMERA:
                 entity.device_pet_graph_out = device_data
+                self._track_changes(device.device_id, ("device_pet_graph_out",))
             _LOGGER.debug("Device stats fetched OK for %s", device_type)
         else:
             _LOGGER.warning(
@@ -930,6 +1468,7 @@ class PetKitClient:
         entity = self.petkit_entities.get(device.device_id)
         if entity and isinstance(entity, (Feeder, Litter)):
             entity.live_feed = device_data
+            self._track_changes(device.device_id, ("live_feed",))
             _LOGGER.debug("Device live feed data fetched OK for %s", device_type)
         else:
             _LOGGER.warning(
@@ -943,6 +1482,7 @@ class PetKitClient:
         entity = self.petkit_entities.get(device.device_id)
         if isinstance(entity, Litter):
             entity.package_info = device_data
+            self._track_changes(device.device_id, ("package_info",))
             _LOGGER.debug("T6 packageInfo fetched OK for %s", device.device_id)
 
     @data_handler(PACKAGE_LIST)
@@ -951,6 +1491,7 @@ class PetKitClient:
         entity = self.petkit_entities.get(device.device_id)
         if isinstance(entity, Litter):
             entity.package_list = device_data
+            self._track_changes(device.device_id, ("package_list",))
             _LOGGER.debug("T6 packageList fetched OK for %s", device.device_id)
 
     async def get_pets_list(self) -> list[Pet]:
@@ -983,9 +1524,14 @@ class PetKitClient:
             return 0
         return end - start
 
-    async def populate_pet_stats(self, litter_data: Litter) -> None:
+    async def populate_pet_stats(
+        self, litter_data: Litter, pets: list[Pet] | None = None
+    ) -> None:
         """Collect data from litter data to populate pet stats.
+        The records are grouped by pet in one pass, then each pet is updated
+        from its own records.
         :param litter_data: Litter data.
+        :param pets: List of pets, read from the entities if None.
         """
         if not litter_data.device_nfo:
             _LOGGER.warning(
@@ -993,22 +1539,63 @@ class PetKitClient:
             )
             return
 
-        pets_list = await self.get_pets_list()
-        for pet in pets_list:
-            if litter_data.device_nfo.device_type in [T3, T4]:
-                await self.init_pet_stats(pet, litter_data)
-                await self._process_litter_no_camera(pet, litter_data)
-            elif litter_data.device_nfo.device_type in [T5, T6]:
+        device_type = litter_data.device_nfo.device_type
+        if device_type not in [T3, T4, T5, T6]:
+            return
+        if pets is None:
+            pets = await self.get_pets_list()
+
+        if device_type in [T3, T4]:
+            records = self._group_by_pet(
+                record
+                for record in litter_data.device_records or []
+                if isinstance(record, LitterRecord)
+            )
+            for pet in pets:
                 await self.init_pet_stats(pet, litter_data)
-                await self._process_litter_camera(pet, litter_data)
+                await self._process_litter_no_camera(
+                    pet, records.get(str(pet.pet_id), []), litter_data
+                )
+            return
+
+        device_records = getattr(litter_data, "device_records", None)
+        device_pet_graph = getattr(litter_data, "device_pet_graph_out", None)
+        graph = self._group_by_pet(
+            device_pet_graph if isinstance(device_pet_graph, list) else []
+        )
+        # Records joined to the last event of each pet
+        events: dict[tuple[str, str | None], list[LitterRecord]] = defaultdict(list)
+        for record in device_records if isinstance(device_records, list) else []:
+            events[(str(record.pet_id), record.event_id)].append(record)
+        for pet in pets:
+            await self.init_pet_stats(pet, litter_data)
+            await self._process_litter_camera(
+                pet, graph.get(str(pet.pet_id), []), events, litter_data
+            )
 
-    async def populate_pet_feeder_stats(self, feeder_data: Feeder) -> None:
+    @staticmethod
+    def _group_by_pet(records: Iterable[Any]) -> dict[str, list[Any]]:
+        """Group records by pet, keeping their order.
+        Pet ids are compared as strings, feeder records carry them as str.
+        :param records: Records with a pet_id.
+        :return: Records keyed by pet id, without the unattributed ones.
+        """
+        groups: dict[str, list[Any]] = defaultdict(list)
+        for record in records:
+            if record.pet_id is not None:
+                groups[str(record.pet_id)].append(record)
+        return groups
+
+    async def populate_pet_feeder_stats(
+        self, feeder_data: Feeder, pets: list[Pet] | None = None
+    ) -> None:
         """Collect data from feeder data to populate pet stats.
 
         Feeders with pet recognition attribute each meal to a pet, in
         `device_records.eat[].items[].pet_id`. That attribution already arrives on
         every poll and was simply never surfaced.
         :param feeder_data: Feeder data.
+        :param pets: List of pets, read from the entities if None.
         """
         if not feeder_data.device_nfo:
             _LOGGER.warning(
@@ -1019,10 +1606,11 @@ class PetKitClient:
         if not self._feeder_has_pet_recognition(feeder_data):
             return
 
-        pets_list = await self.get_pets_list()
-        for pet in pets_list:
+        if pets is None:
+            pets = await self.get_pets_list()
+        for pet in pets:
             await self.init_pet_feeder_stats(pet)
-            await self._process_feeder_records(pet, feeder_data)
+        await self._process_feeder_records(pets, feeder_data)
 
     @staticmethod
     def _feeder_has_pet_recognition(feeder_data: Feeder) -> bool:
@@ -1051,9 +1639,11 @@ class PetKitClient:
             pet.last_feeder_used = "Unknown"
             pet.meals_today = 0
 
-    async def _process_feeder_records(self, pet: Pet, feeder_data: Feeder) -> None:
+    async def _process_feeder_records(
+        self, pets: list[Pet], feeder_data: Feeder
+    ) -> None:
         """Process feeder eat records to extract per-pet meal stats.
-        :param pet: Pet data.
+        :param pets: List of pets.
         :param feeder_data: Feeder data.
         """
         records = getattr(feeder_data, "device_records", None)
@@ -1061,16 +1651,18 @@ class PetKitClient:
             return
 
         device_name = getattr(feeder_data.device_nfo, "device_name", None)
-        meals_today = 0
-
-        for group in records.eat or []:
-            for item in getattr(group, "items", None) or []:
-                # The AI does not recognise every visit; unattributed items carry
-                # no pet_id and must not be counted against any pet.
-                if item.pet_id is None or str(item.pet_id) != str(pet.pet_id):
-                    continue
-                meals_today += 1
+        # The AI does not recognise every visit; unattributed items carry
+        # no pet_id and must not be counted against any pet.
+        meals = self._group_by_pet(
+            item
+            for group in records.eat or []
+            for item in getattr(group, "items", None) or []
+        )
 
+        for pet in pets:
+            pet_meals = meals.get(str(pet.pet_id), [])
+            pet.meals_today = len(pet_meals)
+            for item in pet_meals:
                 start = item.eat_start_time
                 if start is None:
                     continue
@@ -1089,8 +1681,6 @@ class PetKitClient:
                         device_name.capitalize() if device_name is not None else None,
                     )
 
-        pet.meals_today = meals_today
-
     @staticmethod
     async def init_pet_stats(pet: Pet, litter_data: Litter) -> None:
         """Initialize pet stats.
@@ -1143,15 +1733,16 @@ class PetKitClient:
         if value is not None:
             setattr(obj, attr, value)
 
-    async def _process_litter_no_camera(self, pet: Pet, litter_data: Litter) -> None:
+    async def _process_litter_no_camera(
+        self, pet: Pet, records: list[LitterRecord], litter_data: Litter
+    ) -> None:
         """Process litter T3/T4 records (litter without camera).
         :param pet: Pet data.
+        :param records: Records of the pet.
         :param litter_data: Litter data.
         """
-        for stat in (
-            s for s in litter_data.device_records or [] if isinstance(s, LitterRecord)
-        ):
-            if stat.pet_id == pet.pet_id and (
+        for stat in records:
+            if (
                 pet.last_litter_usage is None
                 or getattr(stat, "timestamp", 0) > pet.last_litter_usage
             ):
@@ -1179,22 +1770,22 @@ class PetKitClient:
                     device_name.capitalize() if device_name is not None else None,
                 )
 
-    async def _process_litter_camera(self, pet: Pet, litter_data: Litter) -> None:
+    async def _process_litter_camera(
+        self,
+        pet: Pet,
+        pet_graph: list[PetOutGraph],
+        events: dict[tuple[str, str | None], list[LitterRecord]],
+        litter_data: Litter,
+    ) -> None:
         """Process litter T5/T6/T7 records (litter WITH camera).
         :param pet: Pet data.
+        :param pet_graph: PetOutGraph entries of the pet.
+        :param events: Records keyed by pet id and event id.
         :param litter_data: Litter data.
         """
-        device_records = getattr(litter_data, "device_records", None)
-        device_pet_graph = getattr(litter_data, "device_pet_graph_out", None)
-
-        if not isinstance(device_records, list):
-            device_records = []
-        if not isinstance(device_pet_graph, list):
-            device_pet_graph = []
-
         # Get last_litter_usage, last_measured_weight, last_duration_usage from PetOutGraph
-        for value in device_pet_graph:
-            if value.pet_id == pet.pet_id and (
+        for value in pet_graph:
+            if (
                 pet.last_litter_usage is None
                 or getattr(value, "time", 0) > pet.last_litter_usage
             ):
@@ -1219,60 +1810,58 @@ class PetKitClient:
 
         # Get yowling_detected, anormal_ph_detected, measured_ph, soft_stool_detected, last_urination and last_defecation from LitterRecord
 
-        for value in device_records:
-            if value.pet_id == pet.pet_id and value.event_id == pet.last_event_id:
-                # yowling_detected
-                pet.yowling_detected = value.content.pet_voice if value.content else 0
-
-                # anormal_ph_detected : bool
-                if (
-                    value.sub_content
-                    and value.sub_content[0]
-                    and value.sub_content[0].content
-                ):
-                    pet.abnormal_ph_detected = value.sub_content[0].content.ph_state
-
-                # measured_ph : float | None
-                if (
-                    value.sub_content
-                    and value.sub_content[0]
-                    and value.sub_content[0].content
-                    and value.sub_content[0].content.detection_info
-                ):
-                    pet.measured_ph = statistics.mean(
-                        item["ph"]
-                        for item in value.sub_content[0].content.detection_info
-                    )
-                else:
-                    pet.measured_ph = None
-
-                # soft_stool_detected : bool
-                if (
-                    value.sub_content
-                    and value.sub_content[0]
-                    and value.sub_content[0].content
-                ):
-                    pet.soft_stool_detected = value.sub_content[0].content.soft_stools
-
-                # last_urination : str | None
-                if (
-                    value.sub_content
-                    and value.sub_content[0]
-                    and value.sub_content[0].content
-                    and getattr(value.sub_content[0].content, "urine_bolus", None) == 1
-                    and value.timestamp is not None
-                ):
-                    pet.last_urination = value.timestamp
-
-                # last_defecation : str | None
-                if (
-                    value.sub_content
-                    and value.sub_content[0]
-                    and value.sub_content[0].content
-                    and getattr(value.sub_content[0].content, "hard_stools", None) == 1
-                    and value.timestamp is not None
-                ):
-                    pet.last_defecation = value.timestamp
+        for record in events.get((str(pet.pet_id), pet.last_event_id), []):
+            # yowling_detected
+            pet.yowling_detected = record.content.pet_voice if record.content else 0
+
+            # anormal_ph_detected : bool
+            if (
+                record.sub_content
+                and record.sub_content[0]
+                and record.sub_content[0].content
+            ):
+                pet.abnormal_ph_detected = record.sub_content[0].content.ph_state
+
+            # measured_ph : float | None
+            if (
+                record.sub_content
+                and record.sub_content[0]
+                and record.sub_content[0].content
+                and record.sub_content[0].content.detection_info
+            ):
+                pet.measured_ph = statistics.mean(
+                    item["ph"] for item in record.sub_content[0].content.detection_info
+                )
+            else:
+                pet.measured_ph = None
+
+            # soft_stool_detected : bool
+            if (
+                record.sub_content
+                and record.sub_content[0]
+                and record.sub_content[0].content
+            ):
+                pet.soft_stool_detected = record.sub_content[0].content.soft_stools
+
+            # last_urination : str | None
+            if (
+                record.sub_content
+                and record.sub_content[0]
+                and record.sub_content[0].content
+                and getattr(record.sub_content[0].content, "urine_bolus", None) == 1
+                and record.timestamp is not None
+            ):
+                pet.last_urination = record.timestamp
+
+            # last_defecation : str | None
+            if (
+                record.sub_content
+                and record.sub_content[0]
+                and record.sub_content[0].content
+                and getattr(record.sub_content[0].content, "hard_stools", None) == 1
+                and record.timestamp is not None
+            ):
+                pet.last_defecation = record.timestamp
 
     async def get_cloud_video(self, video_url: str) -> dict[str, str | int] | None:
         """Get the video m3u8 link from the cloud.
@@ -1395,6 +1984,8 @@ class PetKitClient:
             headers=await self.get_session_id(),
         )
         _LOGGER.debug("Command execution success, API response : %s", res)
+        if self.poll_scheduler:
+            self.poll_scheduler.mark_dirty(device_id)
         return True
 
 
@@ -1410,6 +2001,15 @@ class PrepReq:
         self.timezone = timezone
         self.base_headers: dict[str, str] = {}
         self._debug_test = kwargs.pop(PTK_DBG, False)
+        self.limiter = RequestLimiter(
+            max_concurrent=kwargs.get(
+                MAX_CONCURRENT_REQUESTS, DEFAULT_MAX_CONCURRENT_REQUESTS
+            ),
+            max_per_host=kwargs.get(
+                MAX_REQUESTS_PER_HOST, DEFAULT_MAX_REQUESTS_PER_HOST
+            ),
+            rate_per_host=kwargs.get(REQUESTS_PER_SECOND),
+        )
 
     async def _generate_header(self) -> dict[str, str]:
         """Create header for interaction with API endpoint."""
@@ -1425,7 +2025,6 @@ class PrepReq:
             "X-Hour": Header.HOUR.value,
             "X-TimezoneId": self.timezone,
             "X-Api-Version": Header.API_VERSION.value,
-            "X-Timezone": await get_timezone_offset(self.timezone),
         }
 
     @staticmethod
@@ -1445,7 +2044,7 @@ class PrepReq:
             exc,
         )
 
-    @retry(
+    _retry_policy = retry(
         stop=stop_after_attempt(5),
         wait=wait_exponential(multiplier=1, min=1, max=16),
         retry=(
@@ -1459,6 +2058,8 @@ class PrepReq:
         reraise=True,
         before_sleep=_log_retry_attempt,
     )
+
+    @_retry_policy
     async def _request_with_retry(
         self,
         method: str,
@@ -1475,16 +2076,25 @@ class PrepReq:
             self.base_headers = await self._generate_header()
 
         _url = url if full_url else "/".join(s.strip("/") for s in [self.base_url, url])
-        _headers = {**self.base_headers, **(headers or {})}
+        # The offset is cached until the next DST transition of the timezone
+        _headers = {
+            **self.base_headers,
+            "X-Timezone": await get_timezone_offset(self.timezone),
+            **(headers or {}),
+        }
         _LOGGER.debug("Request: %s %s", method, _url)
 
-        async with self.session.request(
-            method,
-            _url,
-            params=params,
-            data=data,
-            headers=_headers,
-        ) as resp:
+        # The slot is taken per attempt, so tenacity's backoff never holds one
+        async with (
+            self.limiter.slot(urlparse(_url).netloc),
+            self.session.request(
+                method,
+                _url,
+                params=params,
+                data=data,
+                headers=_headers,
+            ) as resp,
+        ):
             return await self._handle_response(resp, _url)
 
     async def request(
@@ -1528,6 +2138,51 @@ class PrepReq:
             _LOGGER.warning("Network error reaching %s: %s", _url, e)
             raise PetkitTimeoutError(f"Request to {_url} failed: {e}") from e
 
+    @_retry_policy
+    async def _get_if_none_match_with_retry(
+        self, url: str, etag: str | None
+    ) -> tuple[dict | None, str | None]:
+        """Internal retried conditional GET, see request_if_none_match()."""
+        if not self.base_headers:
+            self.base_headers = await self._generate_header()
+
+        _url = "/".join(s.strip("/") for s in [self.base_url, url])
+        _headers = {
+            **self.base_headers,
+            "X-Timezone": await get_timezone_offset(self.timezone),
+        }
+        if etag:
+            _headers["If-None-Match"] = etag
+        _LOGGER.debug("Request: GET %s (etag %s)", _url, etag)
+
+        async with (
+            self.limiter.slot(urlparse(_url).netloc),
+            self.session.get(_url, headers=_headers) as resp,
+        ):
+            if resp.status == HTTPStatus.NOT_MODIFIED:
+                return None, etag
+            return await self._handle_response(resp, _url), resp.headers.get("ETag")
+
+    async def request_if_none_match(
+        self, url: str, etag: str | None
+    ) -> tuple[dict | None, str | None]:
+        """GET an endpoint, revalidating a cached copy with its ETag.
+
+        :param url: URL of the API endpoint.
+        :param etag: ETag of the cached copy, if any.
+        :return: Response and its ETag, or (None, etag) if the cached copy is still valid.
+        """
+        try:
+            return await self._get_if_none_match_with_retry(url, etag)
+        except (
+            aiohttp.ClientConnectorError,
+            aiohttp.ClientOSError,
+            aiohttp.ServerDisconnectedError,
+            TimeoutError,
+        ) as e:
+            _LOGGER.warning("Network error reaching %s: %s", url, e)
+            raise PetkitTimeoutError(f"Request to {url} failed: {e}") from e
+
     @staticmethod
     async def _handle_response(response: aiohttp.ClientResponse, url: str) -> dict:
         """Handle the response from the PetKit API.
@@ -6,6 +6,69 @@ DEFAULT_COUNTRY = "DE"
 DEFAULT_TZ = "Europe/Berlin"
 PTK_DBG = "enable_dbg"
 
+# Client options (keyword arguments of PetKitClient)
+PIPELINE_POLL = "pipeline_poll"
+MAX_CONCURRENT_DEVICES = "max_concurrent_devices"
+DEFAULT_MAX_CONCURRENT_DEVICES = 8
+MAX_CONCURRENT_REQUESTS = "max_concurrent_requests"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 10
+MAX_REQUESTS_PER_HOST = "max_requests_per_host"
+DEFAULT_MAX_REQUESTS_PER_HOST = 4
+REQUESTS_PER_SECOND = "requests_per_second"
+SESSION_REFRESH_RATIO = "session_refresh_ratio"
+DEFAULT_SESSION_REFRESH_RATIO = 0.8
+SESSION_REFRESH_RETRY_SECS = 300
+CACHE_DIR = "cache_dir"
+REGION_CACHE_TTL = "region_cache_ttl"
+DEFAULT_REGION_CACHE_TTL = 86400
+SESSION_STORE = "session_store"
+SESSION_STORE_VERSION = 1
+ROSTER_REFRESH_INTERVAL = "roster_refresh_interval"
+ADAPTIVE_POLL = "adaptive_poll"
+POLL_INTERVALS = "poll_intervals"
+MEDIA_MAX_CONNECTIONS_PER_HOST = "media_max_connections_per_host"
+DEFAULT_MEDIA_MAX_CONNECTIONS_PER_HOST = 6
+MEDIA_DNS_CACHE_TTL = "media_dns_cache_ttl"
+DEFAULT_MEDIA_DNS_CACHE_TTL = 300
+MEDIA_POOLED_SESSION = "media_pooled_session"
+MEDIA_CHUNK_SIZE = 65536
+MEDIA_EXECUTOR = "media_executor"
+MEDIA_DECRYPT_QUEUE_SIZE = "media_decrypt_queue_size"
+DEFAULT_MEDIA_DECRYPT_QUEUE_SIZE = 4
+MEDIA_FFMPEG = "media_ffmpeg"
+DEFAULT_MEDIA_FFMPEG = False
+MEDIA_MAX_DOWNLOADS = "media_max_downloads"
+DEFAULT_MEDIA_MAX_DOWNLOADS = 4
+MEDIA_MAX_DEVICE_DOWNLOADS = "media_max_device_downloads"
+DEFAULT_MEDIA_MAX_DEVICE_DOWNLOADS = 2
+MEDIA_DOWNLOAD_QUEUE_SIZE = "media_download_queue_size"
+DEFAULT_MEDIA_DOWNLOAD_QUEUE_SIZE = 1000
+MEDIA_RETRY_ATTEMPTS = 4
+MEDIA_INDEX = "media_index"
+MEDIA_PLAYLIST_TTL = "media_playlist_ttl"
+DEFAULT_MEDIA_PLAYLIST_TTL = 300
+MEDIA_PREFETCH = "media_prefetch"
+DEFAULT_MEDIA_PREFETCH = 2
+MEDIA_DEDUPE = "media_dedupe"
+
+# Adaptive polling: (min, max) seconds between two fetches of a data class.
+# The interval grows from POLL_BACKOFF_START up to max while nothing changes.
+POLL_BACKOFF_START = 30
+DEFAULT_POLL_INTERVALS: dict[str, tuple[float, float]] = {
+    "Feeder": (0, 120),
+    "Litter": (0, 120),
+    "WaterFountain": (0, 120),
+    "Purifier": (60, 600),
+    "FeederRecord": (0, 300),
+    "LitterRecord": (0, 300),
+    "WaterFountainRecord": (0, 300),
+    "PetOutGraph": (60, 900),
+    "LitterStats": (300, 3600),
+    "PackageInfoResult": (1800, 21600),
+    "PackageListResult": (1800, 21600),
+    "SoundList": (3600, 86400),
+}
+
 RES_KEY = "result"
 ERR_KEY = "error"
 SUCCESS_KEY = "success"
@@ -138,6 +201,10 @@ class MediaType(StrEnum):
     IMAGE = "jpg"
 
 
+# Extension of the videos streamed as MPEG-TS, i.e. not remuxed by ffmpeg
+VIDEO_TS_EXTENSION = "ts"
+
+
 class VideoType(StrEnum):
     """Record Type constants"""
 
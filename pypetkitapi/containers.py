@@ -1,12 +1,45 @@
 """Dataclasses container for petkit API."""
 
 from contextlib import suppress
+from datetime import UTC, datetime
+import logging
+import time
 from typing import Any, ClassVar
 
-from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    Field,
+    PrivateAttr,
+    field_validator,
+    model_validator,
+)
 
 from pypetkitapi.const import LIVE_DATA, PetkitEndpoint
 
+_LOGGER = logging.getLogger(__name__)
+
+# Formats of the session dates, as sent by the API and saved by mark_refreshed
+_SESSION_DATE_FORMATS = ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S.%f")
+
+
+def _parse_session_date(value: str) -> datetime | None:
+    """Parse a session date, also as ISO 8601 or as an epoch in s or ms.
+    :param value: Date sent by the API or saved by mark_refreshed
+    :return: Date, None if it cannot be parsed
+    """
+    for date_format in _SESSION_DATE_FORMATS:
+        with suppress(ValueError):
+            return datetime.strptime(value, date_format)
+    with suppress(ValueError):
+        return datetime.fromisoformat(value)
+    with suppress(ValueError, OverflowError, OSError):
+        epoch = float(value)
+        if epoch > 1e11:
+            epoch /= 1000
+        return datetime.fromtimestamp(epoch, tz=UTC)
+    return None
+
 
 class RegionInfo(BaseModel):
     """Dataclass for region data.
@@ -66,6 +99,51 @@ class SessionInfo(BaseModel):
     created_at: str = Field(alias="createdAt")
     refreshed_at: str | None = None
 
+    # Monotonic clock value at which the token was issued (or last refreshed)
+    _issued_at: float = PrivateAttr(default=0.0)
+    _expires_at: float = PrivateAttr(default=0.0)
+    # An unknown date format is only reported once
+    _date_warned: ClassVar[bool] = False
+
+    def model_post_init(self, context: Any, /) -> None:
+        """Convert the issue date into monotonic deadlines once.
+        Validity checks on every request are then plain float comparisons.
+        """
+        value = self.refreshed_at or self.created_at
+        if (issued := _parse_session_date(value)) is not None:
+            age = (datetime.now(tz=issued.tzinfo) - issued).total_seconds()
+        else:
+            # Unknown age: issued when received, rather than logging in again
+            # on every request
+            if not SessionInfo._date_warned:
+                SessionInfo._date_warned = True
+                _LOGGER.warning("Unknown session date format: %s", value)
+            age = 0.0
+        self._set_issued_at(time.monotonic() - max(age, 0.0))
+
+    def _set_issued_at(self, issued_at: float) -> None:
+        """Set the monotonic issue time and the derived expiration deadline."""
+        self._issued_at = issued_at
+        self._expires_at = issued_at + self.expires_in
+
+    def mark_refreshed(self) -> None:
+        """Restart the session lifetime from now, after a successful refresh."""
+        self.refreshed_at = datetime.now().strftime("%Y-%m-%dT%H:%M:%S.%f")
+        self._set_issued_at(time.monotonic())
+
+    @property
+    def expires_at(self) -> float:
+        """Monotonic clock value at which the session expires."""
+        return self._expires_at
+
+    def is_expired(self) -> bool:
+        """Return True if the session has expired."""
+        return time.monotonic() >= self._expires_at
+
+    def refresh_at(self, ratio: float) -> float:
+        """Monotonic clock value at which ``ratio`` of the lifetime has elapsed."""
+        return self._issued_at + self.expires_in * ratio
+
 
 class IotInfo(BaseModel):
     """Dataclass for IoT/MQTT connection information.
@@ -55,3 +55,7 @@ class PetkitInvalidResponseFormat(PypetkitError):
 
 class PetkitAuthenticationError(PypetkitError):
     """Class for PyPetkit authentication exceptions."""
+
+
+class PetkitMqttError(PypetkitError):
+    """Class for PyPetkit MQTT event stream exceptions."""
@@ -0,0 +1,133 @@
+"""Concurrency and rate limiter for requests sent to the PetKit API."""
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import logging
+import time
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class LimiterStats:
+    """Dataclass LimiterStats.
+    Queue-time metrics for all requests, or for a single gateway.
+    """
+
+    requests: int = 0
+    waiting: int = 0
+    in_flight: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def avg_wait(self) -> float:
+        """Average time (in seconds) a request waited for a slot."""
+        return self.total_wait / self.requests if self.requests else 0.0
+
+
+class _TokenBucket:
+    """Token bucket allowing ``rate`` requests per second with bursts of ``burst``."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        """Initialize the bucket full."""
+        self._rate = rate
+        self._burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def take(self) -> None:
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self._burst, self._tokens + (now - self._updated) * self._rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self._rate)
+
+
+class RequestLimiter:
+    """Bound the number of in-flight requests, globally and per gateway.
+
+    PetKit answers bursts with "server busy" errors and 5xx responses, so it
+    is cheaper to queue requests locally than to retry them with backoff.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_per_host: int,
+        rate_per_host: float | None = None,
+    ) -> None:
+        """Initialize the limiter.
+        :param max_concurrent: Maximum number of requests in flight overall.
+        :param max_per_host: Maximum number of requests in flight per gateway.
+        :param rate_per_host: Maximum requests per second per gateway (None = unlimited).
+        """
+        self.max_concurrent = max_concurrent
+        self.max_per_host = max_per_host
+        self.rate_per_host = rate_per_host
+        self.stats = LimiterStats()
+        self.host_stats: dict[str, LimiterStats] = {}
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+        self._buckets: dict[str, _TokenBucket] = {}
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        """Return the semaphore of a gateway, creating it on first use."""
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(self.max_per_host)
+            self.host_stats[host] = LimiterStats()
+        return self._hosts[host]
+
+    def _bucket(self, host: str) -> _TokenBucket | None:
+        """Return the token bucket of a gateway, if rate limiting is enabled."""
+        if not self.rate_per_host:
+            return None
+        if host not in self._buckets:
+            self._buckets[host] = _TokenBucket(self.rate_per_host, self.max_per_host)
+        return self._buckets[host]
+
+    @asynccontextmanager
+    async def slot(self, host: str) -> AsyncIterator[None]:
+        """Hold a request slot for ``host`` for the duration of the block."""
+        host_semaphore = self._host_semaphore(host)
+        bucket = self._bucket(host)
+        counters = (self.stats, self.host_stats[host])
+        for stats in counters:
+            stats.waiting += 1
+
+        start = time.monotonic()
+        acquired = False
+        try:
+            # Host slot first: requests queued behind a saturated gateway must
+            # not hold global slots that other gateways could use
+            async with host_semaphore:
+                if bucket is not None:
+                    await bucket.take()
+                async with self._global:
+                    acquired = True
+                    waited = time.monotonic() - start
+                    for stats in counters:
+                        stats.waiting -= 1
+                        stats.in_flight += 1
+                        stats.requests += 1
+                        stats.total_wait += waited
+                        stats.max_wait = max(stats.max_wait, waited)
+                    if waited > 1:
+                        _LOGGER.debug("Request to %s queued for %.2fs", host, waited)
+                    yield
+        finally:
+            for stats in counters:
+                if acquired:
+                    stats.in_flight -= 1
+                else:
+                    stats.waiting -= 1
@@ -1,13 +1,21 @@
 """Module to manage media files from PetKit devices."""
 
 import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from concurrent.futures import Executor
+import contextlib
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
+from http import HTTPStatus
+import json
 import logging
 import os
 from pathlib import Path
 import re
-from typing import Any
+import shutil
+import time
+from typing import TYPE_CHECKING, Any, Self
 from urllib.parse import parse_qs, urlparse
 
 import aiofiles
@@ -16,25 +24,56 @@ import aiofiles.os
 import aiohttp
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import unpad
+from tenacity import (
+    RetryCallState,
+    retry,
+    retry_if_exception_type,
+    stop_after_attempt,
+    wait_exponential,
+)
 
 from pypetkitapi import Feeder, Litter, PetKitClient, RecordsItems, RecordType
 from pypetkitapi.const import (
+    DEFAULT_MEDIA_DECRYPT_QUEUE_SIZE,
+    DEFAULT_MEDIA_DNS_CACHE_TTL,
+    DEFAULT_MEDIA_FFMPEG,
+    DEFAULT_MEDIA_MAX_CONNECTIONS_PER_HOST,
+    DEFAULT_MEDIA_PLAYLIST_TTL,
     FEEDER_WITH_CAMERA,
     FOUNTAIN_WITH_CAMERA,
     LITTER_WITH_CAMERA,
+    MEDIA_CHUNK_SIZE,
+    MEDIA_DECRYPT_QUEUE_SIZE,
+    MEDIA_DEDUPE,
+    MEDIA_DNS_CACHE_TTL,
+    MEDIA_EXECUTOR,
+    MEDIA_FFMPEG,
+    MEDIA_INDEX,
+    MEDIA_MAX_CONNECTIONS_PER_HOST,
+    MEDIA_PLAYLIST_TTL,
+    MEDIA_POOLED_SESSION,
+    MEDIA_RETRY_ATTEMPTS,
     PTK_DBG,
+    VIDEO_TS_EXTENSION,
     MediaType,
     PetkitEndpoint,
     RecordTypeLST,
 )
+from pypetkitapi.exceptions import PetkitInvalidHTTPResponseCodeError
 from pypetkitapi.litter_container import LitterRecord
 from pypetkitapi.water_fountain_container import WaterFountain, WaterFountainRecord
 
+if TYPE_CHECKING:
+    from pypetkitapi.media_index import MediaIndex
+
 _LOGGER = logging.getLogger(__name__)
 
 # Cache for compiled regex patterns keyed by device_id
 _MEDIA_FILENAME_PATTERNS: dict[int, re.Pattern] = {}
 
+# Folder name of each record type
+_RECORD_DIRS = {record_type: record_type.name.lower() for record_type in RecordType}
+
 
 @dataclass
 class MediaCloud:
@@ -65,6 +104,17 @@ class MediaFile:
     media_type: MediaType
     event_type: RecordType
     full_file_path: Path
+    size: int | None = None  # Bytes, None if not known yet
+
+
+# Event id, record type and media type: record types can share an event id,
+# e.g. a meal and its dish images, or a toileting and its waste check
+MediaKey = tuple[str, RecordType, MediaType]
+
+
+def _media_key(media_file: MediaFile) -> MediaKey:
+    """Return the key of a file in the media tables."""
+    return media_file.event_id, media_file.event_type, media_file.media_type
 
 
 class MediaManager:
@@ -73,14 +123,18 @@ class MediaManager:
     def __init__(self, **kwargs: Any):
         """Media Manager init"""
         self.media_table: list[MediaFile] = []
-        self._media_index: dict[tuple[str, MediaType], MediaFile] = {}
+        self._media_index: dict[MediaKey, MediaFile] = {}
         self._debug_test = kwargs.get(PTK_DBG, False)
+        self.media_index: MediaIndex | None = kwargs.get(MEDIA_INDEX)
+        # Keys found in the media index by the last list_missing_files
+        self._indexed: set[MediaKey] = set()
+        # Start, end and folder name of the last local day seen
+        self._day: tuple[float, float, str] = (0, 0, "")
 
     def _add_media_to_table(self, media_file: MediaFile) -> None:
         """Add file to index"""
         self.media_table.append(media_file)
-        index_key = (media_file.event_id, media_file.media_type)
-        self._media_index[index_key] = media_file
+        self._media_index[_media_key(media_file)] = media_file
 
     def clear_media_table(self) -> None:
         """Empty index table"""
@@ -91,8 +145,7 @@ class MediaManager:
         """Rebuild index."""
         self._media_index.clear()
         for media_file in self.media_table:
-            index_key = (media_file.event_id, media_file.media_type)
-            self._media_index[index_key] = media_file
+            self._media_index[_media_key(media_file)] = media_file
 
     async def gather_all_media_from_cloud(
         self, devices: list[Feeder | Litter | WaterFountain]
@@ -101,57 +154,69 @@ class MediaManager:
         :param devices: List of devices
         :return: List of MediaCloud objects
         """
-        media_files: list[MediaCloud] = []
+        return [
+            media_cloud
+            for device_media in self.build_media_batch(devices).values()
+            for media_cloud in device_media
+        ]
+
+    def build_media_batch(
+        self, devices: list[Feeder | Litter | WaterFountain]
+    ) -> dict[int, list[MediaCloud]]:
+        """Build the MediaCloud lists of several devices in one pass.
+        Nothing is awaited: the subscriptions are checked against one clock
+        reading and the date folders are shared by the devices.
+        :param devices: List of devices
+        :return: MediaCloud lists keyed by device id, for the devices with a camera
+        """
         _LOGGER.debug("Processing media files for %s devices", len(devices))
+        now = datetime.now()
+        batch: dict[int, list[MediaCloud]] = {}
 
         for device in devices:
-            if isinstance(device, Feeder):
-                if (
-                    device.device_nfo
-                    and device.device_nfo.device_type in FEEDER_WITH_CAMERA
-                ):
-                    media_files.extend(await self._process_feeder(device))
-                else:
-                    _LOGGER.debug(
-                        "Feeder %s does not support media file extraction",
-                        device.name,
-                    )
-            elif isinstance(device, Litter):
-                if (
-                    device.device_nfo
-                    and device.device_nfo.device_type in LITTER_WITH_CAMERA
-                ):
-                    media_files.extend(await self._process_litter(device))
-                else:
-                    _LOGGER.debug(
-                        "Litter %s does not support media file extraction",
-                        device.name,
-                    )
-            elif isinstance(device, WaterFountain):
-                if (
-                    device.device_nfo
-                    and device.device_nfo.device_type in FOUNTAIN_WITH_CAMERA
-                ):
-                    media_files.extend(await self._process_fountain(device))
+            device_type = device.device_nfo.device_type if device.device_nfo else None
+            cp_sub = self.is_subscription_active(device, now)
+            if isinstance(device, Feeder) and device_type in FEEDER_WITH_CAMERA:
+                batch[device.id] = self._feeder_media(device, cp_sub)
+            elif isinstance(device, Litter) and device_type in LITTER_WITH_CAMERA:
+                batch[device.id] = self._litter_media(device, cp_sub)
+            elif (
+                isinstance(device, WaterFountain)
+                and device_type in FOUNTAIN_WITH_CAMERA
+            ):
+                batch[device.id] = self._fountain_media(device, cp_sub)
+            else:
+                _LOGGER.debug(
+                    "Device %s does not support media file extraction", device.name
+                )
 
-        return media_files
+        return batch
 
     async def gather_all_media_from_disk(
         self, storage_path: Path, device_id: int
     ) -> list[MediaFile]:
-        """Construct the media file table for disk storage."""
+        """Construct the media file table for disk storage.
+        With a media index, the files of the day are read from the index, the
+        disk is only scanned the first time a device is seen.
+        """
         self.clear_media_table()
 
-        today_str = datetime.now().strftime("%Y%m%d")
-        base_path = storage_path / str(device_id) / today_str
+        today = datetime.now()
+        if self.media_index is not None:
+            if not await self.media_index.is_scanned(device_id):
+                await self._import_device_files(storage_path, device_id)
+            day_start = today.replace(hour=0, minute=0, second=0, microsecond=0)
+            for media_file in await self.media_index.query(
+                device_id=device_id, start=int(day_start.timestamp())
+            ):
+                self._add_media_to_table(media_file)
+            return self.media_table
+
+        base_path = storage_path / str(device_id) / today.strftime("%Y%m%d")
 
         _LOGGER.debug("Populating files from directory %s", base_path)
 
-        if device_id not in _MEDIA_FILENAME_PATTERNS:
-            _MEDIA_FILENAME_PATTERNS[device_id] = re.compile(
-                rf"^{device_id}_\d+\.({MediaType.IMAGE}|{MediaType.VIDEO})$"
-            )
-        valid_pattern = _MEDIA_FILENAME_PATTERNS[device_id]
+        valid_pattern = self._filename_pattern(device_id)
 
         for record_type in RecordType:
             record_path = base_path / record_type
@@ -164,6 +229,36 @@ class MediaManager:
         _LOGGER.debug("OK, Media table populated with %s files", len(self.media_table))
         return self.media_table
 
+    async def _import_device_files(self, storage_path: Path, device_id: int) -> None:
+        """Add the files of all the dates of a device on disk to the index."""
+        if self.media_index is None:
+            return
+        device_path = storage_path / str(device_id)
+        _LOGGER.debug("Importing files from directory %s into the index", device_path)
+        valid_pattern = self._filename_pattern(device_id)
+        for date_entry in await _list_dir(device_path):
+            if not date_entry.is_dir():
+                continue
+            for record_type in RecordType:
+                record_path = Path(date_entry.path) / record_type
+                for subdir in (record_path / "snapshot", record_path / "video"):
+                    await self._process_subdir(
+                        subdir, device_id, record_type, valid_pattern
+                    )
+        await self.media_index.add(self.media_table)
+        await self.media_index.mark_scanned(device_id)
+        self.clear_media_table()
+
+    @staticmethod
+    def _filename_pattern(device_id: int) -> re.Pattern:
+        """Return the pattern of the media file names of a device."""
+        if device_id not in _MEDIA_FILENAME_PATTERNS:
+            _MEDIA_FILENAME_PATTERNS[device_id] = re.compile(
+                rf"^{device_id}_\d+\.({MediaType.IMAGE}|{MediaType.VIDEO}"
+                rf"|{VIDEO_TS_EXTENSION})$"
+            )
+        return _MEDIA_FILENAME_PATTERNS[device_id]
+
     async def _process_subdir(
         self,
         subdir: Path,
@@ -172,12 +267,7 @@ class MediaManager:
         valid_pattern: re.Pattern,
     ) -> None:
         """Process a subdirectory to collect media files."""
-        if not await aiofiles.os.path.exists(subdir):
-            return
-
-        entries = await aiofiles.os.scandir(subdir)
-
-        for entry in entries:
+        for entry in await _list_dir(subdir):
             media_file = await self._create_media_file(
                 entry, device_id, record_type, subdir, valid_pattern
             )
@@ -202,7 +292,10 @@ class MediaManager:
             parts = stem.split("_")
             timestamp = int(parts[1])
             media_type_str = Path(entry.name).suffix.lstrip(".")
-            media_type = MediaType(media_type_str)
+            if media_type_str == VIDEO_TS_EXTENSION:
+                media_type = MediaType.VIDEO
+            else:
+                media_type = MediaType(media_type_str)
         except (ValueError, IndexError) as e:
             _LOGGER.warning("Invalid file %s: %s", entry.name, str(e))
             return None
@@ -226,6 +319,13 @@ class MediaManager:
         if not dl_type or not event_type:
             _LOGGER.debug("Missing dl_type or event_type, no downloads")
             return []
+        if self.media_index is not None:
+            # One lookup for the whole list instead of one query per file
+            self._indexed = await self.media_index.indexed(
+                (mc.event_id, mc.event_type, media_type)
+                for mc in media_cloud_list
+                for media_type in dl_type
+            )
         return [
             mc
             for mc in media_cloud_list
@@ -285,12 +385,18 @@ class MediaManager:
         return bool(
             source
             and media_type in dl_types
-            and not self._media_exists(media_cloud.event_id, media_type)
+            and not self._media_exists(
+                media_cloud.event_id, media_cloud.event_type, media_type
+            )
         )
 
-    def _media_exists(self, event_id: str, media_type: MediaType) -> bool:
+    def _media_exists(
+        self, event_id: str, event_type: RecordType, media_type: MediaType
+    ) -> bool:
         """Check if media exists - O(1) lookup."""
-        index_key = (event_id, media_type)
+        index_key = (event_id, event_type, media_type)
+        if self.media_index is not None:
+            return index_key in self._indexed
         return index_key in self._media_index
 
     @staticmethod
@@ -307,9 +413,10 @@ class MediaManager:
             "Media missing for event : %s %s", media_cloud.event_id, " + ".join(details)
         )
 
-    async def _process_feeder(self, feeder: Feeder) -> list[MediaCloud]:
+    def _feeder_media(self, feeder: Feeder, cp_sub: bool) -> list[MediaCloud]:
         """Process media files for a Feeder device.
         :param feeder: Feeder device object
+        :param cp_sub: True if the cloud subscription is active
         :return: List of MediaCloud objects for the device
         """
         media_files: list[MediaCloud] = []
@@ -323,20 +430,21 @@ class MediaManager:
             record_list = getattr(records, record_type, [])
             for record in record_list:
                 media_files.extend(
-                    await self._process_feeder_record(
-                        record, RecordType(record_type), feeder
+                    self._process_feeder_record(
+                        record, RecordType(record_type), feeder, cp_sub
                     )
                 )
 
         return media_files
 
-    async def _process_feeder_record(
-        self, record, record_type: RecordType, device_obj: Feeder
+    def _process_feeder_record(
+        self, record, record_type: RecordType, device_obj: Feeder, cp_sub: bool
     ) -> list[MediaCloud]:
         """Process individual feeder records.
         :param record: Record object
         :param record_type: Record type
         :param device_obj: Feeder device object
+        :param cp_sub: True if the cloud subscription is active
         :return: List of MediaCloud objects for the record
         """
         media_files: list[MediaCloud] = []
@@ -345,7 +453,6 @@ class MediaManager:
         device_type = (
             device_obj.device_nfo.device_type if device_obj.device_nfo else None
         )
-        cp_sub = self.is_subscription_active(device_obj)
 
         if not feeder_id or not record.items:
             _LOGGER.debug("Missing feeder_id or items for record")
@@ -355,7 +462,7 @@ class MediaManager:
             if not isinstance(item, RecordsItems):
                 _LOGGER.debug("Record is empty")
                 continue
-            timestamp = await self._get_timestamp(item)
+            timestamp = self._item_timestamp(item)
             if timestamp is None:
                 _LOGGER.warning("Missing timestamp for record item")
                 continue
@@ -369,8 +476,7 @@ class MediaManager:
                 _LOGGER.warning("Missing user_id for record item")
                 continue
 
-            date_str = await self.get_date_from_ts(timestamp)
-            filepath = f"{feeder_id}/{date_str}"
+            filepath = f"{feeder_id}/{self._date_folder(timestamp)}"
             media_files.append(
                 MediaCloud(
                     event_id=item.event_id,
@@ -378,10 +484,8 @@ class MediaManager:
                     device_id=feeder_id,
                     user_id=user_id,
                     image=item.preview,
-                    video=await self.construct_video_url(
-                        device_type, item, user_id, cp_sub
-                    ),
-                    filepath=f"{filepath}/{record_type.name.lower()}",
+                    video=self._video_url(device_type, item, user_id, cp_sub),
+                    filepath=f"{filepath}/{_RECORD_DIRS[record_type]}",
                     aes_key=item.aes_key,
                     timestamp=timestamp,
                 )
@@ -399,7 +503,7 @@ class MediaManager:
                             user_id=user_id,
                             image=item.preview1,
                             video=None,
-                            filepath=f"{filepath}/{RecordType.DISH_BEFORE.name.lower()}",
+                            filepath=f"{filepath}/{_RECORD_DIRS[RecordType.DISH_BEFORE]}",
                             aes_key=item.aes_key,
                             timestamp=timestamp,
                         )
@@ -414,16 +518,17 @@ class MediaManager:
                             user_id=user_id,
                             image=item.preview2,
                             video=None,
-                            filepath=f"{filepath}/{RecordType.DISH_AFTER.name.lower()}",
+                            filepath=f"{filepath}/{_RECORD_DIRS[RecordType.DISH_AFTER]}",
                             aes_key=item.aes_key,
                             timestamp=timestamp,
                         )
                     )
         return media_files
 
-    async def _process_litter(self, litter: Litter) -> list[MediaCloud]:
+    def _litter_media(self, litter: Litter, cp_sub: bool) -> list[MediaCloud]:
         """Process media files for a Litter device.
         :param litter: Litter device object
+        :param cp_sub: True if the cloud subscription is active
         :return: List of MediaCloud objects for the device
         """
         media_files: list[MediaCloud] = []
@@ -431,7 +536,6 @@ class MediaManager:
         litter_id = litter.device_nfo.device_id if litter.device_nfo else None
         device_type = litter.device_nfo.device_type if litter.device_nfo else None
         user_id = litter.user.id if litter.user else None
-        cp_sub = self.is_subscription_active(litter)
 
         if not litter_id or not device_type or not user_id:
             _LOGGER.warning(
@@ -454,15 +558,14 @@ class MediaManager:
                 _LOGGER.debug("Missing timestamp for record item")
                 continue
 
-            timestamp = record.timestamp or None
-            date_str = await self.get_date_from_ts(timestamp)
+            date_str = self._date_folder(record.timestamp)
 
             if getattr(record, "enum_event_type", None) == "pet_detect":
                 event_type = RecordType.PET
             else:
                 event_type = RecordType.TOILETING
 
-            filepath = f"{litter_id}/{date_str}/{event_type.name.lower()}"
+            filepath = f"{litter_id}/{date_str}/{_RECORD_DIRS[event_type]}"
             media_files.append(
                 MediaCloud(
                     event_id=f"{litter_id}_{record.timestamp}",
@@ -470,9 +573,7 @@ class MediaManager:
                     device_id=litter_id,
                     user_id=user_id,
                     image=record.preview,
-                    video=await self.construct_video_url(
-                        device_type, record, user_id, cp_sub
-                    ),
+                    video=self._video_url(device_type, record, user_id, cp_sub),
                     filepath=filepath,
                     aes_key=record.aes_key,
                     timestamp=record.timestamp,
@@ -494,7 +595,7 @@ class MediaManager:
                             waste_image_data.shit_picture
                             and waste_image_data.shit_aes_key
                         ):
-                            waste_filepath = f"{litter_id}/{date_str}/{RecordType.WASTE_CHECK.name.lower()}"
+                            waste_filepath = f"{litter_id}/{date_str}/{_RECORD_DIRS[RecordType.WASTE_CHECK]}"
                             media_files.append(
                                 MediaCloud(
                                     event_id=f"{litter_id}_{record.timestamp}",
@@ -511,9 +612,12 @@ class MediaManager:
 
         return media_files
 
-    async def _process_fountain(self, fountain: WaterFountain) -> list[MediaCloud]:
+    def _fountain_media(
+        self, fountain: WaterFountain, cp_sub: bool
+    ) -> list[MediaCloud]:
         """Process media files for a fountain device.
         :param fountain: WaterFountain device object
+        :param cp_sub: True if the cloud subscription is active
         :return: List of MediaCloud objects for the device
         """
         media_files: list[MediaCloud] = []
@@ -521,7 +625,6 @@ class MediaManager:
         fountain_id = fountain.device_nfo.device_id if fountain.device_nfo else None
         device_type = fountain.device_nfo.device_type if fountain.device_nfo else None
         user_id = fountain.user.id if fountain.user else None
-        cp_sub = self.is_subscription_active(fountain)
 
         if not fountain_id or not device_type or not user_id:
             _LOGGER.warning(
@@ -544,15 +647,12 @@ class MediaManager:
                 _LOGGER.debug("Missing timestamp for record item")
                 continue
 
-            timestamp = record.timestamp or None
-            date_str = await self.get_date_from_ts(timestamp)
-
             if getattr(record, "enum_event_type", None) == "pet_detect":
                 event_type = RecordType.PET_DETECT
             else:
                 event_type = RecordType.DRINK_OVER
 
-            filepath = f"{fountain_id}/{date_str}/{event_type.name.lower()}"
+            filepath = f"{fountain_id}/{self._date_folder(record.timestamp)}/{_RECORD_DIRS[event_type]}"
             media_files.append(
                 MediaCloud(
                     event_id=f"{fountain_id}_{record.timestamp}",
@@ -560,9 +660,7 @@ class MediaManager:
                     device_id=fountain_id,
                     user_id=user_id,
                     image=record.preview,
-                    video=await self.construct_video_url(
-                        device_type, record, user_id, cp_sub
-                    ),
+                    video=self._video_url(device_type, record, user_id, cp_sub),
                     filepath=filepath,
                     aes_key=record.aes_key,
                     timestamp=record.timestamp,
@@ -572,18 +670,39 @@ class MediaManager:
         return media_files
 
     @staticmethod
-    def is_subscription_active(device: Feeder | Litter | WaterFountain) -> bool:
+    def is_subscription_active(
+        device: Feeder | Litter | WaterFountain, now: datetime | None = None
+    ) -> bool:
         """Check if the subscription is active based on the work_indate timestamp.
         :param device: Device object
+        :param now: Current time, read from the clock if None
         :return: True if the subscription is active, False otherwise
         """
         if device.cloud_product and device.cloud_product.work_indate:
-            return (
-                datetime.fromtimestamp(device.cloud_product.work_indate)
-                > datetime.now()
+            return datetime.fromtimestamp(device.cloud_product.work_indate) > (
+                now or datetime.now()
             )
         return False
 
+    def _date_folder(self, timestamp: int | None) -> str:
+        """Return the date folder of a timestamp, like get_date_from_ts.
+        The bounds of the last local day are kept, so the date is only
+        formatted once per day of records.
+        :param timestamp: Timestamp
+        :return: Date string
+        """
+        if not timestamp:
+            return "unknown"
+        start, end, name = self._day
+        if not start <= timestamp < end:
+            day = datetime.fromtimestamp(timestamp).date()
+            midnight = datetime.min.time()
+            start = datetime.combine(day, midnight).timestamp()
+            end = datetime.combine(day + timedelta(days=1), midnight).timestamp()
+            name = day.strftime("%Y%m%d")
+            self._day = (start, end, name)
+        return name
+
     @staticmethod
     async def get_date_from_ts(timestamp: int | None) -> str:
         """Get date from timestamp.
@@ -608,6 +727,22 @@ class MediaManager:
         :param cp_sub: Cpsub value
         :return: Constructed video URL
         """
+        return self._video_url(device_type, event_data, user_id, cp_sub)
+
+    def _video_url(
+        self,
+        device_type: str | None,
+        event_data: LitterRecord | RecordsItems | WaterFountainRecord,
+        user_id: int,
+        cp_sub: bool | None,
+    ) -> str | None:
+        """Construct the video URL, see construct_video_url().
+        :param device_type: Device type
+        :param event_data: LitterRecord | RecordsItems
+        :param user_id: User ID
+        :param cp_sub: Cpsub value
+        :return: Constructed video URL
+        """
         if (
             not hasattr(event_data, "media_api")
             or not user_id
@@ -623,8 +758,8 @@ class MediaManager:
         return url
 
     @staticmethod
-    async def _get_timestamp(item) -> int | None:
-        """Extract timestamp from a record item and raise an exception if it is None.
+    def _item_timestamp(item) -> int | None:
+        """Extract timestamp from a record item.
         :param item: Record item
         :return: Timestamp
         """
@@ -640,15 +775,371 @@ class MediaManager:
         )
 
 
+MEDIA_IV = b"\x61" * AES.block_size
+
+
+@dataclass
+class _ResumeState:
+    """Position of a partial download, kept in its ``.part`` sidecar."""
+
+    offset: int = 0  # Encrypted bytes already decrypted into the file
+    iv: bytes = MEDIA_IV  # Last encrypted block before the offset
+
+
+def _log_media_retry(retry_state: RetryCallState) -> None:
+    """Retry attempt log"""
+    _LOGGER.debug(
+        "Retry %d/%d of %s (wait for %.1fs): %s",
+        retry_state.attempt_number,
+        MEDIA_RETRY_ATTEMPTS,
+        retry_state.fn.__name__ if retry_state.fn else None,
+        retry_state.next_action.sleep if retry_state.next_action else 0,
+        retry_state.outcome.exception() if retry_state.outcome else None,
+    )
+
+
+_media_retry_policy = retry(
+    stop=stop_after_attempt(MEDIA_RETRY_ATTEMPTS),
+    wait=wait_exponential(multiplier=1, min=1, max=16),
+    retry=retry_if_exception_type((aiohttp.ClientError, TimeoutError)),
+    reraise=True,
+    before_sleep=_log_media_retry,
+)
+
+
+def _is_retriable(status: int) -> bool:
+    """Return True if a download refused with this status can be retried."""
+    return status >= 500 or status == HTTPStatus.TOO_MANY_REQUESTS
+
+
+async def _read_sidecar(path: Path) -> dict | None:
+    """Read a JSON sidecar file, None if missing or unreadable."""
+    try:
+        async with aio_open(path) as file:
+            return json.loads(await file.read())
+    except (OSError, ValueError):
+        return None
+
+
+async def _write_sidecar(path: Path, data: dict) -> None:
+    """Write a JSON sidecar file."""
+    async with aio_open(path, "w") as file:
+        await file.write(json.dumps(data))
+
+
+async def _file_size(path: Path) -> int | None:
+    """Return the size of a file, None if missing."""
+    try:
+        return await aiofiles.os.path.getsize(path)
+    except OSError:
+        return None
+
+
+async def _list_dir(path: Path) -> list[os.DirEntry]:
+    """Return the entries of a directory, read off the event loop.
+    :param path: Path of the directory.
+    :return: Entries, none if the directory does not exist.
+    """
+
+    def scan() -> list[os.DirEntry]:
+        with os.scandir(path) as entries:
+            return list(entries)
+
+    try:
+        return await asyncio.get_running_loop().run_in_executor(None, scan)
+    except (FileNotFoundError, NotADirectoryError):
+        return []
+
+
+def _sha256_file(path: Path) -> str:
+    """Return the SHA-256 of a file, blocking."""
+    with path.open("rb") as file:
+        return hashlib.file_digest(file, "sha256").hexdigest()
+
+
+def decrypt_blocks(key: bytes, iv: bytes, data: bytes, final: bool = False) -> bytes:
+    """Decrypt whole AES-CBC blocks, removing the padding of the final ones.
+    Only takes bytes, so it can run in a thread or in a process pool.
+    :param key: AES key.
+    :param iv: Previous ciphertext block (or the IV for the first one).
+    :param data: Encrypted blocks.
+    :param final: True for the end of the file.
+    :return: Decrypted bytes.
+    """
+    decrypted: bytes = AES.new(key, AES.MODE_CBC, iv).decrypt(data) if data else b""
+    if final:
+        try:
+            decrypted = unpad(decrypted, AES.block_size)
+        except ValueError as e:
+            _LOGGER.debug("Ignoring unpad warning : %s", e)
+    return decrypted
+
+
+class StreamDecryptor:
+    """Incremental AES-CBC decryption of a PetKit media file.
+
+    Chunks of any size can be fed. The last complete block is always held
+    back, so the padding is only removed from the real end of the file.
+    ``feed`` and ``tail`` only split the ciphertext, carrying the last
+    ciphertext block as the IV of the next part, so the decryption itself
+    can happen elsewhere with ``decrypt_blocks``.
+    """
+
+    def __init__(self, aes_key: str, iv: bytes = MEDIA_IV) -> None:
+        """Initialize the decryptor.
+        :param aes_key: AES key of the media file.
+        :param iv: IV of the first block, the previous ciphertext block when
+            resuming a download.
+        """
+        self.key = aes_key.removesuffix("\n").encode("utf-8")
+        self._iv = iv
+        self._pending = b""
+
+    def feed(self, chunk: bytes) -> tuple[bytes, bytes]:
+        """Split the blocks of a chunk which can be decrypted now.
+        :param chunk: Encrypted bytes.
+        :return: IV and blocks to decrypt, possibly empty.
+        """
+        data = self._pending + chunk
+        usable = len(data) - (len(data) % AES.block_size or AES.block_size)
+        if usable <= 0:
+            self._pending = data
+            return self._iv, b""
+        iv, self._iv = self._iv, data[usable - AES.block_size : usable]
+        self._pending = data[usable:]
+        return iv, data[:usable]
+
+    def tail(self) -> tuple[bytes, bytes]:
+        """Return the last blocks of the file.
+        :return: IV and blocks to decrypt as final.
+        """
+        pending, self._pending = self._pending, b""
+        extra = len(pending) % AES.block_size
+        if extra:
+            _LOGGER.debug("Ignoring %s trailing bytes out of an AES block", extra)
+            pending = pending[:-extra]
+        return self._iv, pending
+
+
+# AES key, IV and segment URLs of a video
+Playlist = tuple[Any, str | None, list[str | None]]
+
+
+class PlaylistCache:
+    """TTL cache of the resolved video playlists, keyed by video URL.
+
+    A playlist resolution costs two API round trips, the cloud video then
+    the m3u8 playlist and its key. Concurrent requests for the same video
+    share one resolution, and ``prefetch`` starts it in the background.
+    Empty playlists and failures are not cached.
+    """
+
+    def __init__(self, ttl: float = DEFAULT_MEDIA_PLAYLIST_TTL) -> None:
+        """Initialize the cache.
+        :param ttl: Seconds during which a resolved playlist is reused.
+        """
+        self.ttl = ttl
+        self._entries: dict[str, tuple[float, Playlist]] = {}
+        self._pending: dict[str, asyncio.Task[Playlist]] = {}
+
+    def _cached(self, video_url: str) -> Playlist | None:
+        """Return the playlist of a video if it has not expired."""
+        entry = self._entries.get(video_url)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[video_url]
+            return None
+        return entry[1]
+
+    async def get(
+        self, video_url: str, resolve: Callable[[], Awaitable[Playlist]]
+    ) -> Playlist:
+        """Return the playlist of a video, resolving it if needed.
+        :param video_url: URL of the video.
+        :param resolve: Coroutine function resolving the playlist.
+        :return: AES key, IV and segment URLs.
+        """
+        if (playlist := self._cached(video_url)) is not None:
+            return playlist
+        if (task := self._pending.get(video_url)) is None:
+            task = self._start(video_url, resolve)
+        # A cancelled caller does not cancel the resolution shared with others
+        return await asyncio.shield(task)
+
+    def prefetch(
+        self, video_url: str, resolve: Callable[[], Awaitable[Playlist]]
+    ) -> None:
+        """Resolve the playlist of a video in the background.
+        :param video_url: URL of the video.
+        :param resolve: Coroutine function resolving the playlist.
+        """
+        if video_url in self._pending or self._cached(video_url) is not None:
+            return
+        task = self._start(video_url, resolve)
+        task.add_done_callback(
+            lambda t: t.cancelled() or t.exception()  # Retrieved, not raised
+        )
+
+    def invalidate(self, video_url: str) -> None:
+        """Forget the playlist of a video, e.g. when its URLs have expired."""
+        self._entries.pop(video_url, None)
+
+    def _start(
+        self, video_url: str, resolve: Callable[[], Awaitable[Playlist]]
+    ) -> asyncio.Task[Playlist]:
+        """Start the resolution of a playlist."""
+
+        async def resolve_and_store() -> Playlist:
+            try:
+                playlist = await resolve()
+            finally:
+                self._pending.pop(video_url, None)
+            if playlist[2]:
+                self._entries[video_url] = (time.monotonic() + self.ttl, playlist)
+            return playlist
+
+        task = asyncio.create_task(resolve_and_store())
+        self._pending[video_url] = task
+        return task
+
+
+class ContentStore:
+    """Saved media files, by remote URL and by content hash.
+
+    The same image is often listed by several events, e.g. under another
+    event type or folder. A file with a known URL is linked instead of
+    downloaded again, and a downloaded file with the content of another one
+    is replaced by a link to it. The files are kept in the media index when
+    there is one, so they are known across runs.
+    """
+
+    def __init__(self, media_index: "MediaIndex | None" = None) -> None:
+        """Initialize the store.
+        :param media_index: Index persisting the files.
+        """
+        self._media_index = media_index
+        self._by_url: dict[str, Path] = {}
+        self._by_digest: dict[str, Path] = {}
+        self._downloading: dict[str, asyncio.Event] = {}
+
+    async def find(
+        self, url: str | None = None, digest: str | None = None
+    ) -> Path | None:
+        """Return a saved file with the given remote URL or content hash."""
+        if self._media_index is not None:
+            return await self._media_index.find_content(url, digest)
+        if url is not None and url in self._by_url:
+            return self._by_url[url]
+        return self._by_digest.get(digest) if digest is not None else None
+
+    async def add(self, url: str, digest: str, path: Path) -> None:
+        """Record a saved file.
+        :param url: URL the file was downloaded from.
+        :param digest: SHA-256 of the decrypted file.
+        :param path: Path of the file.
+        """
+        if self._media_index is not None:
+            await self._media_index.add_content(url, digest, path)
+            return
+        self._by_url[url] = path
+        self._by_digest.setdefault(digest, path)
+
+    @contextlib.asynccontextmanager
+    async def downloading(self, url: str) -> AsyncIterator[None]:
+        """Download a URL once at a time, so a copy waits for the first one."""
+        while (done := self._downloading.get(url)) is not None:
+            await done.wait()
+        self._downloading[url] = done = asyncio.Event()
+        try:
+            yield
+        finally:
+            del self._downloading[url]
+            done.set()
+
+
 class DownloadDecryptMedia:
-    """Class to download and decrypt media files from PetKit devices."""
+    """Class to download and decrypt media files from PetKit devices.
+
+    Downloads go through one HTTP session, so images and video segments
+    reuse the keep-alive connections. Pass ``session`` to share an existing
+    session, otherwise the session of the client is used. A dedicated pooled
+    session is only created with the ``media_pooled_session`` option, or when
+    the client has none, and it is released by ``close()``.
+    """
 
     file_data: MediaCloud
 
-    def __init__(self, download_path: Path, client: PetKitClient):
+    def __init__(
+        self,
+        download_path: Path,
+        client: PetKitClient,
+        session: aiohttp.ClientSession | None = None,
+        **kwargs: Any,
+    ):
         """Initialize the class."""
         self.download_path = download_path
         self.client = client
+        self._session = session
+        self._owns_session = False
+        self._pooled_session = kwargs.get(MEDIA_POOLED_SESSION, False)
+        self._max_connections_per_host = kwargs.get(
+            MEDIA_MAX_CONNECTIONS_PER_HOST, DEFAULT_MEDIA_MAX_CONNECTIONS_PER_HOST
+        )
+        self._dns_cache_ttl = kwargs.get(
+            MEDIA_DNS_CACHE_TTL, DEFAULT_MEDIA_DNS_CACHE_TTL
+        )
+        # None uses the default thread pool of the event loop
+        self._executor: Executor | None = kwargs.get(MEDIA_EXECUTOR)
+        self._decrypt_queue_size = kwargs.get(
+            MEDIA_DECRYPT_QUEUE_SIZE, DEFAULT_MEDIA_DECRYPT_QUEUE_SIZE
+        )
+        self._use_ffmpeg: bool = kwargs.get(MEDIA_FFMPEG, DEFAULT_MEDIA_FFMPEG)
+        self._media_index: MediaIndex | None = kwargs.get(MEDIA_INDEX)
+        self.playlists = PlaylistCache(
+            kwargs.get(MEDIA_PLAYLIST_TTL, DEFAULT_MEDIA_PLAYLIST_TTL)
+        )
+        self._dedupe = kwargs.get(MEDIA_DEDUPE, True)
+        self.contents = ContentStore(self._media_index)
+        # Directories created or seen by the downloads, not checked again
+        self.known_dirs: set[Path] = set()
+
+    async def __aenter__(self) -> Self:
+        """Use the downloader as an async context manager."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Release the HTTP session."""
+        await self.close()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the HTTP session, creating the pooled one if needed."""
+        if self._session is None or self._session.closed:
+            client_session = None if self._pooled_session else self.client.req.session
+            if client_session is not None and not client_session.closed:
+                self._session = client_session
+                self._owns_session = False
+                return self._session
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit_per_host=self._max_connections_per_host,
+                    ttl_dns_cache=self._dns_cache_ttl,
+                )
+            )
+            self._owns_session = True
+        return self._session
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        """HTTP session of the downloads, shared by other downloaders."""
+        return self._get_session()
+
+    async def close(self) -> None:
+        """Close the pooled HTTP session, the shared ones are left open."""
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._owns_session = False
 
     async def get_fpath(self, file_name: str) -> Path:
         """Return the full path of the file.
@@ -658,34 +1149,90 @@ class DownloadDecryptMedia:
         subdir = ""
         if file_name.endswith(MediaType.IMAGE):
             subdir = "snapshot"
-        elif file_name.endswith(MediaType.VIDEO):
+        elif file_name.endswith((MediaType.VIDEO, f".{VIDEO_TS_EXTENSION}")):
             subdir = "video"
         return Path(self.download_path / self.file_data.filepath / subdir / file_name)
 
     async def download_file(
         self, file_data: MediaCloud, file_type: list[MediaType] | None
-    ) -> None:
-        """Get image and video files."""
+    ) -> bool:
+        """Get image and video files.
+        :param file_data: Media of the event.
+        :param file_type: Media types to download.
+        :return: False if a file failed to download, True otherwise.
+        """
         self.file_data = file_data
         if not file_type:
             file_type = []
+        saved = True
 
         if self.file_data.image and MediaType.IMAGE in file_type:
             full_filename = f"{file_data.event_id}.{MediaType.IMAGE}"
             if await self.needs_download(full_filename):
                 # Image download
                 _LOGGER.debug("Download image file (event id: %s)", file_data.event_id)
-                await self._get_file(
-                    self.file_data.image,
-                    self.file_data.aes_key,
-                    f"{self.file_data.device_id}_{self.file_data.timestamp}.{MediaType.IMAGE}",
-                )
+                image_name = f"{self.file_data.device_id}_{self.file_data.timestamp}.{MediaType.IMAGE}"
+                if await self._get_file(
+                    self.file_data.image, self.file_data.aes_key, image_name
+                ):
+                    await self._index_file(MediaType.IMAGE, image_name)
+                else:
+                    saved = False
 
         if self.file_data.video and MediaType.VIDEO in file_type:
-            if await self.needs_download(f"{file_data.event_id}.{MediaType.VIDEO}"):
+            if await self._needs_video_download():
                 # Video download
                 _LOGGER.debug("Download video file (event id: %s)", file_data.event_id)
-                await self._get_video_m3u8()
+                if await self._get_video_m3u8():
+                    await self._index_file(MediaType.VIDEO, self._video_file_name())
+                else:
+                    saved = False
+        return saved
+
+    def _video_file_name(self) -> str:
+        """Return the name of the video file of the current media.
+        Videos are only MP4 when remuxed by ffmpeg, the streamed ones are
+        MPEG-TS and named so.
+        """
+        extension = MediaType.VIDEO if self._use_ffmpeg else VIDEO_TS_EXTENSION
+        return f"{self.file_data.device_id}_{self.file_data.timestamp}.{extension}"
+
+    async def _needs_video_download(self) -> bool:
+        """Check if the video is missing on disk, whichever way it was saved."""
+        for extension in (MediaType.VIDEO, VIDEO_TS_EXTENSION):
+            if not await self.needs_download(f"{self.file_data.event_id}.{extension}"):
+                return False
+        return True
+
+    async def _index_file(self, media_type: MediaType, file_name: str) -> None:
+        """Add a downloaded file to the media index, if any.
+        :param media_type: Type of the file.
+        :param file_name: Name of the file.
+        """
+        if self._media_index is None:
+            return
+        file_path = await self.get_fpath(file_name)
+        await self._media_index.add(
+            [
+                MediaFile(
+                    event_id=self.file_data.event_id,
+                    device_id=self.file_data.device_id,
+                    timestamp=self.file_data.timestamp,
+                    media_type=media_type,
+                    event_type=self.file_data.event_type,
+                    full_file_path=file_path,
+                    size=await _file_size(file_path),
+                )
+            ]
+        )
+
+    async def _ensure_dir(self, path: Path) -> None:
+        """Create a directory unless it is already known to exist.
+        :param path: Path of the directory.
+        """
+        if path not in self.known_dirs:
+            await aiofiles.os.makedirs(path, exist_ok=True)
+            self.known_dirs.add(path)
 
     async def needs_download(self, file_name: str) -> bool:
         """Check if a file needs to be downloaded (i.e. does not yet exist on disk).
@@ -694,56 +1241,197 @@ class DownloadDecryptMedia:
         :return: True if the file does not exist and should be downloaded.
         """
         full_file_path = await self.get_fpath(file_name)
-        if full_file_path.exists():
+        if await aiofiles.os.path.exists(full_file_path):
             _LOGGER.debug("File already exists, skipping download: %s", full_file_path)
             return False
         return True
 
-    async def _get_video_m3u8(self) -> None:
-        """Iterate through m3u8 file and return all the ts file URLs."""
+    async def _get_video_m3u8(self) -> bool:
+        """Download the video of the m3u8 playlist.
+        :return: True if the video was saved, False otherwise.
+        """
         aes_key, iv_key, segments_lst = await self._get_m3u8_segments()
-        file_name = (
-            f"{self.file_data.device_id}_{self.file_data.timestamp}.{MediaType.VIDEO}"
-        )
+        file_name = self._video_file_name()
 
         if aes_key is None or iv_key is None or not segments_lst:
             _LOGGER.debug("Can't download video file %s", file_name)
-            return
+            return False
 
         if len(segments_lst) == 1:
-            await self._get_file(segments_lst[0], aes_key, file_name)
-            return
+            saved = await self._get_file(segments_lst[0], aes_key, file_name)
+        elif self._use_ffmpeg:
+            saved = await self._get_video_ffmpeg(segments_lst, aes_key, file_name)
+        else:
+            _LOGGER.debug("Streaming video with %s segments", len(segments_lst))
+            saved = await self._stream_segments(segments_lst, aes_key, file_name)
+        if not saved and self.file_data.video:
+            # The segment URLs may have expired, resolve them again next time
+            self.playlists.invalidate(self.file_data.video)
+        return saved
+
+    async def _stream_segments(
+        self, segments_lst: list[str | None], aes_key: str, file_name: str
+    ) -> bool:
+        """Download the segments in order, decrypted straight into one file.
+        The segments of a PetKit playlist are MPEG-TS, which stay a valid
+        stream once concatenated, so no remuxing is needed and the video is
+        saved as a .ts file. A manifest next
+        to the partial file records the completed segments, so an interrupted
+        video resumes at the first missing segment. A segment which cannot be
+        downloaded stops the video, it is never saved with a gap.
+        :param segments_lst: URLs of the segments, in playlist order.
+        :param aes_key: AES key used for decryption.
+        :param file_name: Name of the video file.
+        :return: True if the video was saved, False otherwise.
+        """
+        file_path = await self.get_fpath(file_name)
+        tmp_path = file_path.with_name(f"{file_path.name}.tmp")
+        manifest_path = file_path.with_name(f"{file_path.name}.manifest")
+        try:
+            await self._ensure_dir(file_path.parent)
+            done, offset = await self._load_manifest(
+                manifest_path, tmp_path, len(segments_lst)
+            )
+            async with aio_open(tmp_path, "r+b" if done else "wb") as file:
+                await file.seek(offset)
+                await file.truncate()
+                for index in range(done, len(segments_lst)):
+                    await self._stream_segment(
+                        segments_lst[index], aes_key, file, await file.tell()
+                    )
+                    await file.flush()
+                    await _write_sidecar(
+                        manifest_path,
+                        {
+                            "segments": len(segments_lst),
+                            "done": index + 1,
+                            "offset": await file.tell(),
+                        },
+                    )
+            await aiofiles.os.replace(tmp_path, file_path)
+            await self._remove_file(manifest_path)
+        except (
+            aiohttp.ClientError,
+            TimeoutError,
+            PetkitInvalidHTTPResponseCodeError,
+            ValueError,
+        ) as e:
+            # The completed segments are kept, the playlist is resolved again
+            _LOGGER.warning(
+                "Video %s incomplete, resumed on next run: %s", file_path, e
+            )
+            return False
+        except OSError as e:
+            _LOGGER.error("Failed to save video %s: %s", file_path, e)
+            self.known_dirs.discard(file_path.parent)
+            await self._remove_file(tmp_path)
+            await self._remove_file(manifest_path)
+            return False
+
+        _LOGGER.debug("Save video OK : %s", file_path)
+        return True
+
+    @staticmethod
+    async def _load_manifest(
+        manifest_path: Path, tmp_path: Path, segments: int
+    ) -> tuple[int, int]:
+        """Return the completed segments and their size from a manifest.
+        :param manifest_path: Path of the manifest.
+        :param tmp_path: Path of the partial video.
+        :param segments: Number of segments of the video.
+        :return: Number of completed segments and bytes written for them.
+        """
+        manifest = await _read_sidecar(manifest_path)
+        if not manifest or manifest.get("segments") != segments:
+            return 0, 0
+        size = await _file_size(tmp_path)
+        if size is None or size < manifest["offset"]:
+            return 0, 0
+        _LOGGER.debug("Resuming video at segment %s", manifest["done"] + 1)
+        return manifest["done"], manifest["offset"]
+
+    @_media_retry_policy
+    async def _stream_segment(
+        self, url: str | None, aes_key: str, file: Any, start: int
+    ) -> None:
+        """Append one decrypted segment to an open file.
+        :param url: URL of the segment.
+        :param aes_key: AES key used for decryption.
+        :param file: Open aiofiles file of the video.
+        :param start: Position of the segment, to restart it on a retry.
+        """
+        if not url:
+            raise ValueError("Missing segment URL")
+        await file.seek(start)
+        await file.truncate()
+        async with self._get_session().get(url) as response:
+            if response.status != HTTPStatus.OK:
+                if _is_retriable(response.status):
+                    response.raise_for_status()
+                # Not retried, e.g. an expired signed URL
+                raise PetkitInvalidHTTPResponseCodeError(
+                    f"Segment {url} download failed, status code: {response.status}"
+                )
+            await self._write_decrypted(response, aes_key, file)
+
+    async def _get_video_ffmpeg(
+        self, segments_lst: list[str | None], aes_key: str, file_name: str
+    ) -> bool:
+        """Download the segments to files and remux them with ffmpeg.
+        :param segments_lst: URLs of the segments, in playlist order.
+        :param aes_key: AES key used for decryption.
+        :param file_name: Name of the video file.
+        :return: True if the video was saved, False otherwise.
+        """
+
+        async def get_segment(index: int, segment: str | None) -> bool:
+            segment_path = await self.get_fpath(f"{index}_{file_name}")
+            if await aiofiles.os.path.exists(segment_path):
+                return True  # Completed by a previous run
+            if not segment:
+                return False
+            # Deleted once concatenated, so not recorded for deduplication
+            return await self._save_file(segment, aes_key, segment_path)
 
         # Download segments in parallel
         tasks = [
-            self._get_file(segment, aes_key, f"{index}_{file_name}")
+            get_segment(index, segment)
             for index, segment in enumerate(segments_lst, start=1)
         ]
         results = await asyncio.gather(*tasks, return_exceptions=True)
 
-        # Collect successful downloads (skip exceptions and failures)
+        # The completed segments are kept until the missing ones are downloaded
         segment_files = []
         for index, result in enumerate(results):
-            if isinstance(result, Exception):
-                _LOGGER.warning("Segment %d download failed: %s", index + 1, result)
-            elif result:
-                segment_files.append(await self.get_fpath(f"{index + 1}_{file_name}"))
-
-        if not segment_files:
-            _LOGGER.warning("No segment files found")
-        elif len(segment_files) == 1:
-            _LOGGER.debug("Single file segment, no need to concatenate")
-        elif len(segment_files) > 1:
-            _LOGGER.debug("Concatenating video with %s segments", len(segment_files))
-            await self._concat_segments(segment_files, file_name)
-
-    async def _get_m3u8_segments(self) -> tuple[Any, str | None, list[str | None]]:
+            if isinstance(result, Exception) or not result:
+                _LOGGER.warning(
+                    "Segment %d download failed, video resumed on next run: %s",
+                    index + 1,
+                    result,
+                )
+                return False
+            segment_files.append(await self.get_fpath(f"{index + 1}_{file_name}"))
+
+        _LOGGER.debug("Concatenating video with %s segments", len(segment_files))
+        return await self._concat_segments(segment_files, file_name)
+
+    async def _get_m3u8_segments(self) -> Playlist:
         """Extract the segments from a m3u8 file.
         :return: Tuple of AES key, IV key, and list of segment URLs
         """
-        if not self.file_data.video:
+        video_url = self.file_data.video
+        if not video_url:
             raise ValueError("Missing video URL")
-        video_data = await self.client.get_cloud_video(self.file_data.video)
+        return await self.playlists.get(
+            video_url, lambda: self.resolve_playlist(video_url)
+        )
+
+    async def resolve_playlist(self, video_url: str) -> Playlist:
+        """Resolve the m3u8 playlist of a video, without the cache.
+        :param video_url: URL of the video.
+        :return: Tuple of AES key, IV key, and list of segment URLs
+        """
+        video_data = await self.client.get_cloud_video(video_url)
 
         if not video_data:
             return None, None, []
@@ -758,6 +1446,10 @@ class DownloadDecryptMedia:
         self, url: str | None, aes_key: str | None, full_filename: str | None
     ) -> bool:
         """Download a file from a URL and decrypt it.
+        The response is decrypted chunk by chunk into a temporary file, renamed
+        once complete, so memory use does not depend on the file size. A file
+        already saved from the same URL or with the same content is hard
+        linked, unless the media_dedupe option is False.
         :param url: URL of the file to download.
         :param aes_key: AES key used for decryption.
         :param full_filename: Name of the file to save.
@@ -767,71 +1459,230 @@ class DownloadDecryptMedia:
             _LOGGER.debug("Missing URL, AES key, or filename")
             return False
 
-        # Download the file
-        async with aiohttp.ClientSession() as session, session.get(url) as response:
-            if response.status != 200:
-                _LOGGER.error(
-                    "Failed to download %s, status code: %s", url, response.status
-                )
+        file_path = await self.get_fpath(full_filename)
+        if not self._dedupe:
+            return await self._save_file(url, aes_key, file_path)
+        async with self.contents.downloading(url):
+            source = await self.contents.find(url=url)
+            if (
+                source
+                and source != file_path
+                and await self._link_file(source, file_path)
+            ):
+                _LOGGER.debug("Linked %s to %s, same URL", file_path, source)
+                return True
+            if not await self._save_file(url, aes_key, file_path):
                 return False
+            await self._dedupe_content(url, file_path)
+        return True
 
-            encrypted_data = await response.read()
-        decrypted_data = await self._decrypt_data(encrypted_data, aes_key)
+    async def _save_file(self, url: str, aes_key: str, file_path: Path) -> bool:
+        """Download and decrypt a file, see _get_file().
+        :param url: URL of the file to download.
+        :param aes_key: AES key used for decryption.
+        :param file_path: Path of the file to save.
+        :return: True if the file was downloaded successfully, False otherwise.
+        """
+        tmp_path = file_path.with_name(f"{file_path.name}.tmp")
+        try:
+            if not await self._download_resumable(url, aes_key, tmp_path):
+                return False
+            await aiofiles.os.replace(tmp_path, file_path)
+        except (aiohttp.ClientError, TimeoutError) as e:
+            _LOGGER.warning("Failed to download %s, resumed on next run: %s", url, e)
+            return False
+        except OSError as e:
+            _LOGGER.error("Failed to save file %s: %s", file_path, e)
+            # Removed since it was created, e.g. by the retention
+            self.known_dirs.discard(file_path.parent)
+            await self._remove_file(tmp_path)
+            await self._remove_file(tmp_path.with_suffix(".part"))
+            return False
 
-        if decrypted_data:
-            _LOGGER.debug("Decrypt was successful")
-            await self._save_file(decrypted_data, full_filename)
-            return True
-        return False
+        _LOGGER.debug("Save file OK : %s", file_path)
+        return True
 
-    async def _save_file(self, content: bytes, filename: str) -> Path:
-        """Save content to a file asynchronously and return the file path.
-        :param content: Bytes data to save.
-        :param filename: Name of the file to save.
-        :return: Path of the saved file.
+    async def _dedupe_content(self, url: str, file_path: Path) -> None:
+        """Record a downloaded file, linking it to a saved one with the same content.
+        :param url: URL the file was downloaded from.
+        :param file_path: Path of the downloaded file.
         """
-        file_path = await self.get_fpath(filename)
         try:
-            file_path.parent.mkdir(parents=True, exist_ok=True)
-            async with aio_open(file_path, "wb") as file:
-                await file.write(content)
-            _LOGGER.debug("Save file OK : %s", file_path)
+            digest = await asyncio.get_running_loop().run_in_executor(
+                self._executor, _sha256_file, file_path
+            )
         except OSError as e:
-            _LOGGER.error("Failed to save file %s: %s", file_path, e)
-        return file_path
+            _LOGGER.warning("Failed to hash file %s: %s", file_path, e)
+            return
+        source = await self.contents.find(digest=digest)
+        if source and source != file_path and await self._link_file(source, file_path):
+            _LOGGER.debug("Linked %s to %s, same content", file_path, source)
+            file_path = source
+        await self.contents.add(url, digest, file_path)
+
+    async def _link_file(self, source: Path, file_path: Path) -> bool:
+        """Hard link a saved file to another path, or copy it if links fail.
+        :param source: Path of the saved file.
+        :param file_path: Path of the new file, replaced if it exists.
+        :return: False if the saved file is gone.
+        """
+        link_path = file_path.with_name(f"{file_path.name}.link")
+        try:
+            await self._ensure_dir(file_path.parent)
+            await self._remove_file(link_path)
+            try:
+                await aiofiles.os.link(source, link_path)
+            except OSError:
+                # Another file system, or one without hard links
+                await asyncio.get_running_loop().run_in_executor(
+                    self._executor, shutil.copyfile, source, link_path
+                )
+            await aiofiles.os.replace(link_path, file_path)
+        except OSError as e:
+            _LOGGER.debug("Could not reuse %s: %s", source, e)
+            self.known_dirs.discard(file_path.parent)
+            await self._remove_file(link_path)
+            return False
+        return True
 
-    @staticmethod
-    async def _decrypt_data(encrypted_data: bytes, aes_key: str) -> bytes | None:
-        """Decrypt a file using AES encryption.
-        :param encrypted_data: Encrypted bytes data.
+    @_media_retry_policy
+    async def _download_resumable(self, url: str, aes_key: str, tmp_path: Path) -> bool:
+        """Download and decrypt a file into a partial file.
+        A partial file left by an interrupted download is resumed with a
+        Range request, from the position and IV saved in its sidecar.
+        :param url: URL of the file to download.
         :param aes_key: AES key used for decryption.
-        :return: Decrypted bytes data.
+        :param tmp_path: Path of the partial file.
+        :return: False if the server refused the file.
         """
-        aes_key = aes_key.removesuffix("\n")
-        key_bytes: bytes = aes_key.encode("utf-8")
-        iv: bytes = b"\x61" * 16
-        cipher: Any = AES.new(key_bytes, AES.MODE_CBC, iv)
-        decrypted_data: bytes = cipher.decrypt(encrypted_data)
+        part_path = tmp_path.with_suffix(".part")
+        state = await self._load_resume_state(part_path, tmp_path)
+        headers = {"Range": f"bytes={state.offset}-"} if state.offset else None
+        async with self._get_session().get(url, headers=headers) as response:
+            if response.status == HTTPStatus.PARTIAL_CONTENT and state.offset:
+                _LOGGER.debug("Resuming %s at byte %s", url, state.offset)
+            elif response.status == HTTPStatus.OK:
+                state = _ResumeState()
+            elif response.status == HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE:
+                await self._remove_file(part_path)  # Retried from the start
+                response.raise_for_status()
+            elif _is_retriable(response.status):
+                response.raise_for_status()
+            else:
+                _LOGGER.error(
+                    "Failed to download %s, status code: %s", url, response.status
+                )
+                return False
+
+            await self._ensure_dir(tmp_path.parent)
+            try:
+                async with aio_open(tmp_path, "ab" if state.offset else "wb") as file:
+                    await self._write_decrypted(response, aes_key, file, state)
+            except (aiohttp.ClientError, TimeoutError):
+                await _write_sidecar(
+                    part_path, {"offset": state.offset, "iv": state.iv.hex()}
+                )
+                raise
+        await self._remove_file(part_path)
+        return True
+
+    @staticmethod
+    async def _load_resume_state(part_path: Path, tmp_path: Path) -> _ResumeState:
+        """Return the position of a partial download, from its sidecar.
+        :param part_path: Path of the sidecar.
+        :param tmp_path: Path of the partial file.
+        :return: Position to resume at, the start if it does not match the file.
+        """
+        part = await _read_sidecar(part_path)
+        if not part or await _file_size(tmp_path) != part.get("offset"):
+            return _ResumeState()
+        return _ResumeState(part["offset"], bytes.fromhex(part["iv"]))
 
+    async def _write_decrypted(
+        self,
+        response: aiohttp.ClientResponse,
+        aes_key: str,
+        file: Any,
+        state: _ResumeState | None = None,
+    ) -> None:
+        """Decrypt a response into an open file, off the event loop.
+        The chunks are queued to a writer task which decrypts them in the
+        executor. The queue is bounded, so the download waits for the
+        decryption instead of buffering the file in memory.
+        :param response: Response of the encrypted file.
+        :param aes_key: AES key used for decryption.
+        :param file: Open aiofiles file receiving the decrypted bytes.
+        :param state: Position of a resumed download, updated as blocks are
+            written.
+        """
+        decryptor = StreamDecryptor(aes_key, state.iv if state else MEDIA_IV)
+        queue: asyncio.Queue[tuple[bytes, bytes, bool] | None] = asyncio.Queue(
+            self._decrypt_queue_size
+        )
+        loop = asyncio.get_running_loop()
+        errors: list[Exception] = []
+
+        async def write_blocks() -> None:
+            while (item := await queue.get()) is not None:
+                if errors:
+                    continue  # Keep draining so the download never blocks
+                _, blocks, final = item
+                try:
+                    await file.write(
+                        await loop.run_in_executor(
+                            self._executor, decrypt_blocks, decryptor.key, *item
+                        )
+                    )
+                except Exception as e:  # noqa: BLE001
+                    errors.append(e)
+                    continue
+                if state is not None and not final:
+                    state.offset += len(blocks)
+                    state.iv = blocks[-AES.block_size :]
+
+        writer = asyncio.create_task(write_blocks())
         try:
-            decrypted_data = unpad(decrypted_data, AES.block_size)
-        except ValueError as e:
-            _LOGGER.debug("Ignoring unpad warning : %s", e)
-        return decrypted_data
+            async for chunk in response.content.iter_chunked(MEDIA_CHUNK_SIZE):
+                if errors:
+                    break
+                iv, blocks = decryptor.feed(chunk)
+                if blocks:
+                    await queue.put((iv, blocks, False))
+            await queue.put((*decryptor.tail(), True))
+        except Exception:
+            # Write what was received, so the download can be resumed
+            await queue.put(None)
+            await writer
+            raise
+        except BaseException:
+            writer.cancel()
+            raise
+        await queue.put(None)
+        await writer
+
+        if errors:
+            raise errors[0]
+
+    @staticmethod
+    async def _remove_file(file_path: Path) -> None:
+        """Remove a file, ignoring a missing one."""
+        with contextlib.suppress(OSError):
+            await aiofiles.os.remove(file_path)
 
-    async def _concat_segments(self, ts_files: list[Path], output_file) -> None:
+    async def _concat_segments(self, ts_files: list[Path], output_file) -> bool:
         """Concatenate a list of .mp4 segments into a single output file without using a temporary file.
 
         :param ts_files: List of absolute paths of .mp4 files
         :param output_file: Path of the output file (e.g., "output.mp4")
+        :return: True if the output file exists, False otherwise.
         """
         full_output_file = await self.get_fpath(output_file)
-        if full_output_file.exists():
+        if await aiofiles.os.path.exists(full_output_file):
             _LOGGER.debug(
                 "Output file already exists: %s, skipping concatenation.", output_file
             )
             await self._delete_segments(ts_files)
-            return
+            return True
 
         # Build the argument for `ffmpeg` with the files formatted for the command line
         concat_input = "|".join(str(file) for file in ts_files)
@@ -858,29 +1709,32 @@ class DownloadDecryptMedia:
             if process.returncode == 0:
                 _LOGGER.debug("File successfully concatenated: %s", full_output_file)
                 await self._delete_segments(ts_files)
-            else:
-                _LOGGER.error(
-                    "Error during concatenation: %s\nStdout: %s\nStderr: %s",
-                    process.returncode,
-                    stdout.decode().strip(),
-                    stderr.decode().strip(),
-                )
+                return True
+            _LOGGER.error(
+                "Error during concatenation: %s\nStdout: %s\nStderr: %s",
+                process.returncode,
+                stdout.decode().strip(),
+                stderr.decode().strip(),
+            )
         except FileNotFoundError as e:
             _LOGGER.error("Error during concatenation: %s", e)
         except OSError as e:
             _LOGGER.error("OS error during concatenation: %s", e)
+        return False
 
     @staticmethod
     async def _delete_segments(ts_files: list[Path]) -> None:
         """Delete all segment files after concatenation.
         :param ts_files: List of absolute paths of .mp4 files
         """
-        for file in ts_files:
-            if file.exists():
-                try:
-                    file.unlink()
-                    _LOGGER.debug("Deleted segment file: %s", file)
-                except OSError as e:
-                    _LOGGER.debug("Error deleting segment file %s: %s", file, e)
-            else:
+
+        async def delete(file: Path) -> None:
+            try:
+                await aiofiles.os.remove(file)
+                _LOGGER.debug("Deleted segment file: %s", file)
+            except FileNotFoundError:
                 _LOGGER.debug("Segment file not found: %s", file)
+            except OSError as e:
+                _LOGGER.debug("Error deleting segment file %s: %s", file, e)
+
+        await asyncio.gather(*(delete(file) for file in ts_files))
@@ -0,0 +1,408 @@
+"""Persistent index of the media files downloaded from PetKit devices."""
+
+import asyncio
+from collections.abc import Callable, Coroutine, Iterable
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import logging
+from pathlib import Path
+import sqlite3
+from typing import Any, Concatenate, ParamSpec, TypeVar
+
+from pypetkitapi.const import MediaType, RecordType
+from pypetkitapi.media import MediaFile, MediaKey
+
+_LOGGER = logging.getLogger(__name__)
+
+_COLUMNS = "event_id, media_type, device_id, timestamp, event_type, path, size"
+# Record types share event ids, e.g. a meal and its dish images
+_KEY = "event_id = ? AND event_type = ? AND media_type = ?"
+# Values bound in the IN clause of one statement, below the SQLite limit
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    event_id TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    device_id INTEGER NOT NULL,
+    timestamp INTEGER NOT NULL,
+    event_type TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER,
+    PRIMARY KEY (event_id, event_type, media_type)
+);
+CREATE INDEX IF NOT EXISTS media_device_time ON media (device_id, timestamp);
+CREATE TABLE IF NOT EXISTS scanned_device (device_id INTEGER PRIMARY KEY);
+CREATE TABLE IF NOT EXISTS content (
+    path TEXT NOT NULL,
+    url TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    PRIMARY KEY (url, path)
+);
+CREATE INDEX IF NOT EXISTS content_path ON content (path);
+CREATE INDEX IF NOT EXISTS content_digest ON content (digest);
+"""
+
+
+_P = ParamSpec("_P")
+_T = TypeVar("_T")
+
+
+def _in_executor(
+    method: Callable[Concatenate["MediaIndex", _P], _T],
+) -> Callable[Concatenate["MediaIndex", _P], Coroutine[Any, Any, _T]]:
+    """Run a method on the thread of the index, off the event loop."""
+
+    @functools.wraps(method)
+    async def wrapper(self: "MediaIndex", *args: _P.args, **kwargs: _P.kwargs) -> _T:
+        return await asyncio.get_running_loop().run_in_executor(
+            self._executor, functools.partial(method, self, *args, **kwargs)
+        )
+
+    return wrapper
+
+
+def _where(clauses: list[str]) -> str:
+    """Return the WHERE clause joining conditions with placeholders.
+    Only placeholders are formatted into the queries, the values are bound.
+    """
+    return f" WHERE {' AND '.join(clauses)}" if clauses else ""
+
+
+def _device_filter(device_id: int | None) -> tuple[list[str], list[int | str]]:
+    """Return the conditions and parameters selecting a device, if any."""
+    if device_id is None:
+        return [], []
+    return ["device_id = ?"], [device_id]
+
+
+class MediaIndex:
+    """SQLite index of the media files on disk.
+
+    Entries are added as files are downloaded and removed as they are
+    deleted, so checking for a missing file is an indexed lookup instead of
+    a directory scan. The files already on disk are imported once per device
+    by ``MediaManager.gather_all_media_from_disk``. The remote URL and the
+    content hash of the saved files are recorded too, so duplicates are
+    linked instead of downloaded again. The database is only used from a
+    dedicated thread, so the queries never block the event loop.
+    """
+
+    def __init__(self, db_path: Path | str = ":memory:") -> None:
+        """Initialize the index, the database is opened or created on first use.
+        :param db_path: Path of the SQLite database.
+        """
+        self.db_path = db_path
+        self._db: sqlite3.Connection | None = None
+        self._executor = ThreadPoolExecutor(1, thread_name_prefix="media_index")
+
+    @property
+    def _conn(self) -> sqlite3.Connection:
+        """Return the database, opening it on the index thread if needed."""
+        if self._db is None:
+            self._db = sqlite3.connect(self.db_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._migrate(self._db)
+        return self._db
+
+    @staticmethod
+    def _migrate(db: sqlite3.Connection) -> None:
+        """Create the tables, upgrading the ones of an older index."""
+        columns = {row[1]: row[5] for row in db.execute("PRAGMA table_info(media)")}
+        if columns and "size" not in columns:
+            # Index created before the file sizes were recorded
+            db.execute("ALTER TABLE media ADD COLUMN size INTEGER")
+        if columns and not columns.get("event_type"):
+            # Index keyed without the record type, rebuilt with the new key
+            _LOGGER.debug("Upgrading the key of the media index")
+            with db:
+                db.execute("DROP INDEX IF EXISTS media_device_time")
+                db.execute("ALTER TABLE media RENAME TO media_old")
+                db.executescript(_SCHEMA)
+                db.execute(
+                    f"INSERT OR REPLACE INTO media ({_COLUMNS}) "  # noqa: S608
+                    f"SELECT {_COLUMNS} FROM media_old"
+                )
+                db.execute("DROP TABLE media_old")
+        content = {row[1]: row[5] for row in db.execute("PRAGMA table_info(content)")}
+        if content and not content.get("url"):
+            # Content keyed by path, so the URLs linked to a file replaced
+            # each other, rebuilt keyed by URL
+            _LOGGER.debug("Upgrading the key of the media content index")
+            with db:
+                db.execute("DROP INDEX IF EXISTS content_url")
+                db.execute("DROP INDEX IF EXISTS content_digest")
+                db.execute("ALTER TABLE content RENAME TO content_old")
+                db.executescript(_SCHEMA)
+                db.execute(
+                    "INSERT INTO content (path, url, digest) "
+                    "SELECT path, url, digest FROM content_old"
+                )
+                db.execute("DROP TABLE content_old")
+        db.executescript(_SCHEMA)
+
+    async def close(self) -> None:
+        """Close the database."""
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=False)
+
+    def _close(self) -> None:
+        """Close the database, on the index thread."""
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @_in_executor
+    def count(self) -> int:
+        """Return the number of indexed files."""
+        return self._conn.execute("SELECT COUNT(*) FROM media").fetchone()[0]
+
+    @_in_executor
+    def add(self, media_files: Iterable[MediaFile]) -> None:
+        """Add or replace files in the index.
+        :param media_files: Files saved on disk.
+        """
+        with self._conn as db:
+            db.executemany(
+                f"INSERT OR REPLACE INTO media ({_COLUMNS}) "  # noqa: S608
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        media.event_id,
+                        media.media_type.value,
+                        media.device_id,
+                        media.timestamp,
+                        media.event_type.value,
+                        str(media.full_file_path),
+                        media.size,
+                    )
+                    for media in media_files
+                ],
+            )
+
+    @_in_executor
+    def remove(
+        self, event_id: str, event_type: RecordType, media_type: MediaType
+    ) -> None:
+        """Remove a deleted file from the index.
+        :param event_id: Event of the file.
+        :param event_type: Record type of the event.
+        :param media_type: Type of the file.
+        """
+        key = (event_id, event_type.value, media_type.value)
+        with self._conn as db:
+            db.execute(
+                "DELETE FROM content WHERE path IN "  # noqa: S608
+                f"(SELECT path FROM media WHERE {_KEY})",
+                key,
+            )
+            db.execute(f"DELETE FROM media WHERE {_KEY}", key)  # noqa: S608
+
+    @_in_executor
+    def contains(
+        self, event_id: str, event_type: RecordType, media_type: MediaType
+    ) -> bool:
+        """Return True if the file of an event is indexed."""
+        return (
+            self._conn.execute(
+                f"SELECT 1 FROM media WHERE {_KEY}",  # noqa: S608
+                (event_id, event_type.value, media_type.value),
+            ).fetchone()
+            is not None
+        )
+
+    @_in_executor
+    def indexed(self, keys: Iterable[MediaKey]) -> set[MediaKey]:
+        """Return the keys of the files which are indexed, in one lookup.
+        :param keys: Event ids, record types and media types to look up.
+        :return: The indexed keys.
+        """
+        keys = set(keys)
+        event_ids = list({event_id for event_id, _, _ in keys})
+        found: set[MediaKey] = set()
+        for start in range(0, len(event_ids), _LOOKUP_BATCH):
+            batch = event_ids[start : start + _LOOKUP_BATCH]
+            rows = self._conn.execute(
+                "SELECT event_id, event_type, media_type FROM media "  # noqa: S608
+                f"WHERE event_id IN ({', '.join('?' * len(batch))})",
+                batch,
+            )
+            found.update(
+                (event_id, RecordType(event_type), MediaType(media_type))
+                for event_id, event_type, media_type in rows
+            )
+        return found & keys
+
+    @_in_executor
+    def query(
+        self,
+        device_id: int | None = None,
+        start: int | None = None,
+        end: int | None = None,
+        event_types: list[RecordType] | None = None,
+        media_types: list[MediaType] | None = None,
+    ) -> list[MediaFile]:
+        """Return the indexed files matching all the given filters.
+        :param device_id: ID of the device.
+        :param start: First timestamp, included.
+        :param end: Last timestamp, excluded.
+        :param event_types: Event types of the files.
+        :param media_types: Media types of the files.
+        :return: Files, oldest first.
+        """
+        clauses: list[str] = []
+        params: list[int | str] = []
+        if device_id is not None:
+            clauses.append("device_id = ?")
+            params.append(device_id)
+        if start is not None:
+            clauses.append("timestamp >= ?")
+            params.append(start)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        for column, values in (
+            ("event_type", event_types),
+            ("media_type", media_types),
+        ):
+            if values is not None:
+                clauses.append(f"{column} IN ({', '.join('?' * len(values))})")
+                params.extend(value.value for value in values)
+        return self._select(f"{_where(clauses)} ORDER BY timestamp", params)
+
+    def _select(self, clause: str, params: Iterable[int | str]) -> list[MediaFile]:
+        """Return the files selected by a WHERE/ORDER BY clause with placeholders."""
+        rows = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM media{clause}", list(params)  # noqa: S608
+        )
+        return [
+            MediaFile(
+                event_id=event_id,
+                device_id=device_id,
+                timestamp=timestamp,
+                media_type=MediaType(media_type),
+                event_type=RecordType(event_type),
+                full_file_path=Path(path),
+                size=size,
+            )
+            for event_id, media_type, device_id, timestamp, event_type, path, size in rows
+        ]
+
+    @_in_executor
+    def device_ids(self) -> list[int]:
+        """Return the devices with indexed files."""
+        return [
+            row[0] for row in self._conn.execute("SELECT DISTINCT device_id FROM media")
+        ]
+
+    @_in_executor
+    def usage(self, device_id: int | None = None) -> tuple[int, int]:
+        """Return the number and the total size of the indexed files.
+        :param device_id: ID of the device, all the devices if None.
+        :return: Number of files and bytes, files of unknown size count as 0.
+        """
+        clauses, params = _device_filter(device_id)
+        count, size = self._conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media{_where(clauses)}",  # noqa: S608
+            params,
+        ).fetchone()
+        return count, size
+
+    @_in_executor
+    def eviction_order(
+        self, device_id: int | None = None, end: int | None = None, limit: int = 100
+    ) -> list[MediaFile]:
+        """Return the files to delete first: videos before snapshots, oldest first.
+        :param device_id: ID of the device, all the devices if None.
+        :param end: Only files older than this timestamp.
+        :param limit: Maximum number of files.
+        :return: Files, in eviction order.
+        """
+        clauses, params = _device_filter(device_id)
+        if end is not None:
+            clauses.append("timestamp < ?")
+            params.append(end)
+        return self._select(
+            f"{_where(clauses)} ORDER BY media_type != ?, timestamp LIMIT ?",
+            [*params, MediaType.VIDEO.value, limit],
+        )
+
+    @_in_executor
+    def unsized(
+        self, device_id: int | None = None, limit: int = 100
+    ) -> list[MediaFile]:
+        """Return files whose size is not known yet.
+        :param device_id: ID of the device, all the devices if None.
+        :param limit: Maximum number of files.
+        """
+        clauses, params = _device_filter(device_id)
+        clauses.append("size IS NULL")
+        return self._select(f"{_where(clauses)} LIMIT ?", [*params, limit])
+
+    @_in_executor
+    def set_sizes(self, sizes: Iterable[tuple[MediaFile, int]]) -> None:
+        """Record the sizes of indexed files.
+        :param sizes: Files and their size in bytes.
+        """
+        with self._conn as db:
+            db.executemany(
+                f"UPDATE media SET size = ? WHERE {_KEY}",  # noqa: S608
+                [
+                    (
+                        size,
+                        media.event_id,
+                        media.event_type.value,
+                        media.media_type.value,
+                    )
+                    for media, size in sizes
+                ],
+            )
+
+    @_in_executor
+    def is_scanned(self, device_id: int) -> bool:
+        """Return True if the files of the device on disk were imported."""
+        return (
+            self._conn.execute(
+                "SELECT 1 FROM scanned_device WHERE device_id = ?", (device_id,)
+            ).fetchone()
+            is not None
+        )
+
+    @_in_executor
+    def mark_scanned(self, device_id: int) -> None:
+        """Record that the files of the device on disk were imported."""
+        with self._conn as db:
+            db.execute("INSERT OR IGNORE INTO scanned_device VALUES (?)", (device_id,))
+
+    @_in_executor
+    def add_content(self, url: str, digest: str, path: Path) -> None:
+        """Record the remote URL and the content hash of a saved file.
+        :param url: URL the file was downloaded from.
+        :param digest: SHA-256 of the decrypted file.
+        :param path: Path of the file.
+        """
+        with self._conn as db:
+            db.execute(
+                "INSERT OR REPLACE INTO content VALUES (?, ?, ?)",
+                (str(path), url, digest),
+            )
+
+    @_in_executor
+    def find_content(
+        self, url: str | None = None, digest: str | None = None
+    ) -> Path | None:
+        """Return a saved file with the given remote URL or content hash.
+        :param url: URL of the file.
+        :param digest: SHA-256 of the decrypted file.
+        :return: Path of the file, None if there is none.
+        """
+        for column, value in (("url", url), ("digest", digest)):
+            if value is None:
+                continue
+            row = self._conn.execute(
+                f"SELECT path FROM content WHERE {column} = ? LIMIT 1",  # noqa: S608
+                (value,),
+            ).fetchone()
+            if row is not None:
+                return Path(row[0])
+        return None
@@ -0,0 +1,217 @@
+"""Retention of the media files downloaded from PetKit devices."""
+
+import asyncio
+import contextlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+import logging
+from pathlib import Path
+import sqlite3
+
+import aiofiles.os
+
+from pypetkitapi.media import MediaFile, MediaKey, _media_key
+from pypetkitapi.media_index import MediaIndex
+
+_LOGGER = logging.getLogger(__name__)
+
+RETENTION_INTERVAL = 3600
+RETENTION_BATCH_SIZE = 100
+# Folders between a date folder and a file: <date>/<record type>/<snapshot|video>
+_DATE_FOLDER_DEPTH = 3
+
+
+@dataclass
+class RetentionLimits:
+    """Dataclass RetentionLimits.
+    Limits of the media files kept on disk, None for no limit.
+    """
+
+    max_age: timedelta | None = None
+    max_bytes: int | None = None
+    max_files: int | None = None
+
+    def exceeded(self, count: int, size: int) -> bool:
+        """Return True if a number of files or bytes is over the limits."""
+        return (self.max_files is not None and count > self.max_files) or (
+            self.max_bytes is not None and size > self.max_bytes
+        )
+
+
+class MediaRetention:
+    """Delete media files to keep the storage within age, size and count limits.
+
+    The files to delete are selected from the media index, so no directory is
+    scanned: videos go before snapshots, oldest first. Limits apply to each
+    device and to all the devices together. Files are deleted in batches,
+    yielding to the event loop in between, and ``start`` prunes again at an
+    interval in the background. Folders left empty are removed.
+    """
+
+    def __init__(
+        self,
+        media_index: MediaIndex,
+        limits: RetentionLimits | None = None,
+        device_limits: dict[int, RetentionLimits] | None = None,
+        interval: float = RETENTION_INTERVAL,
+        batch_size: int = RETENTION_BATCH_SIZE,
+    ) -> None:
+        """Initialize the retention.
+        :param media_index: Index of the downloaded files.
+        :param limits: Limits of all the devices together.
+        :param device_limits: Limits of each device, keyed by device id.
+        :param interval: Seconds between two background prunes.
+        :param batch_size: Number of files deleted between two yields.
+        """
+        self.media_index = media_index
+        self.limits = limits
+        self.device_limits = device_limits or {}
+        self.interval = interval
+        self.batch_size = batch_size
+        self._task: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        """Start pruning in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop pruning."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self) -> None:
+        """Prune at each interval until stopped."""
+        while True:
+            try:
+                await self.prune()
+            except (OSError, sqlite3.Error) as err:
+                _LOGGER.warning("Media pruning failed: %s", err)
+            await asyncio.sleep(self.interval)
+
+    async def prune(self) -> int:
+        """Delete the files over the limits, the device limits first.
+        :return: Number of deleted files.
+        """
+        deleted = 0
+        for device_id in await self.media_index.device_ids():
+            if (limits := self.device_limits.get(device_id)) is not None:
+                deleted += await self._enforce(limits, device_id)
+        if self.limits is not None:
+            deleted += await self._enforce(self.limits)
+        if deleted:
+            _LOGGER.debug("Pruned %s media files", deleted)
+        return deleted
+
+    async def _enforce(
+        self, limits: RetentionLimits, device_id: int | None = None
+    ) -> int:
+        """Delete the files of a device, or of all devices, over the limits.
+        :param limits: Limits to enforce.
+        :param device_id: ID of the device, all the devices if None.
+        :return: Number of deleted files.
+        """
+        deleted = 0
+        # Files that could not be deleted, still indexed and skipped
+        failed: set[MediaKey] = set()
+        if limits.max_age is not None:
+            end = int((datetime.now() - limits.max_age).timestamp())
+            while files := await self._eviction_batch(device_id, failed, end):
+                deleted += await self._delete(files, failed)
+
+        if limits.max_bytes is not None:
+            await self._measure(device_id)
+        count, size = await self.media_index.usage(device_id)
+        while limits.exceeded(count, size):
+            files = []
+            for media_file in await self._eviction_batch(device_id, failed):
+                if not limits.exceeded(count, size):
+                    break
+                files.append(media_file)
+                count -= 1
+                size -= media_file.size or 0
+            if not files:
+                break
+            deleted += await self._delete(files, failed)
+            count, size = await self.media_index.usage(device_id)
+        return deleted
+
+    async def _eviction_batch(
+        self, device_id: int | None, failed: set[MediaKey], end: int | None = None
+    ) -> list[MediaFile]:
+        """Return the next files to delete, without the ones that failed.
+        :param device_id: ID of the device, all the devices if None.
+        :param failed: Keys of the files that could not be deleted.
+        :param end: Only files older than this timestamp.
+        :return: Files, in eviction order.
+        """
+        files = await self.media_index.eviction_order(
+            device_id, end, self.batch_size + len(failed)
+        )
+        return [
+            media_file for media_file in files if _media_key(media_file) not in failed
+        ]
+
+    async def _measure(self, device_id: int | None) -> None:
+        """Record the size of the indexed files downloaded without one."""
+        while files := await self.media_index.unsized(device_id, self.batch_size):
+            sizes = []
+            for media_file in files:
+                try:
+                    sizes.append(
+                        (
+                            media_file,
+                            await aiofiles.os.path.getsize(media_file.full_file_path),
+                        )
+                    )
+                except OSError:
+                    # Deleted by something else
+                    await self.media_index.remove(
+                        media_file.event_id,
+                        media_file.event_type,
+                        media_file.media_type,
+                    )
+            await self.media_index.set_sizes(sizes)
+
+    async def _delete(self, files: list[MediaFile], failed: set[MediaKey]) -> int:
+        """Delete files and drop them from the index.
+        A file that cannot be deleted stays indexed, to be retried later.
+        :param files: Files to delete.
+        :param failed: Keys of the files that could not be deleted, updated.
+        :return: Number of files removed from the storage and the index.
+        """
+        folders: set[Path] = set()
+        removed = 0
+        for media_file in files:
+            try:
+                await aiofiles.os.remove(media_file.full_file_path)
+            except FileNotFoundError:
+                pass
+            except OSError as err:
+                _LOGGER.warning(
+                    "Failed to delete %s: %s", media_file.full_file_path, err
+                )
+                failed.add(_media_key(media_file))
+                continue
+            await self.media_index.remove(
+                media_file.event_id, media_file.event_type, media_file.media_type
+            )
+            folders.add(media_file.full_file_path.parent)
+            removed += 1
+        for folder in folders:
+            await self._remove_empty_folders(folder)
+        await asyncio.sleep(0)
+        return removed
+
+    @staticmethod
+    async def _remove_empty_folders(folder: Path) -> None:
+        """Remove a file folder and its parents up to the date folder, if empty."""
+        for path in [folder, *folder.parents][:_DATE_FOLDER_DEPTH]:
+            try:
+                await aiofiles.os.rmdir(path)
+            except OSError:
+                return
@@ -0,0 +1,294 @@
+"""Download scheduler for the media files of the PetKit devices."""
+
+import asyncio
+from collections import defaultdict
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+import heapq
+import itertools
+import logging
+from pathlib import Path
+from typing import Any, Self
+
+import aiohttp
+
+from pypetkitapi import PetKitClient
+from pypetkitapi.const import (
+    DEFAULT_MEDIA_DOWNLOAD_QUEUE_SIZE,
+    DEFAULT_MEDIA_MAX_DEVICE_DOWNLOADS,
+    DEFAULT_MEDIA_MAX_DOWNLOADS,
+    DEFAULT_MEDIA_PREFETCH,
+    MEDIA_DOWNLOAD_QUEUE_SIZE,
+    MEDIA_MAX_DEVICE_DOWNLOADS,
+    MEDIA_MAX_DOWNLOADS,
+    MEDIA_POOLED_SESSION,
+    MEDIA_PREFETCH,
+    MediaType,
+    RecordType,
+)
+from pypetkitapi.media import DownloadDecryptMedia, MediaCloud
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class DownloadProgress:
+    """Dataclass DownloadProgress.
+    Counters of the media download scheduler.
+    """
+
+    queued: int = 0
+    active: int = 0
+    completed: int = 0
+    failed: int = 0
+    dropped: int = 0  # Left out by the bounded queue, listed again next pass
+
+    @property
+    def remaining(self) -> int:
+        """Number of downloads queued or running."""
+        return self.queued + self.active
+
+
+# Event id, record type and media type of a job
+_JobKey = tuple[str, RecordType, MediaType]
+
+
+@dataclass(order=True)
+class _DownloadJob:
+    """One media type of one event, ordered by priority."""
+
+    priority: tuple[bool, int, int]
+    media: MediaCloud = field(compare=False)
+    media_type: MediaType = field(compare=False)
+
+    @property
+    def key(self) -> _JobKey:
+        """Deduplication key of the job.
+        Events of several record types share an event id, e.g. a meal and
+        its dish images, so the record type is part of the key.
+        """
+        return self.media.event_id, self.media.event_type, self.media_type
+
+
+class MediaDownloadScheduler:
+    """Prioritised and capped downloads of the media files.
+
+    Batches from ``MediaManager.list_missing_files`` are split into one job
+    per event and media type. Jobs already queued or running are ignored,
+    finished ones are left to the media index and the files on disk.
+    Images go before videos, and newer events before older ones. The number
+    of concurrent downloads is capped globally and per device, so a backfill
+    leaves bandwidth to the API polling. The playlists of the next queued
+    videos are resolved while the current downloads run. The queue is
+    bounded: the jobs with the lowest priority are dropped, they are listed
+    as missing again on the next pass.
+    """
+
+    def __init__(
+        self,
+        download_path: Path,
+        client: PetKitClient,
+        session: aiohttp.ClientSession | None = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the scheduler.
+        :param download_path: Root directory of the media files.
+        :param client: PetKit client.
+        :param session: HTTP session to share, a pooled one is created if None.
+        :param kwargs: Scheduler options, the other options are passed to
+            DownloadDecryptMedia.
+        """
+        self.download_path = download_path
+        self.client = client
+        self.progress = DownloadProgress()
+        # The scheduler is closed by its owner, it can keep its own pool
+        kwargs.setdefault(MEDIA_POOLED_SESSION, True)
+        self._kwargs = kwargs
+        self._max_downloads = kwargs.get(
+            MEDIA_MAX_DOWNLOADS, DEFAULT_MEDIA_MAX_DOWNLOADS
+        )
+        self._max_device_downloads = kwargs.get(
+            MEDIA_MAX_DEVICE_DOWNLOADS, DEFAULT_MEDIA_MAX_DEVICE_DOWNLOADS
+        )
+        self._queue_size = kwargs.get(
+            MEDIA_DOWNLOAD_QUEUE_SIZE, DEFAULT_MEDIA_DOWNLOAD_QUEUE_SIZE
+        )
+        self._prefetch = kwargs.get(MEDIA_PREFETCH, DEFAULT_MEDIA_PREFETCH)
+        # Owns the session and the caches shared by the downloads
+        self._downloader = DownloadDecryptMedia(
+            download_path, client, session, **kwargs
+        )
+        self._pending: dict[int, list[_DownloadJob]] = defaultdict(list)
+        self._active: dict[int, int] = defaultdict(int)
+        # Keys of the jobs queued or running, dropped once they finish
+        self._seen: set[_JobKey] = set()
+        self._counter = itertools.count()
+        self._progress_listeners: list[Callable[[DownloadProgress], None]] = []
+
+    async def __aenter__(self) -> Self:
+        """Use the scheduler as an async context manager."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Release the HTTP session."""
+        await self.close()
+
+    async def close(self) -> None:
+        """Close the HTTP session, unless it was provided by the caller."""
+        await self._downloader.close()
+
+    def add_progress_listener(
+        self, callback: Callable[[DownloadProgress], None]
+    ) -> Callable[[], None]:
+        """Call ``callback`` with the progress each time it changes.
+        :param callback: Function receiving a DownloadProgress.
+        :return: Function removing the listener.
+        """
+        self._progress_listeners.append(callback)
+
+        def remove_listener() -> None:
+            if callback in self._progress_listeners:
+                self._progress_listeners.remove(callback)
+
+        return remove_listener
+
+    def add(
+        self, media_list: list[MediaCloud], dl_types: list[MediaType] | None = None
+    ) -> int:
+        """Queue the media of a batch.
+        :param media_list: Media to download, e.g. from list_missing_files.
+        :param dl_types: Media types to download, all of them if None.
+        :return: Number of new jobs.
+        """
+        if dl_types is None:
+            dl_types = [MediaType.IMAGE, MediaType.VIDEO]
+        added = 0
+        for media in media_list:
+            for media_type in dl_types:
+                source = media.image if media_type == MediaType.IMAGE else media.video
+                if not source:
+                    continue
+                job = _DownloadJob(
+                    (
+                        media_type != MediaType.IMAGE,
+                        -media.timestamp,
+                        next(self._counter),
+                    ),
+                    media,
+                    media_type,
+                )
+                if job.key in self._seen:
+                    continue
+                self._seen.add(job.key)
+                heapq.heappush(self._pending[media.device_id], job)
+                added += 1
+        self.progress.queued += added
+        if self.progress.queued > self._queue_size:
+            self._drop_lowest_priority()
+        self._notify()
+        return added
+
+    def _drop_lowest_priority(self) -> None:
+        """Keep only the jobs with the highest priority in the queue."""
+        jobs = [job for heap in self._pending.values() for job in heap]
+        kept = heapq.nsmallest(self._queue_size, jobs)
+        kept_priorities = {job.priority for job in kept}
+        for job in jobs:
+            if job.priority not in kept_priorities:
+                self._seen.discard(job.key)
+        self._pending = defaultdict(list)
+        for job in kept:
+            self._pending[job.media.device_id].append(job)
+        for heap in self._pending.values():
+            heapq.heapify(heap)
+        self.progress.dropped += len(jobs) - len(kept)
+        self.progress.queued = len(kept)
+        _LOGGER.debug("Download queue full, dropped %s jobs", len(jobs) - len(kept))
+
+    def _next_job(self) -> _DownloadJob | None:
+        """Pop the job with the highest priority among the devices under cap."""
+        heads = [
+            heap[0]
+            for device_id, heap in self._pending.items()
+            if heap and self._active[device_id] < self._max_device_downloads
+        ]
+        if not heads:
+            return None
+        job = min(heads)
+        heapq.heappop(self._pending[job.media.device_id])
+        self._active[job.media.device_id] += 1
+        self.progress.queued -= 1
+        self.progress.active += 1
+        return job
+
+    async def run(self) -> DownloadProgress:
+        """Download the queued media until the queue is empty.
+        Media added while running are downloaded by the same run.
+        :return: Progress at the end of the run.
+        """
+        running: set[asyncio.Task] = set()
+        while True:
+            while len(running) < self._max_downloads and (job := self._next_job()):
+                running.add(asyncio.create_task(self._download(job)))
+            if not running:
+                return self.progress
+            self._prefetch_playlists()
+            _, running = await asyncio.wait(
+                running, return_when=asyncio.FIRST_COMPLETED
+            )
+
+    def _prefetch_playlists(self) -> None:
+        """Resolve the playlists of the next queued videos in the background."""
+        if not self._prefetch:
+            return
+        videos = heapq.nsmallest(
+            self._prefetch,
+            (
+                job
+                for heap in self._pending.values()
+                for job in heap
+                if job.media_type == MediaType.VIDEO and job.media.video
+            ),
+        )
+        for job in videos:
+            video_url = str(job.media.video)
+            self._downloader.playlists.prefetch(
+                video_url, partial(self._downloader.resolve_playlist, video_url)
+            )
+
+    async def _download(self, job: _DownloadJob) -> None:
+        """Download one job, updating the progress."""
+        self._notify()
+        # One downloader per job, as it holds the media being downloaded
+        downloader = DownloadDecryptMedia(
+            self.download_path, self.client, self._downloader.session, **self._kwargs
+        )
+        downloader.playlists = self._downloader.playlists
+        downloader.contents = self._downloader.contents
+        downloader.known_dirs = self._downloader.known_dirs
+        try:
+            saved = await downloader.download_file(job.media, [job.media_type])
+        except Exception as e:  # noqa: BLE001
+            _LOGGER.warning(
+                "Download of %s %s failed: %s", job.media.event_id, job.media_type, e
+            )
+            saved = False
+        finally:
+            self._active[job.media.device_id] -= 1
+            self.progress.active -= 1
+            # Downloaded files are skipped by the index, failed ones retried
+            self._seen.discard(job.key)
+        if saved:
+            self.progress.completed += 1
+        else:
+            self.progress.failed += 1
+        self._notify()
+
+    def _notify(self) -> None:
+        """Call the progress listeners."""
+        for listener in list(self._progress_listeners):
+            try:
+                listener(self.progress)
+            except Exception:
+                _LOGGER.exception("Error in download progress listener")
@@ -0,0 +1,544 @@
+"""Push updates from the PetKit IoT/MQTT channel used by the official app."""
+
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Iterable
+import contextlib
+from dataclasses import dataclass, field
+import hashlib
+import hmac
+import json
+import logging
+import ssl
+import struct
+import time
+from typing import TYPE_CHECKING, Any, TypeVar
+
+from pypetkitapi.const import DEVICE_DATA, DEVICE_RECORDS
+from pypetkitapi.containers import IotInfo
+from pypetkitapi.exceptions import PetkitMqttError, PypetkitError
+
+if TYPE_CHECKING:
+    from pypetkitapi.client import PetKitClient
+
+_LOGGER = logging.getLogger(__name__)
+
+_T = TypeVar("_T")
+
+MQTT_PORT = 1883
+MQTT_KEEPALIVE = 60
+MQTT_RECONNECT_MIN = 1
+MQTT_RECONNECT_MAX = 300
+
+# MQTT 3.1.1 packet types (upper nibble of the fixed header)
+_CONNECT = 0x10
+_CONNACK = 0x20
+_PUBLISH = 0x30
+_PUBACK = 0x40
+_SUBSCRIBE = 0x82
+_SUBACK = 0x90
+_PINGREQ = 0xC0
+_PINGRESP = 0xD0
+_DISCONNECT = 0xE0
+
+# Keys holding the device ID and the event type in the event payloads
+_DEVICE_ID_KEYS = ("deviceId", "device_id", "petkitDeviceId")
+_EVENT_TYPE_KEYS = ("type", "eventType", "event", "msgType", "method")
+_NESTED_KEYS = ("data", "content", "payload", "params")
+# Event types, compared case-insensitively, telling which data changed
+_STATE_TYPES = frozenset(
+    {
+        "state",
+        "state_change",
+        "status",
+        "device_state",
+        "setting",
+        "settings",
+        "property",
+        "property_post",
+        "online",
+        "offline",
+        "ota",
+    }
+)
+_RECORD_TYPES = frozenset(
+    {
+        "record",
+        "records",
+        "event",
+        "device_record",
+        "feed",
+        "feed_record",
+        "eat",
+        "eat_record",
+        "clean",
+        "clean_record",
+        "pet_in",
+        "pet_out",
+        "work_record",
+    }
+)
+# Keys only found in the payloads of new records
+_RECORD_KEYS = ("eventId", "recordId", "records")
+
+
+def _string(value: str) -> bytes:
+    """Encode a length-prefixed MQTT UTF-8 string."""
+    data = value.encode()
+    return struct.pack("!H", len(data)) + data
+
+
+def _packet(header: int, body: bytes) -> bytes:
+    """Build a packet: fixed header, remaining length and body."""
+    length = len(body)
+    encoded = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        encoded.append(byte | 0x80 if length else byte)
+        if not length:
+            break
+    return bytes([header]) + bytes(encoded) + body
+
+
+async def _wait(awaitable: Awaitable[_T], timeout: float | None) -> _T:
+    """Await with a timeout, raising TimeoutError when it expires.
+    Unlike asyncio.wait_for before Python 3.12, a cancellation arriving as
+    the awaitable completes is never swallowed, so stop() always ends the
+    stream.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        raise TimeoutError
+    return task.result()
+
+
+class MqttClient:
+    """Minimal MQTT 3.1.1 client: connect, subscribe and receive publications."""
+
+    def __init__(self, keepalive: int = MQTT_KEEPALIVE) -> None:
+        """Initialize the client.
+        :param keepalive: Keep alive interval, in seconds.
+        """
+        self.keepalive = keepalive
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+        self._packet_id = 0
+        self._last_sent = 0.0
+        self._ping_sent = False
+        self._backlog: list[tuple[str, bytes]] = []
+
+    async def connect(
+        self,
+        host: str,
+        port: int,
+        client_id: str,
+        username: str | None = None,
+        password: str | None = None,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> None:
+        """Open the connection and wait for the broker to accept it."""
+        self._reader, self._writer = await _wait(
+            asyncio.open_connection(host, port, ssl=ssl_context), self.keepalive
+        )
+        flags = 0x02  # Clean session
+        payload = _string(client_id)
+        if username is not None:
+            flags |= 0x80
+            payload += _string(username)
+        if password is not None:
+            flags |= 0x40
+            payload += _string(password)
+        body = _string("MQTT") + bytes([4, flags]) + struct.pack("!H", self.keepalive)
+        await self._send(_packet(_CONNECT, body + payload))
+
+        header, body = await self._read_packet(self.keepalive)
+        if header & 0xF0 != _CONNACK or len(body) < 2:
+            raise PetkitMqttError("Unexpected answer to MQTT CONNECT")
+        if body[1] != 0:
+            raise PetkitMqttError(f"MQTT connection refused (code {body[1]})")
+
+    async def subscribe(self, topics: Iterable[str], qos: int = 1) -> None:
+        """Subscribe to topics and wait for the acknowledgement."""
+        packet_id = self._next_packet_id()
+        body = struct.pack("!H", packet_id)
+        for topic in topics:
+            body += _string(topic) + bytes([qos])
+        await self._send(_packet(_SUBSCRIBE, body))
+
+        while True:
+            header, body = await self._read_packet(self.keepalive)
+            if header & 0xF0 == _SUBACK:
+                if 0x80 in body[2:]:
+                    raise PetkitMqttError("MQTT subscription refused")
+                return
+            if header & 0xF0 == _PUBLISH:
+                # A publication may arrive before the SUBACK
+                message = await self._handle_publish(header, body)
+                self._backlog.append(message)
+
+    async def messages(self) -> AsyncIterator[tuple[str, bytes]]:
+        """Yield the (topic, payload) of the received publications."""
+        while self._backlog:
+            yield self._backlog.pop(0)
+        while True:
+            timeout = self._last_sent + self.keepalive - time.monotonic()
+            try:
+                header, body = await self._read_packet(max(timeout, 0.1))
+            except TimeoutError:
+                if self._ping_sent:
+                    raise PetkitMqttError("MQTT broker stopped answering") from None
+                self._ping_sent = True
+                await self._send(_packet(_PINGREQ, b""))
+                continue
+
+            packet_type = header & 0xF0
+            if packet_type == _PUBLISH:
+                yield await self._handle_publish(header, body)
+            elif packet_type == _PINGRESP:
+                self._ping_sent = False
+            if (
+                not self._ping_sent
+                and time.monotonic() - self._last_sent >= self.keepalive
+            ):
+                # Publications keep coming, but the broker expects our traffic
+                self._ping_sent = True
+                await self._send(_packet(_PINGREQ, b""))
+
+    async def close(self) -> None:
+        """Disconnect from the broker."""
+        if self._writer is None:
+            return
+        try:
+            self._writer.write(_packet(_DISCONNECT, b""))
+            self._writer.close()
+            await self._writer.wait_closed()
+        except (OSError, ConnectionError):
+            pass
+        self._reader = self._writer = None
+
+    async def _handle_publish(self, header: int, body: bytes) -> tuple[str, bytes]:
+        """Decode a PUBLISH packet and acknowledge it if needed.
+        A malformed packet raises PetkitMqttError, so the connection is
+        closed and opened again, as MQTT requires.
+        """
+        qos = (header >> 1) & 0x03
+        try:
+            (topic_length,) = struct.unpack_from("!H", body)
+            topic = body[2 : 2 + topic_length].decode()
+        except (struct.error, UnicodeDecodeError) as err:
+            raise PetkitMqttError(f"Malformed MQTT PUBLISH packet: {err}") from err
+        offset = 2 + topic_length + (2 if qos else 0)
+        if len(body) < offset:
+            raise PetkitMqttError("Truncated MQTT PUBLISH packet")
+        if qos:
+            await self._send(_packet(_PUBACK, body[offset - 2 : offset]))
+        return topic, body[offset:]
+
+    async def _read_packet(self, timeout: float | None = None) -> tuple[int, bytes]:
+        """Read one packet, returning its first header byte and its body.
+        :param timeout: Seconds to wait for the packet to start. The rest of
+            the packet is always read, so a timeout never splits a packet.
+        """
+        if self._reader is None:
+            raise PetkitMqttError("MQTT client is not connected")
+        try:
+            header = (await _wait(self._reader.readexactly(1), timeout))[0]
+            length, multiplier = 0, 1
+            for _ in range(4):
+                byte = (await self._reader.readexactly(1))[0]
+                length += (byte & 0x7F) * multiplier
+                if not byte & 0x80:
+                    break
+                multiplier *= 128
+            return header, await self._reader.readexactly(length)
+        except asyncio.IncompleteReadError as err:
+            raise PetkitMqttError("MQTT connection closed by the broker") from err
+
+    async def _send(self, data: bytes) -> None:
+        if self._writer is None:
+            raise PetkitMqttError("MQTT client is not connected")
+        self._writer.write(data)
+        await self._writer.drain()
+        self._last_sent = time.monotonic()
+
+    def _next_packet_id(self) -> int:
+        self._packet_id = self._packet_id % 0xFFFF + 1
+        return self._packet_id
+
+
+@dataclass
+class MqttCredentials:
+    """Dataclass MqttCredentials.
+    Connection settings derived from the IoT configuration of the account.
+    """
+
+    host: str
+    port: int
+    client_id: str
+    username: str
+    password: str = field(repr=False)
+    topics: list[str]
+
+
+def mqtt_credentials(
+    info: IotInfo, tls: bool = False, timestamp: int | None = None
+) -> MqttCredentials:
+    """Build the MQTT connection settings of the account.
+    The IoT configuration follows the device authentication scheme of Aliyun
+    IoT: the password is the HMAC-SHA1 of the identity, keyed by the secret.
+    :param info: IoT configuration from get_iot_mqtt_config.
+    :param tls: True when the connection is encrypted.
+    :param timestamp: Signature timestamp in milliseconds, now if None.
+    :return: The connection settings.
+    """
+    if not (info.mqtt_host and info.device_name and info.product_key):
+        raise PetkitMqttError("Incomplete IoT configuration, cannot connect to MQTT")
+
+    host, _, port = info.mqtt_host.rpartition(":")
+    if not host or not port.isdigit():
+        host, port = info.mqtt_host, str(MQTT_PORT)
+
+    timestamp = timestamp or int(time.time() * 1000)
+    client_id = f"{info.product_key}.{info.device_name}"
+    content = (
+        f"clientId{client_id}deviceName{info.device_name}"
+        f"productKey{info.product_key}timestamp{timestamp}"
+    )
+    password = hmac.new(
+        (info.device_secret or "").encode(), content.encode(), hashlib.sha1
+    ).hexdigest()
+    return MqttCredentials(
+        host=host,
+        port=int(port),
+        client_id=(
+            f"{client_id}|securemode={2 if tls else 3},"
+            f"signmethod=hmacsha1,timestamp={timestamp}|"
+        ),
+        username=f"{info.device_name}&{info.product_key}",
+        password=password,
+        topics=[f"/{info.product_key}/{info.device_name}/user/get"],
+    )
+
+
+@dataclass
+class DeviceEvent:
+    """Dataclass DeviceEvent.
+    Event pushed by PetKit for one of the devices of the account.
+    """
+
+    device_id: int
+    event_type: str | None
+    data_types: list[str] | None  # None: all the data of the device
+    payload: dict[str, Any]
+
+
+def _find_value(payload: dict[str, Any], keys: tuple[str, ...]) -> Any:
+    """Return the first of ``keys`` found in the payload or its nested objects."""
+    for key in keys:
+        if payload.get(key) not in (None, ""):
+            return payload[key]
+    for nested_key in _NESTED_KEYS:
+        nested = payload.get(nested_key)
+        if isinstance(nested, str):
+            try:
+                nested = json.loads(nested)
+            except ValueError:
+                continue
+        if isinstance(nested, dict):
+            value = _find_value(nested, keys)
+            if value is not None:
+                return value
+    return None
+
+
+def decode_event(payload: bytes) -> DeviceEvent | None:
+    """Decode an MQTT payload into a device event.
+    :param payload: Raw payload.
+    :return: The event, or None if the payload does not target a device.
+    """
+    try:
+        data = json.loads(payload)
+    except ValueError:
+        _LOGGER.debug("Ignoring non JSON MQTT payload: %r", payload[:100])
+        return None
+    if not isinstance(data, dict):
+        return None
+
+    device_id = _find_value(data, _DEVICE_ID_KEYS)
+    try:
+        device_id = int(device_id)
+    except (TypeError, ValueError, OverflowError):
+        _LOGGER.debug("Ignoring MQTT payload without device ID: %s", data)
+        return None
+
+    event_type = _find_value(data, _EVENT_TYPE_KEYS)
+    event_type = str(event_type) if event_type is not None else None
+    kind = (event_type or "").lower()
+    data_types: list[str] | None = None
+    if kind in _RECORD_TYPES or _find_value(data, _RECORD_KEYS) is not None:
+        data_types = [DEVICE_DATA, DEVICE_RECORDS]
+    elif kind in _STATE_TYPES:
+        data_types = [DEVICE_DATA]
+    return DeviceEvent(device_id, event_type, data_types, data)
+
+
+class PetkitEventStream:
+    """Keep an MQTT subscription open and refresh the devices PetKit reports.
+
+    Each event only refreshes the device it targets, and when the event type
+    tells it, only its state or its records. The refreshes run in background
+    tasks, so the connection keeps acknowledging publications and answering
+    the keep alive while the API is slow. A device has at most one refresh
+    running: the events received meanwhile are merged into a single refresh
+    run after it. The connection is opened again with a growing delay when it
+    drops.
+    """
+
+    def __init__(
+        self,
+        client: PetKitClient,
+        tls: bool = False,
+        keepalive: int = MQTT_KEEPALIVE,
+    ) -> None:
+        """Initialize the event stream.
+        :param client: PetKit client.
+        :param tls: Connect to the broker with TLS.
+        :param keepalive: MQTT keep alive interval, in seconds.
+        """
+        self.client = client
+        self.tls = tls
+        self.keepalive = keepalive
+        self.connected = False
+        self._task: asyncio.Task | None = None
+        # Running refresh and data types to refresh after it, by device ID
+        self._refreshes: dict[int, asyncio.Task] = {}
+        self._pending: dict[int, list[str] | None] = {}
+        self._ssl_context: ssl.SSLContext | None = None
+
+    async def start(self) -> None:
+        """Start listening in the background."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop listening and disconnect."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+        refreshes = list(self._refreshes.values())
+        for refresh in refreshes:
+            refresh.cancel()
+        await asyncio.gather(*refreshes, return_exceptions=True)
+        # Tasks cancelled before they started did not unregister themselves
+        self._refreshes.clear()
+        self._pending.clear()
+
+    async def _run(self) -> None:
+        """Connect, listen and reconnect until stopped."""
+        delay = MQTT_RECONNECT_MIN
+        while True:
+            try:
+                await self._listen()
+                delay = MQTT_RECONNECT_MIN
+            except (PypetkitError, OSError, TimeoutError) as err:
+                _LOGGER.warning(
+                    "PetKit event stream disconnected (%s), retrying in %ss",
+                    err,
+                    delay,
+                )
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, MQTT_RECONNECT_MAX)
+
+    async def _listen(self) -> None:
+        """Open one MQTT connection and handle its events."""
+        info = await self.client.get_iot_mqtt_config()
+        credentials = mqtt_credentials(info, tls=self.tls)
+        mqtt = MqttClient(keepalive=self.keepalive)
+        try:
+            await mqtt.connect(
+                credentials.host,
+                credentials.port,
+                credentials.client_id,
+                credentials.username,
+                credentials.password,
+                await self._get_ssl_context() if self.tls else None,
+            )
+            await mqtt.subscribe(credentials.topics)
+            self.connected = True
+            _LOGGER.debug("PetKit event stream connected to %s", credentials.host)
+            async for topic, payload in mqtt.messages():
+                _LOGGER.debug("MQTT message on %s: %r", topic, payload[:200])
+                event = decode_event(payload)
+                if event is not None:
+                    self._handle_event(event)
+        finally:
+            self.connected = False
+            await mqtt.close()
+
+    async def _get_ssl_context(self) -> ssl.SSLContext:
+        """Return the TLS context, built once outside the event loop.
+        Loading the CA certificates reads from the disk.
+        """
+        if self._ssl_context is None:
+            loop = asyncio.get_running_loop()
+            self._ssl_context = await loop.run_in_executor(
+                None, ssl.create_default_context
+            )
+        return self._ssl_context
+
+    def _handle_event(self, event: DeviceEvent) -> None:
+        """Refresh the data of the device targeted by an event in the background.
+        While the device is refreshed, the event is merged into the next refresh.
+        """
+        device_id = event.device_id
+        if device_id in self._refreshes:
+            data_types = self._pending.get(device_id, [])
+            if data_types is not None and event.data_types is not None:
+                data_types = list(dict.fromkeys(data_types + event.data_types))
+            else:
+                data_types = None
+            self._pending[device_id] = data_types
+            _LOGGER.debug(
+                "Event %s for device %s, refresh of %s queued",
+                event.event_type,
+                device_id,
+                data_types or "all data",
+            )
+            return
+        _LOGGER.debug(
+            "Event %s for device %s, refreshing %s",
+            event.event_type,
+            device_id,
+            event.data_types or "all data",
+        )
+        self._refreshes[device_id] = asyncio.create_task(
+            self._refresh(device_id, event.data_types)
+        )
+
+    async def _refresh(self, device_id: int, data_types: list[str] | None) -> None:
+        """Refresh a device until no event is pending for it.
+        The failures are logged instead of dropping the stream.
+        """
+        try:
+            while True:
+                try:
+                    await self.client.refresh_device(device_id, data_types)
+                except (PypetkitError, OSError, TimeoutError) as err:
+                    _LOGGER.warning("Refresh of device %s failed: %s", device_id, err)
+                if device_id not in self._pending:
+                    return
+                data_types = self._pending.pop(device_id)
+        finally:
+            self._refreshes.pop(device_id, None)
@@ -0,0 +1,84 @@
+"""Diff of the device and pet lists of a PetKit account."""
+
+from dataclasses import dataclass, field
+
+from pypetkitapi.containers import AccountData, Device, Pet
+
+# Pet fields coming from the account data, the others are filled by the client
+PET_ROSTER_FIELDS = {"avatar", "created_at", "pet_id", "pet_name"}
+
+
+@dataclass
+class RosterDiff:
+    """Dataclass RosterDiff.
+    Devices and pets added, removed or changed between two roster fetches.
+    """
+
+    added_devices: list[Device] = field(default_factory=list)
+    removed_devices: list[Device] = field(default_factory=list)
+    changed_devices: list[Device] = field(default_factory=list)
+    added_pets: list[Pet] = field(default_factory=list)
+    removed_pets: list[Pet] = field(default_factory=list)
+    changed_pets: list[Pet] = field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        """Return True if anything changed."""
+        return any(
+            (
+                self.added_devices,
+                self.removed_devices,
+                self.changed_devices,
+                self.added_pets,
+                self.removed_pets,
+                self.changed_pets,
+            )
+        )
+
+
+def _devices(accounts: list[AccountData]) -> dict[int, Device]:
+    return {
+        device.device_id: device
+        for account in accounts
+        for device in account.device_list or []
+    }
+
+
+def _pets(accounts: list[AccountData]) -> dict[int, Pet]:
+    return {pet.pet_id: pet for account in accounts for pet in account.pet_list or []}
+
+
+def diff_roster(old: list[AccountData], new: list[AccountData]) -> RosterDiff:
+    """Compare two account data lists.
+    :param old: Account data currently used by the client.
+    :param new: Freshly fetched account data.
+    :return: The differences, holding the objects of ``new`` for added and
+        changed entries and those of ``old`` for removed ones.
+    """
+    diff = RosterDiff()
+
+    old_devices, new_devices = _devices(old), _devices(new)
+    for device_id, device in new_devices.items():
+        previous = old_devices.get(device_id)
+        if previous is None:
+            diff.added_devices.append(device)
+        elif previous.model_dump() != device.model_dump():
+            diff.changed_devices.append(device)
+    diff.removed_devices = [
+        device
+        for device_id, device in old_devices.items()
+        if device_id not in new_devices
+    ]
+
+    old_pets, new_pets = _pets(old), _pets(new)
+    for pet_id, pet in new_pets.items():
+        known = old_pets.get(pet_id)
+        if known is None:
+            diff.added_pets.append(pet)
+        elif known.model_dump(include=PET_ROSTER_FIELDS) != pet.model_dump(
+            include=PET_ROSTER_FIELDS
+        ):
+            diff.changed_pets.append(pet)
+    diff.removed_pets = [
+        pet for pet_id, pet in old_pets.items() if pet_id not in new_pets
+    ]
+    return diff
@@ -0,0 +1,79 @@
+"""Adaptive polling scheduler, deciding which device data is worth fetching."""
+
+from dataclasses import dataclass
+import logging
+import time
+from typing import Any
+
+from pypetkitapi.const import DEFAULT_POLL_INTERVALS, POLL_BACKOFF_START
+from pypetkitapi.utils import payload_digest
+
+_LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class _PollState:
+    """Polling state of one data class of one device."""
+
+    interval: float
+    next_due: float = 0.0
+    digest: str | None = None
+
+
+class PollScheduler:
+    """Per device and per data class polling intervals.
+
+    Each data class (``Feeder``, ``LitterRecord``, ``PackageInfoResult``...)
+    has a ``(min, max)`` interval in seconds. While the payloads returned by
+    the API do not change, the interval doubles up to ``max``. A change, a
+    command sent to the device or an event brings it back to ``min``.
+    Data classes missing from the table are fetched on every poll.
+    """
+
+    def __init__(self, intervals: dict[str, tuple[float, float]] | None = None) -> None:
+        """Initialize the scheduler.
+        :param intervals: ``(min, max)`` seconds by data class name, merged
+            over the defaults.
+        """
+        self.intervals = {**DEFAULT_POLL_INTERVALS, **(intervals or {})}
+        self._states: dict[tuple[int, str], _PollState] = {}
+
+    def is_due(self, device_id: int, data_class: str) -> bool:
+        """Return True if the data class of the device should be fetched."""
+        state = self._states.get((device_id, data_class))
+        return state is None or time.monotonic() >= state.next_due
+
+    def record(self, device_id: int, data_class: str, payload: Any) -> None:
+        """Plan the next fetch after a response.
+        :param device_id: ID of the device.
+        :param data_class: Name of the data class.
+        :param payload: Raw API response.
+        """
+        min_interval, max_interval = self.intervals.get(data_class, (0, 0))
+        digest = payload_digest(payload)
+        state = self._states.setdefault(
+            (device_id, data_class), _PollState(interval=min_interval)
+        )
+        if state.digest == digest:
+            state.interval = min(
+                max(state.interval * 2, POLL_BACKOFF_START, min_interval),
+                max_interval,
+            )
+        else:
+            state.interval = min_interval
+        state.digest = digest
+        state.next_due = time.monotonic() + state.interval
+        _LOGGER.debug(
+            "Next %s fetch for device %s in %ss", data_class, device_id, state.interval
+        )
+
+    def mark_dirty(self, device_id: int, data_class: str | None = None) -> None:
+        """Fetch the device data on the next poll and reset its intervals.
+        :param device_id: ID of the device.
+        :param data_class: Only this data class if set.
+        """
+        for (state_device, state_class), state in self._states.items():
+            if state_device == device_id and data_class in (None, state_class):
+                min_interval, _ = self.intervals.get(state_class, (0, 0))
+                state.interval = min_interval
+                state.next_due = 0.0
@@ -0,0 +1,87 @@
+"""Session stores, to keep the PetKit session across process restarts."""
+
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Callable
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any
+
+import aiofiles
+import aiofiles.os
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class SessionStore(ABC):
+    """Base class of the session stores.
+
+    The client saves a JSON serialisable dict holding the session token, the
+    gateway and the account data, and loads it back on start.
+    """
+
+    @abstractmethod
+    async def load(self) -> dict[str, Any] | None:
+        """Return the saved state, or None if nothing was saved."""
+
+    @abstractmethod
+    async def save(self, data: dict[str, Any]) -> None:
+        """Save the state."""
+
+
+class FileSessionStore(SessionStore):
+    """Store the session in a JSON file, readable by its owner only."""
+
+    def __init__(self, path: Path | str) -> None:
+        """Initialize the store.
+        :param path: Path of the JSON file.
+        """
+        self.path = Path(path)
+
+    async def load(self) -> dict[str, Any] | None:
+        """Return the saved state, or None if the file is missing or unreadable."""
+        if not await aiofiles.os.path.exists(self.path):
+            return None
+        try:
+            async with aiofiles.open(self.path, encoding="utf-8") as file:
+                return json.loads(await file.read())
+        except (OSError, ValueError) as e:
+            _LOGGER.warning("Ignoring unreadable session file %s: %s", self.path, e)
+            return None
+
+    async def save(self, data: dict[str, Any]) -> None:
+        """Write the state, replacing the file atomically."""
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        await aiofiles.os.makedirs(self.path.parent, exist_ok=True)
+        # The file holds a session token: create it with owner-only permissions
+        fd = await aiofiles.os.wrap(os.open)(
+            tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        async with aiofiles.open(fd, "w", encoding="utf-8") as file:
+            await file.write(json.dumps(data))
+        await aiofiles.os.replace(tmp_path, self.path)
+
+
+class CallbackSessionStore(SessionStore):
+    """Delegate the storage to user provided coroutines (e.g. a HA Store)."""
+
+    def __init__(
+        self,
+        load_cb: Callable[[], Awaitable[dict[str, Any] | None]],
+        save_cb: Callable[[dict[str, Any]], Awaitable[None]],
+    ) -> None:
+        """Initialize the store.
+        :param load_cb: Coroutine returning the saved state, or None.
+        :param save_cb: Coroutine saving the state.
+        """
+        self._load_cb = load_cb
+        self._save_cb = save_cb
+
+    async def load(self) -> dict[str, Any] | None:
+        """Return the saved state."""
+        return await self._load_cb()
+
+    async def save(self, data: dict[str, Any]) -> None:
+        """Save the state."""
+        await self._save_cb(data)
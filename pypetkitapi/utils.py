@@ -1,34 +1,103 @@
 """Utils functions for the PyPetKit API."""
 
 import asyncio
-from datetime import datetime
+from datetime import datetime, timedelta
+import hashlib
 import importlib.metadata
+import json
 import logging
+import math
+import time
+from typing import Any
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 _LOGGER = logging.getLogger(__name__)
 
 
+# Timezone offsets keyed by timezone name: (offset, UTC timestamp until which it is valid)
+_TZ_OFFSET_CACHE: dict[str, tuple[str, float]] = {}
+
+# How far ahead to look for the next DST transition
+_TZ_LOOKAHEAD_DAYS = 366
+
+
+def _next_transition(tz: ZoneInfo, now_ts: int, offset: timedelta) -> float:
+    """Return the UTC timestamp of the next change of the UTC offset of tz.
+    Probes one day at a time, then bisects down to the second. If no change
+    happens within the lookahead window, the end of the window is returned
+    so that the offset gets checked again then.
+    """
+
+    def offset_at(ts: int) -> timedelta | None:
+        return datetime.fromtimestamp(ts, tz).utcoffset()
+
+    day = 86400
+    probe = now_ts
+    for _ in range(_TZ_LOOKAHEAD_DAYS):
+        nxt = probe + day
+        if offset_at(nxt) != offset:
+            low, high = probe, nxt
+            while high - low > 1:
+                mid = (low + high) // 2
+                if offset_at(mid) == offset:
+                    low = mid
+                else:
+                    high = mid
+            return float(high)
+        probe = nxt
+    return float(probe)
+
+
+def _compute_timezone_offset(
+    timezone_user: str, now_ts: int | None = None
+) -> tuple[str, float]:
+    """Compute the timezone offset and the UTC timestamp until which it is valid."""
+    try:
+        tz = ZoneInfo(timezone_user)
+        now = datetime.now(tz) if now_ts is None else datetime.fromtimestamp(now_ts, tz)
+        offset = now.utcoffset()
+        if offset is None:
+            return "0.0", math.inf
+        valid_until = _next_transition(tz, int(now.timestamp()), offset)
+        return str(offset.total_seconds() / 3600), valid_until
+    except (ZoneInfoNotFoundError, AttributeError) as e:
+        _LOGGER.warning(
+            "Cannot get timezone offset for '%s' ZoneInfo return : %s",
+            timezone_user,
+            e,
+        )
+        return "0.0", math.inf
+
+
+def get_cached_timezone_offset(timezone_user: str) -> str | None:
+    """Return the cached timezone offset, or None if unknown or outdated by a DST change."""
+    cached = _TZ_OFFSET_CACHE.get(timezone_user)
+    if cached is None or time.time() >= cached[1]:
+        return None
+    return cached[0]
+
+
 async def get_timezone_offset(timezone_user: str) -> str:
-    """Get the timezone offset asynchronously."""
-
-    def get_tz():
-        try:
-            tz = ZoneInfo(timezone_user)
-            now = datetime.now(tz)
-            offset = now.utcoffset()
-            if offset is None:
-                return "0.0"
-            return str(offset.total_seconds() / 3600)
-        except (ZoneInfoNotFoundError, AttributeError) as e:
-            _LOGGER.warning(
-                "Cannot get timezone offset for '%s' ZoneInfo return : %s",
-                timezone_user,
-                e,
-            )
-            return "0.0"
-
-    return await asyncio.to_thread(get_tz)
+    """Get the timezone offset asynchronously.
+    The offset is cached until the next DST transition of the timezone, only a
+    cache miss loads the timezone data (from a worker thread).
+    """
+    cached = get_cached_timezone_offset(timezone_user)
+    if cached is not None:
+        return cached
+
+    offset, valid_until = await asyncio.to_thread(
+        _compute_timezone_offset, timezone_user
+    )
+    _TZ_OFFSET_CACHE[timezone_user] = (offset, valid_until)
+    return offset
+
+
+def payload_digest(payload: Any) -> str:
+    """Return a short digest of a JSON-like value, independent of the key order."""
+    return hashlib.blake2b(
+        json.dumps(payload, sort_keys=True, default=str).encode(), digest_size=16
+    ).hexdigest()
 
 
 def get_installed_packages():
@@ -0,0 +1,200 @@
+"""Change events emitted after each poll."""
+
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from pypetkitapi.changes import ChangeTracker, EntityChange
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.containers import AccountData, Device, Pet
+from pypetkitapi.litter_container import (
+    Litter,
+    LitterRecord,
+    LitterStats,
+    PackageInfoResult,
+    PackageListResult,
+    PetOutGraph,
+)
+from pypetkitapi.purifier_container import Purifier
+
+DEVICE_ID = 42
+
+
+def _purifier(mode: int, humidity: int = 50) -> Purifier:
+    return Purifier(
+        id=DEVICE_ID, sn="sn", name="k2", state={"mode": mode, "humidity": humidity}
+    )
+
+
+class TestChangeTracker(unittest.TestCase):
+
+    def test_leaf_changes_only(self):
+        tracker = ChangeTracker()
+        tracker.diff(DEVICE_ID, _purifier(1), ["name", "state"])
+
+        changes = tracker.diff(DEVICE_ID, _purifier(2), ["name", "state"])
+
+        self.assertEqual(changes, [EntityChange(DEVICE_ID, "state.mode", 1, 2)])
+
+    def test_first_snapshot_reports_set_fields(self):
+        changes = ChangeTracker().diff(DEVICE_ID, _purifier(1), ["name", "lack_warn"])
+        self.assertEqual(changes, [EntityChange(DEVICE_ID, "name", None, "k2")])
+
+    def test_forget(self):
+        tracker = ChangeTracker()
+        tracker.diff(DEVICE_ID, _purifier(1), ["name"])
+        tracker.forget(DEVICE_ID)
+        self.assertEqual(len(tracker.diff(DEVICE_ID, _purifier(1), ["name"])), 1)
+
+
+class TestClientChangeEvents(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.client = PetKitClient("user", "pwd", "DE", "Europe/Paris")
+        self.client.account_data = [
+            AccountData(
+                deviceList=[
+                    Device(
+                        createdAt=0,
+                        deviceId=DEVICE_ID,
+                        deviceType="k2",
+                        groupId=1,
+                        type=0,
+                        uniqueId="u",
+                    )
+                ]
+            )
+        ]
+        self.client.get_session_id = AsyncMock(return_value={})
+        self.client.req.request = AsyncMock()
+
+    def _respond(self, mode: int) -> None:
+        self.client.req.request.return_value = _purifier(mode).model_dump(by_alias=True)
+
+    async def test_only_changes_are_emitted(self):
+        listener = MagicMock()
+        self.client.subscribe_changes(listener)
+
+        self._respond(1)
+        await self.client.get_devices_data()
+        listener.reset_mock()
+
+        await self.client.get_devices_data()
+        listener.assert_not_called()
+
+        self._respond(2)
+        await self.client.get_devices_data()
+        listener.assert_called_once_with([EntityChange(DEVICE_ID, "state.mode", 1, 2)])
+
+    async def test_unsubscribe(self):
+        listener = MagicMock()
+        unsubscribe = self.client.subscribe_changes(listener)
+        unsubscribe()
+
+        self._respond(1)
+        await self.client.get_devices_data()
+
+        listener.assert_not_called()
+
+
+class TestClientSubDataChangeEvents(unittest.IsolatedAsyncioTestCase):
+    """Changes of the data fetched apart from the device data."""
+
+    async def asyncSetUp(self):
+        self.client = PetKitClient("user", "pwd", "DE", "Europe/Paris")
+        self.listener = MagicMock()
+        self.client.subscribe_changes(self.listener)
+
+    def _litter(self, device_type: str) -> tuple[Device, Litter]:
+        device = Device(
+            createdAt=0,
+            deviceId=DEVICE_ID,
+            deviceType=device_type,
+            groupId=1,
+            type=0,
+            uniqueId="u",
+        )
+        litter = Litter(id=DEVICE_ID, sn="sn", hardware=1, firmwareDetails=[])
+        litter.device_nfo = device
+        self.client.petkit_entities[DEVICE_ID] = litter
+        return device, litter
+
+    def _paths(self) -> list[str]:
+        """Emit the queued changes and return their paths."""
+        self.listener.reset_mock()
+        self.client._emit_changes()
+        if not self.listener.called:
+            return []
+        return [change.path for change in self.listener.call_args.args[0]]
+
+    async def test_device_stats(self):
+        device, _ = self._litter("t4")
+        await self.client._handle_device_stats(device, LitterStats(times=1), "t4")
+        self.assertEqual(self._paths(), ["device_stats"])
+
+        await self.client._handle_device_stats(device, LitterStats(times=2), "t4")
+        self.assertEqual(self._paths(), ["device_stats.times"])
+
+    async def test_pet_graph(self):
+        device, _ = self._litter("t6")
+        graph = [PetOutGraph(eventId="a", petId=1)]
+        await self.client._handle_device_stats(device, graph, "t6")
+        self.assertEqual(self._paths(), ["device_pet_graph_out"])
+
+        await self.client._handle_device_stats(device, graph, "t6")
+        self.assertEqual(self._paths(), [])
+
+    async def test_packages(self):
+        device, _ = self._litter("t6")
+        await self.client._handle_package_info(
+            device, PackageInfoResult(packageRecord=1), "t6"
+        )
+        await self.client._handle_package_list(device, PackageListResult(total=1), "t6")
+        self.assertEqual(self._paths(), ["package_info", "package_list"])
+
+        await self.client._handle_package_info(
+            device, PackageInfoResult(packageRecord=2), "t6"
+        )
+        await self.client._handle_package_list(device, PackageListResult(total=1), "t6")
+        self.assertEqual(self._paths(), ["package_info.package_record"])
+
+    async def test_medias(self):
+        device, _ = self._litter("t5")
+        self.client.media_manager.build_media_batch = MagicMock(
+            return_value={DEVICE_ID: ["media"]}
+        )
+
+        await self.client._fetch_media([device])
+
+        self.assertEqual(self._paths(), ["medias"])
+
+    async def test_pet_stats(self):
+        device, litter = self._litter("t4")
+        self.client.account_data = [AccountData(deviceList=[device])]
+        self.client._fetch_device_data = AsyncMock()
+        self.client.petkit_entities[101] = Pet(
+            avatar="", createdAt=0, petId=101, petName="Pet"
+        )
+        litter.device_records = [
+            LitterRecord(
+                petId=101,
+                timestamp=1000,
+                content={"petWeight": 4000, "timeIn": 1000, "timeOut": 1030},
+            )
+        ]
+        await self.client.refresh_device(DEVICE_ID)
+        self.assertIn(
+            EntityChange(101, "last_litter_usage", None, 1000),
+            self.listener.call_args.args[0],
+        )
+
+        litter.device_records[0].timestamp = 2000
+        await self.client.refresh_device(DEVICE_ID)
+
+        self.assertIn(
+            EntityChange(101, "last_litter_usage", 1000, 2000),
+            self.listener.call_args.args[0],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Per-device polling pipeline in PetKitClient.get_devices_data."""
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.const import MAX_CONCURRENT_DEVICES, PIPELINE_POLL
+from pypetkitapi.containers import AccountData, Device
+from pypetkitapi.feeder_container import Feeder, FeederRecord
+from pypetkitapi.purifier_container import Purifier
+
+SLOW_FEEDER_ID = 100
+FAST_PURIFIER_ID = 200
+
+
+def _device(device_id: int, device_type: str) -> Device:
+    return Device(
+        createdAt=0,
+        deviceId=device_id,
+        deviceType=device_type,
+        groupId=1,
+        type=0,
+        uniqueId=str(device_id),
+    )
+
+
+class TestDevicesPipeline(unittest.IsolatedAsyncioTestCase):
+    """Devices progress through their stages independently."""
+
+    def _client(self, **kwargs) -> PetKitClient:
+        client = PetKitClient("user", "pwd", "DE", "Europe/Paris", **kwargs)
+        client.account_data = [
+            AccountData(
+                deviceList=[
+                    _device(SLOW_FEEDER_ID, "d4"),
+                    _device(FAST_PURIFIER_ID, "k2"),
+                ]
+            )
+        ]
+        self.events: list[tuple[int, str]] = []
+
+        async def fake_fetch(device, data_class):
+            if device.device_id == SLOW_FEEDER_ID and data_class is Feeder:
+                await asyncio.sleep(0.05)
+            self.events.append((device.device_id, data_class.__name__))
+
+        client._fetch_device_data = fake_fetch
+        return client
+
+    async def test_fast_device_not_blocked_by_slow_device(self):
+        client = self._client()
+        await client.get_devices_data()
+
+        self.assertEqual(self.events[0], (FAST_PURIFIER_ID, Purifier.__name__))
+        self.assertLess(
+            self.events.index((SLOW_FEEDER_ID, Feeder.__name__)),
+            self.events.index((SLOW_FEEDER_ID, FeederRecord.__name__)),
+        )
+
+    async def test_concurrency_cap_serialises_devices(self):
+        client = self._client(**{MAX_CONCURRENT_DEVICES: 1})
+        await client.get_devices_data()
+
+        self.assertEqual(
+            self.events,
+            [
+                (SLOW_FEEDER_ID, Feeder.__name__),
+                (SLOW_FEEDER_ID, FeederRecord.__name__),
+                (FAST_PURIFIER_ID, Purifier.__name__),
+            ],
+        )
+
+    async def test_single_device_filter(self):
+        client = self._client()
+        await client.get_devices_data(device_id=FAST_PURIFIER_ID)
+
+        self.assertEqual(self.events, [(FAST_PURIFIER_ID, Purifier.__name__)])
+
+    async def test_barrier_mode_waits_for_every_device(self):
+        client = self._client(**{PIPELINE_POLL: False})
+        await client.get_devices_data()
+
+        self.assertEqual(self.events[-1], (SLOW_FEEDER_ID, FeederRecord.__name__))
+        self.assertEqual(self.events[1], (SLOW_FEEDER_ID, Feeder.__name__))
+
+    async def test_barrier_mode_builds_media_in_one_batch(self):
+        client = self._client(**{PIPELINE_POLL: False})
+        client.account_data[0].device_list.extend([_device(1, "d4h"), _device(2, "t5")])
+        client._fetch_media = AsyncMock()
+        await client.get_devices_data()
+
+        client._fetch_media.assert_awaited_once()
+        self.assertEqual(
+            [d.device_id for d in client._fetch_media.await_args.args[0]], [1, 2]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
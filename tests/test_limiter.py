@@ -0,0 +1,91 @@
+import asyncio
+import unittest
+
+from pypetkitapi.limiter import RequestLimiter
+
+HOST_A = "api.eu-pet.com"
+HOST_B = "api.petkt.com"
+
+
+class TestRequestLimiter(unittest.IsolatedAsyncioTestCase):
+
+    async def _run(self, limiter: RequestLimiter, hosts: list[str]) -> int:
+        """Run one short request per host entry and return the peak concurrency."""
+        active = 0
+        peak = 0
+
+        async def request(host: str) -> None:
+            nonlocal active, peak
+            async with limiter.slot(host):
+                active += 1
+                peak = max(peak, active)
+                await asyncio.sleep(0.01)
+                active -= 1
+
+        await asyncio.gather(*(request(host) for host in hosts))
+        return peak
+
+    async def test_global_limit(self):
+        limiter = RequestLimiter(max_concurrent=2, max_per_host=10)
+        peak = await self._run(limiter, [HOST_A] * 3 + [HOST_B] * 3)
+        self.assertEqual(peak, 2)
+
+    async def test_per_host_limit(self):
+        limiter = RequestLimiter(max_concurrent=10, max_per_host=1)
+        peak = await self._run(limiter, [HOST_A] * 3 + [HOST_B] * 3)
+        self.assertEqual(peak, 2)
+
+    async def test_saturated_host_does_not_block_others(self):
+        limiter = RequestLimiter(max_concurrent=2, max_per_host=1)
+        release = asyncio.Event()
+
+        async def hold(host: str) -> None:
+            async with limiter.slot(host):
+                await release.wait()
+
+        tasks = [asyncio.create_task(hold(HOST_A)) for _ in range(3)]
+        await asyncio.sleep(0)
+        # The queued HOST_A requests hold no global slot
+        async with asyncio.timeout(1), limiter.slot(HOST_B):
+            pass
+        release.set()
+        await asyncio.gather(*tasks)
+
+    async def test_stats(self):
+        limiter = RequestLimiter(max_concurrent=1, max_per_host=1)
+        await self._run(limiter, [HOST_A] * 3)
+
+        self.assertEqual(limiter.stats.requests, 3)
+        self.assertEqual(limiter.stats.waiting, 0)
+        self.assertEqual(limiter.stats.in_flight, 0)
+        self.assertGreater(limiter.stats.max_wait, 0)
+        self.assertGreater(limiter.host_stats[HOST_A].avg_wait, 0)
+
+    async def test_cancelled_while_waiting(self):
+        limiter = RequestLimiter(max_concurrent=1, max_per_host=1)
+        async with limiter.slot(HOST_A):
+
+            async def waiter():
+                async with limiter.slot(HOST_A):
+                    pass
+
+            task = asyncio.create_task(waiter())
+            await asyncio.sleep(0)
+            self.assertEqual(limiter.stats.waiting, 1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+        self.assertEqual(limiter.stats.waiting, 0)
+        self.assertEqual(limiter.stats.in_flight, 0)
+
+    async def test_rate_limit(self):
+        limiter = RequestLimiter(max_concurrent=10, max_per_host=1, rate_per_host=50)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await self._run(limiter, [HOST_A] * 4)
+        # 1 token of burst, then one more every 20ms
+        self.assertGreaterEqual(loop.time() - start, 0.05)
+
+
+if __name__ == "__main__":
+    unittest.main()
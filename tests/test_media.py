@@ -1,18 +1,31 @@
 import asyncio
+import tempfile
 import unittest
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
+
+import aiofiles
+import aiohttp
+from tenacity import stop_after_attempt, wait_none
+
 from pypetkitapi import Litter, LitterRecord, PetKitClient
 from pypetkitapi.media import (
     MediaManager,
+    MediaType,
     RecordType,
     Feeder,
     RecordsItems,
     MediaCloud,
 )
 from pypetkitapi.containers import CloudProduct
-from pypetkitapi.media import DownloadDecryptMedia
+from pypetkitapi.media import (
+    DownloadDecryptMedia,
+    PlaylistCache,
+    StreamDecryptor,
+    decrypt_blocks,
+)
 
 TS_WORK_INDATE = 1672531200  # 2023-01-01
 DEVICE_ID = 855554752
@@ -28,6 +41,70 @@ DECRYPTED_DATA = b"WElDrhuRtStQuIHKCurwFIKjdQriKnZSZbhPlKdbXSCDjIYNHFMWTmtyzReOO
 ENCRYPTED_DATA = b"\xf9\xab+\x83st\x87\xcf3\xd5\x99\xe4\xba\xbd\xad4%RN\xf5\x1c\x8b\xd6\x10\x8c\xf2\xbdz<\xcc\xf7{\xd1/\xd1\xaeu\x1c\x18\x9a\x8d\xf2\xab \x88\x8e\xd4\x9b\xb7\xac\x90\x1a\xb9\xb2\xd0TrZ\xc5\x80\x02\xc6\xb3\x84\x90\x04\xfe\x9d\xa6\x8b|Y\xec\xba\x05\xd5\x98\xde\x8d\xfd"
 
 
+def _response(status: int, data: bytes = ENCRYPTED_DATA, fail_after: int = 0):
+    """Return a mocked download, failing after ``fail_after`` bytes if set."""
+
+    async def iter_chunked(size):
+        if fail_after:
+            yield data[:fail_after]
+            raise aiohttp.ClientPayloadError("connection lost")
+        yield data
+
+    response = MagicMock()
+    response.status = status
+    response.content.iter_chunked = iter_chunked
+    response.raise_for_status.side_effect = aiohttp.ClientError(status)
+    context = MagicMock()
+    context.__aenter__ = AsyncMock(return_value=response)
+    context.__aexit__ = AsyncMock(return_value=None)
+    return context
+
+
+class TestPlaylistCache(unittest.IsolatedAsyncioTestCase):
+    """Test PlaylistCache class"""
+
+    async def test_concurrent_gets_share_one_resolution(self):
+        resolve = AsyncMock(return_value=(AES_KEY, "iv", ["1.ts"]))
+        cache = PlaylistCache(ttl=60)
+
+        results = await asyncio.gather(
+            cache.get(VIDEO_URL, resolve), cache.get(VIDEO_URL, resolve)
+        )
+
+        self.assertEqual(results[0], results[1])
+        resolve.assert_awaited_once()
+
+    async def test_ttl_and_invalidate(self):
+        resolve = AsyncMock(return_value=(AES_KEY, "iv", ["1.ts"]))
+        cache = PlaylistCache(ttl=60)
+        with patch("pypetkitapi.media.time.monotonic", return_value=1000):
+            await cache.get(VIDEO_URL, resolve)
+            await cache.get(VIDEO_URL, resolve)
+            self.assertEqual(resolve.await_count, 1)
+            cache.invalidate(VIDEO_URL)
+            await cache.get(VIDEO_URL, resolve)
+            self.assertEqual(resolve.await_count, 2)
+        with patch("pypetkitapi.media.time.monotonic", return_value=1060):
+            await cache.get(VIDEO_URL, resolve)
+            self.assertEqual(resolve.await_count, 3)
+
+    async def test_empty_and_failed_resolutions_not_cached(self):
+        cache = PlaylistCache()
+        resolve = AsyncMock(side_effect=[(None, None, []), ValueError("boom")])
+        await cache.get(VIDEO_URL, resolve)
+        with self.assertRaises(ValueError):
+            await cache.get(VIDEO_URL, resolve)
+
+        cache.prefetch(VIDEO_URL, AsyncMock(side_effect=ValueError("boom")))
+        await asyncio.sleep(0)
+        resolve = AsyncMock(return_value=(AES_KEY, "iv", ["1.ts"]))
+        cache.prefetch(VIDEO_URL, resolve)
+        self.assertEqual(
+            await cache.get(VIDEO_URL, AsyncMock()), (AES_KEY, "iv", ["1.ts"])
+        )
+        resolve.assert_awaited_once()
+
+
 class TestMediaManager(unittest.IsolatedAsyncioTestCase):
     """Test MediaManager class"""
 
@@ -36,7 +113,9 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         self.media_manager = MediaManager()
         self.download_path = Path("/mock/download/path")
         self.client = AsyncMock(spec=PetKitClient)
+        self.client.req = MagicMock(session=None)
         self.dl_decrypt_media = DownloadDecryptMedia(self.download_path, self.client)
+        self.addAsyncCleanup(self.dl_decrypt_media.close)
         self.dl_decrypt_media.file_data = MediaCloud(
             event_id=EVENT_ID_EAT,
             event_type=RecordType.EAT,
@@ -70,26 +149,54 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         feeder.device_records.eat = [MagicMock(items=[record_item])]
         self.feeder = feeder
 
-    async def test_process_feeder_no_records(self):
-        """Test _process_feeder method"""
+    @patch("pypetkitapi.media.MediaManager._date_folder")
+    async def test_build_media_batch(self, mock_date_folder):
+        """Test build_media_batch method"""
+        mock_date_folder.return_value = DATE_YYYYMMDD
+        self.feeder.id = DEVICE_ID
+        self.feeder.device_nfo.device_type = "d4h"
+        litter = MagicMock(spec=Litter)
+        litter.device_nfo = MagicMock(device_type="t4")
+        litter.cloud_product = None
+        litter.name = DEVICE_NAME
+
+        with patch.object(
+            MediaManager, "is_subscription_active", return_value=True
+        ) as mock_subscription:
+            batch = self.media_manager.build_media_batch([self.feeder, litter])
+            media_files = await self.media_manager.gather_all_media_from_cloud(
+                [self.feeder, litter]
+            )
+
+        self.assertEqual(list(batch), [DEVICE_ID])
+        self.assertEqual(batch[DEVICE_ID][0].event_id, EVENT_ID_EAT)
+        self.assertEqual(media_files, batch[DEVICE_ID])
+        # One clock reading for all the devices of a batch
+        self.assertEqual(
+            mock_subscription.call_args_list[0].args[1],
+            mock_subscription.call_args_list[1].args[1],
+        )
+
+    async def test_feeder_media_no_records(self):
+        """Test _feeder_media method"""
         self.feeder.device_records = None
-        result = await self.media_manager._process_feeder(self.feeder)
+        result = self.media_manager._feeder_media(self.feeder, True)
         self.assertEqual(result, [])
 
-    @patch("pypetkitapi.media.MediaManager._get_timestamp", new_callable=AsyncMock)
-    @patch("pypetkitapi.media.MediaManager.get_date_from_ts", new_callable=AsyncMock)
-    @patch("pypetkitapi.media.MediaManager.construct_video_url", new_callable=AsyncMock)
-    async def test_process_feeder(
-        self, mock_construct_video_url, mock_get_date_from_ts, mock_get_timestamp
+    @patch("pypetkitapi.media.MediaManager._item_timestamp")
+    @patch("pypetkitapi.media.MediaManager._date_folder")
+    @patch("pypetkitapi.media.MediaManager._video_url")
+    async def test_feeder_media(
+        self, mock_video_url, mock_date_folder, mock_item_timestamp
     ):
-        """Test _process_feeder method"""
+        """Test _feeder_media method"""
 
         # Mock return values
-        mock_get_timestamp.return_value = TS_WORK_INDATE
-        mock_get_date_from_ts.return_value = DATE_YYYYMMDD
-        mock_construct_video_url.return_value = VIDEO_URL
+        mock_item_timestamp.return_value = TS_WORK_INDATE
+        mock_date_folder.return_value = DATE_YYYYMMDD
+        mock_video_url.return_value = VIDEO_URL
 
-        media_files = await self.media_manager._process_feeder(self.feeder)
+        media_files = self.media_manager._feeder_media(self.feeder, True)
 
         self.assertEqual(len(media_files), 1)
         self.assertEqual(media_files[0].event_id, EVENT_ID_EAT)
@@ -104,33 +211,33 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(media_files[0].aes_key, AES_KEY)
         self.assertEqual(media_files[0].timestamp, TS_WORK_INDATE)
 
-    async def test_process_feeder_missing_records_data(self):
-        """Test _process_feeder method"""
+    async def test_feeder_media_missing_records_data(self):
+        """Test _feeder_media method"""
 
         # Test no user ID
         self.feeder.user.id = None
-        media_files = await self.media_manager._process_feeder(self.feeder)
+        media_files = self.media_manager._feeder_media(self.feeder, True)
         self.assertEqual(len(media_files), 0)
 
         # Test no aes_key
         self.feeder.user.id = USER_ID
         self.feeder.device_records.eat[0].items[0].aes_key = None
-        media_files = await self.media_manager._process_feeder(self.feeder)
+        media_files = self.media_manager._feeder_media(self.feeder, True)
         self.assertEqual(len(media_files), 0)
 
         # Test no item id
         self.feeder.device_records.eat[0].items[0].aes_key = AES_KEY
         self.feeder.device_records.eat[0].items[0].event_id = None
-        media_files = await self.media_manager._process_feeder(self.feeder)
+        media_files = self.media_manager._feeder_media(self.feeder, True)
         self.assertEqual(len(media_files), 0)
 
-    @patch("pypetkitapi.media.MediaManager._get_timestamp", new_callable=AsyncMock)
-    @patch("pypetkitapi.media.MediaManager.get_date_from_ts", new_callable=AsyncMock)
-    @patch("pypetkitapi.media.MediaManager.construct_video_url", new_callable=AsyncMock)
-    async def test_process_litter(
-        self, mock_construct_video_url, mock_get_date_from_ts, mock_get_timestamp
+    @patch("pypetkitapi.media.MediaManager._item_timestamp")
+    @patch("pypetkitapi.media.MediaManager._date_folder")
+    @patch("pypetkitapi.media.MediaManager._video_url")
+    async def test_litter_media(
+        self, mock_video_url, mock_date_folder, mock_item_timestamp
     ):
-        """Test _process_litter method"""
+        """Test _litter_media method"""
         # Mock Litter device
         litter = MagicMock(spec=Litter)
         litter.device_nfo = MagicMock()
@@ -154,11 +261,11 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         litter.device_records = [record_item]
 
         # Mock return values
-        mock_get_timestamp.return_value = TS_WORK_INDATE
-        mock_get_date_from_ts.return_value = DATE_YYYYMMDD
-        mock_construct_video_url.return_value = VIDEO_URL
+        mock_item_timestamp.return_value = TS_WORK_INDATE
+        mock_date_folder.return_value = DATE_YYYYMMDD
+        mock_video_url.return_value = VIDEO_URL
 
-        media_files = await self.media_manager._process_litter(litter)
+        media_files = self.media_manager._litter_media(litter, True)
 
         self.assertEqual(len(media_files), 1)
         self.assertEqual(media_files[0].event_id, EVENT_ID_TOILETING)
@@ -174,8 +281,8 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(media_files[0].aes_key, AES_KEY)
         self.assertEqual(media_files[0].timestamp, TS_WORK_INDATE)
 
-    async def test_get_timestamp(self):
-        """Test _get_timestamp method"""
+    def test_item_timestamp(self):
+        """Test _item_timestamp method"""
         media_manager = MediaManager()
 
         # Create a mock item with various timestamp attributes
@@ -189,20 +296,45 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         item.time = None
 
         # Test when timestamp is present
-        timestamp = await media_manager._get_timestamp(item)
+        timestamp = media_manager._item_timestamp(item)
         self.assertEqual(timestamp, TS_WORK_INDATE)
 
         # Test when timestamp is None but completed_at is present
         item.timestamp = None
         item.completed_at = 1672531300
-        timestamp = await media_manager._get_timestamp(item)
+        timestamp = media_manager._item_timestamp(item)
         self.assertEqual(timestamp, 1672531300)
 
         # Test when all attributes are None
         item.completed_at = None
-        timestamp = await media_manager._get_timestamp(item)
+        timestamp = media_manager._item_timestamp(item)
         self.assertIsNone(timestamp)
 
+    def test_video_url(self):
+        """Test _video_url method"""
+        device_type = "feeder"
+        event_data = MagicMock()
+        event_data.media_api = f"http://example.com/media?startTime=1234567890&deviceId={DEVICE_ID}&mark=1234567890"
+        event_data.eat_end_time = 123456789
+        user_id = USER_ID
+        cp_sub = True
+        expected_url = f"/feeder/cloud/video?startTime=1234567890&deviceId={DEVICE_ID}&userId={USER_ID}&mark=1234567890&endTime=123456789"
+
+        media_manager = MediaManager()
+        media_manager._debug_test = False
+
+        result = media_manager._video_url(device_type, event_data, user_id, cp_sub)
+        self.assertEqual(result, expected_url)
+
+        result = media_manager._video_url(device_type, None, user_id, cp_sub)
+        self.assertIsNone(result)
+
+        result = media_manager._video_url(device_type, event_data, None, cp_sub)
+        self.assertIsNone(result)
+
+        result = media_manager._video_url(device_type, event_data, user_id, None)
+        self.assertIsNone(result)
+
     async def test_construct_video_url(self):
         """Test construct_video_url method"""
         device_type = "feeder"
@@ -236,6 +368,15 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         )
         self.assertIsNone(result)
 
+    async def test_date_folder_matches_get_date_from_ts(self):
+        """Date folders are reused within a day and match get_date_from_ts"""
+        start = TS_WORK_INDATE - 3 * 86400
+        for timestamp in [0, *range(start, start + 7 * 86400, 3541), start]:
+            self.assertEqual(
+                self.media_manager._date_folder(timestamp),
+                await MediaManager.get_date_from_ts(timestamp),
+            )
+
     async def test_get_date_from_ts(self):
         """Test get_date_from_ts method"""
         # Test with a valid timestamp
@@ -250,6 +391,16 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         result = await MediaManager.get_date_from_ts(timestamp)
         self.assertEqual(result, expected_date)
 
+    def test_date_folder(self):
+        """Test _date_folder method"""
+        # Test with a valid timestamp
+        result = MediaManager()._date_folder(TS_WORK_INDATE)
+        self.assertEqual(result, DATE_YYYYMMDD)
+
+        # Test with None or zero timestamp
+        self.assertEqual(MediaManager()._date_folder(None), "unknown")
+        self.assertEqual(MediaManager()._date_folder(0), "unknown")
+
     def test_is_subscription_active(self):
         """Test is_subscription_active method"""
         # Create a MediaManager instance
@@ -287,43 +438,49 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         feeder.cloud_product = None
         self.assertFalse(media_manager.is_subscription_active(feeder))
 
+    @patch("pypetkitapi.media.aiofiles.os.path.exists", new_callable=AsyncMock)
     @patch("pypetkitapi.media.DownloadDecryptMedia.get_fpath", new_callable=AsyncMock)
-    async def test_needs_download(self, mock_get_fpath):
+    async def test_needs_download(self, mock_get_fpath, mock_exists):
         """Test needs_download method"""
         # Mock the file path
-        mock_file_path = AsyncMock(spec=Path)
+        mock_file_path = MagicMock(spec=Path)
         mock_get_fpath.return_value = mock_file_path
 
         # Test when file exists
-        mock_file_path.exists.return_value = True
+        mock_exists.return_value = True
         result = await self.dl_decrypt_media.needs_download("test_file.jpg")
         self.assertFalse(result)
-        mock_file_path.exists.assert_called_once()
+        mock_exists.assert_awaited_once_with(mock_file_path)
 
         # Test when file does not exist
-        mock_file_path.exists.return_value = False
+        mock_exists.return_value = False
         result = await self.dl_decrypt_media.needs_download("test_file.jpg")
         self.assertTrue(result)
-        self.assertEqual(mock_file_path.exists.call_count, 2)
+        self.assertEqual(mock_exists.await_count, 2)
 
     @patch("pypetkitapi.media.DownloadDecryptMedia.get_fpath", new_callable=AsyncMock)
-    @patch("pypetkitapi.media.Path.exists", new_callable=MagicMock)
-    async def test_concat_segments_output_exists(self, mock_exists, mock_get_fpath):
+    @patch("pypetkitapi.media.aiofiles.os.remove", new_callable=AsyncMock)
+    @patch("pypetkitapi.media.aiofiles.os.path.exists", new_callable=AsyncMock)
+    async def test_concat_segments_output_exists(
+        self, mock_exists, mock_remove, mock_get_fpath
+    ):
         # Mock the paths
         mock_ts_files = [MagicMock(spec=Path) for _ in range(3)]
         mock_output_file = MagicMock(spec=Path)
         mock_get_fpath.side_effect = [mock_output_file] + mock_ts_files
 
         # Mock the existence of the output file
-        mock_exists.side_effect = [True] + [False] * 3
+        mock_exists.return_value = True
 
         # Call the method
         await self.dl_decrypt_media._concat_segments(mock_ts_files, "output.mp4")
 
         # Assertions
         mock_get_fpath.assert_called()
-        for mock_ts_file in mock_ts_files:
-            mock_ts_file.unlink.assert_called_once()
+        mock_exists.assert_awaited_once_with(mock_output_file)
+        self.assertEqual(
+            [c.args[0] for c in mock_remove.await_args_list], mock_ts_files
+        )
 
     async def test_get_fpath_image(self):
         """Test get_fpath method when the file name is an image"""
@@ -352,46 +509,314 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         result = await self.dl_decrypt_media.get_fpath(file_name)
         self.assertNotEqual(result, expected_path)
 
-    async def test_delete_segments(self):
+    @patch("pypetkitapi.media.aiofiles.os.remove", new_callable=AsyncMock)
+    async def test_delete_segments(self, mock_remove):
         """Test _delete_segments method"""
         mock_paths = [MagicMock(spec=Path) for _ in range(3)]
-        for mock_path in mock_paths:
-            mock_path.exists.return_value = True
         await DownloadDecryptMedia._delete_segments(mock_paths)
 
-        for mock_path in mock_paths:
-            mock_path.unlink.assert_called_once()
+        self.assertEqual([c.args[0] for c in mock_remove.await_args_list], mock_paths)
 
-    async def test_delete_segments_file_not_found(self):
+    @patch("pypetkitapi.media.aiofiles.os.remove", new_callable=AsyncMock)
+    async def test_delete_segments_file_not_found(self, mock_remove):
         """Test _delete_segments method when file is not found"""
+        mock_remove.side_effect = FileNotFoundError
         mock_paths = [MagicMock(spec=Path) for _ in range(3)]
-        for mock_path in mock_paths:
-            mock_path.exists.return_value = False
         await DownloadDecryptMedia._delete_segments(mock_paths)
-        for mock_path in mock_paths:
-            mock_path.unlink.assert_not_called()
+        self.assertEqual(mock_remove.await_count, 3)
+
+    async def test_known_dirs(self):
+        """Directories are created once, and again after a failed save"""
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch(
+                "pypetkitapi.media.aiofiles.os.makedirs", new_callable=AsyncMock
+            ) as mock_makedirs,
+        ):
+            folder = Path(tmp) / "day"
+            await self.dl_decrypt_media._ensure_dir(folder)
+            await self.dl_decrypt_media._ensure_dir(folder)
+            mock_makedirs.assert_awaited_once_with(folder, exist_ok=True)
+
+            self.dl_decrypt_media._download_resumable = AsyncMock(
+                side_effect=FileNotFoundError
+            )
+            self.assertFalse(
+                await self.dl_decrypt_media._save_file(
+                    IMG_URL, AES_KEY, folder / "file.jpg"
+                )
+            )
+            await self.dl_decrypt_media._ensure_dir(folder)
+            self.assertEqual(mock_makedirs.await_count, 2)
 
     @patch("pypetkitapi.media.aiohttp.ClientSession.get")
-    @patch(
-        "pypetkitapi.media.DownloadDecryptMedia._decrypt_data", new_callable=AsyncMock
-    )
-    @patch("pypetkitapi.media.DownloadDecryptMedia._save_file", new_callable=AsyncMock)
-    async def test_get_file(self, mock_save_file, mock_decrypt_data, mock_get):
+    async def test_get_file(self, mock_get):
+        """The download is decrypted chunk by chunk into the final file"""
+
+        async def iter_chunked(size):
+            for start in range(0, len(ENCRYPTED_DATA), 7):
+                yield ENCRYPTED_DATA[start : start + 7]
+
         mock_response = MagicMock()
         mock_response.status = 200
-        mock_response.read = AsyncMock(return_value=ENCRYPTED_DATA)
+        mock_response.content.iter_chunked = iter_chunked
         mock_get.return_value.__aenter__.return_value = mock_response
-        mock_decrypt_data.return_value = DECRYPTED_DATA
-        mock_save_file.return_value = Path("/mock/download/path/test_file.jpg")
 
-        result = await self.dl_decrypt_media._get_file(
-            "http://example.com/file", AES_KEY, "test_file.jpg"
+        with tempfile.TemporaryDirectory() as tmp:
+            self.dl_decrypt_media.download_path = Path(tmp)
+            result = await self.dl_decrypt_media._get_file(
+                "http://example.com/file", AES_KEY, "test_file.jpg"
+            )
+
+            self.assertTrue(result)
+            mock_get.assert_called_once_with("http://example.com/file", headers=None)
+            file_path = await self.dl_decrypt_media.get_fpath("test_file.jpg")
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA)
+            self.assertEqual(list(file_path.parent.iterdir()), [file_path])
+
+    async def test_decrypt_to_file_in_executor(self):
+        """Chunks are decrypted in the given executor behind a bounded queue"""
+        queues = []
+        sizes = []
+        real_queue = asyncio.Queue
+
+        async def iter_chunked(size):
+            for start in range(0, len(ENCRYPTED_DATA), 16):
+                sizes.append(queues[0].qsize())
+                yield ENCRYPTED_DATA[start : start + 16]
+
+        def track_queue(maxsize):
+            queue = real_queue(maxsize)
+            queues.append(queue)
+            return queue
+
+        response = MagicMock()
+        response.content.iter_chunked = iter_chunked
+        with (
+            ThreadPoolExecutor(max_workers=2) as executor,
+            tempfile.TemporaryDirectory() as tmp,
+            patch("pypetkitapi.media.asyncio.Queue", side_effect=track_queue),
+        ):
+            downloader = DownloadDecryptMedia(
+                Path(tmp),
+                self.client,
+                media_executor=executor,
+                media_decrypt_queue_size=1,
+            )
+            file_path = Path(tmp) / "file.jpg"
+            async with aiofiles.open(file_path, "wb") as file:
+                await downloader._write_decrypted(response, AES_KEY, file)
+
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA)
+        self.assertEqual(queues[0].maxsize, 1)
+        self.assertLessEqual(max(sizes), 1)
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_stream_segments(self, mock_get):
+        """Segments are decrypted in order into one file"""
+        mock_get.side_effect = [_response(200), _response(200)]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            self.dl_decrypt_media.download_path = Path(tmp)
+            result = await self.dl_decrypt_media._stream_segments(
+                ["http://example.com/1.ts", "http://example.com/2.ts"],
+                AES_KEY,
+                "video.mp4",
+            )
+
+            self.assertTrue(result)
+            file_path = await self.dl_decrypt_media.get_fpath("video.mp4")
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA * 2)
+            self.assertEqual(list(file_path.parent.iterdir()), [file_path])
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_stream_segments_failed_segment(self, mock_get):
+        """A refused or missing segment stops the video, never saved with a gap"""
+        for segments, responses in (
+            (["1.ts", "2.ts", "3.ts"], [_response(200), _response(403)]),
+            (["1.ts", None, "3.ts"], [_response(200)]),
+        ):
+            mock_get.reset_mock()
+            mock_get.side_effect = responses
+            with tempfile.TemporaryDirectory() as tmp:
+                self.dl_decrypt_media.download_path = Path(tmp)
+                self.assertFalse(
+                    await self.dl_decrypt_media._stream_segments(
+                        segments, AES_KEY, "video.mp4"
+                    )
+                )
+
+                # Not retried, the first segment is kept for the next run
+                self.assertEqual(mock_get.call_count, len(responses))
+                file_path = await self.dl_decrypt_media.get_fpath("video.mp4")
+                self.assertFalse(file_path.exists())
+                self.assertEqual(
+                    sorted(path.name for path in file_path.parent.iterdir()),
+                    ["video.mp4.manifest", "video.mp4.tmp"],
+                )
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_stream_segments_resume(self, mock_get):
+        """An interrupted video only downloads its missing segments"""
+        segments = ["1.ts", "2.ts", "3.ts"]
+        mock_get.side_effect = [_response(200), _response(200, fail_after=32)]
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch.object(
+                DownloadDecryptMedia._stream_segment.retry,
+                "stop",
+                stop_after_attempt(1),
+            ),
+        ):
+            self.dl_decrypt_media.download_path = Path(tmp)
+            self.assertFalse(
+                await self.dl_decrypt_media._stream_segments(
+                    segments, AES_KEY, "video.mp4"
+                )
+            )
+            mock_get.reset_mock()
+            mock_get.side_effect = [_response(200), _response(200)]
+
+            self.assertTrue(
+                await self.dl_decrypt_media._stream_segments(
+                    segments, AES_KEY, "video.mp4"
+                )
+            )
+
+            self.assertEqual([c.args[0] for c in mock_get.call_args_list], segments[1:])
+            file_path = await self.dl_decrypt_media.get_fpath("video.mp4")
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA * 3)
+            self.assertEqual(list(file_path.parent.iterdir()), [file_path])
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_get_file_retries_and_resumes(self, mock_get):
+        """A download resumes with a Range request after a lost connection"""
+        mock_get.side_effect = [
+            _response(503),
+            _response(200, fail_after=40),
+            _response(206, ENCRYPTED_DATA[32:]),
+        ]
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch.object(
+                DownloadDecryptMedia._download_resumable.retry, "wait", wait_none()
+            ),
+        ):
+            self.dl_decrypt_media.download_path = Path(tmp)
+            result = await self.dl_decrypt_media._get_file(
+                "http://example.com/file", AES_KEY, "test_file.jpg"
+            )
+
+            self.assertTrue(result)
+            self.assertEqual(
+                [c.kwargs["headers"] for c in mock_get.call_args_list],
+                [None, None, {"Range": "bytes=32-"}],
+            )
+            file_path = await self.dl_decrypt_media.get_fpath("test_file.jpg")
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA)
+            self.assertEqual(list(file_path.parent.iterdir()), [file_path])
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_get_file_resumes_on_next_run(self, mock_get):
+        """The position of a failed download is kept in a sidecar file"""
+        mock_get.side_effect = [_response(200, fail_after=20)]
+
+        with (
+            tempfile.TemporaryDirectory() as tmp,
+            patch.object(
+                DownloadDecryptMedia._download_resumable.retry,
+                "stop",
+                stop_after_attempt(1),
+            ),
+        ):
+            self.dl_decrypt_media.download_path = Path(tmp)
+            self.assertFalse(
+                await self.dl_decrypt_media._get_file(
+                    "http://example.com/file", AES_KEY, "test_file.jpg"
+                )
+            )
+            file_path = await self.dl_decrypt_media.get_fpath("test_file.jpg")
+            self.assertEqual(
+                file_path.with_name("test_file.jpg.tmp").stat().st_size, 16
+            )
+            mock_get.side_effect = [_response(206, ENCRYPTED_DATA[16:])]
+
+            self.assertTrue(
+                await self.dl_decrypt_media._get_file(
+                    "http://example.com/file", AES_KEY, "test_file.jpg"
+                )
+            )
+
+            self.assertEqual(
+                mock_get.call_args.kwargs["headers"], {"Range": "bytes=16-"}
+            )
+            self.assertEqual(file_path.read_bytes(), DECRYPTED_DATA)
+            self.assertEqual(list(file_path.parent.iterdir()), [file_path])
+
+    async def test_get_video_m3u8_ffmpeg_option(self):
+        """Segments are streamed into a .ts file, or remuxed by ffmpeg if set"""
+        segments = (AES_KEY, "iv", ["1.ts", "2.ts"])
+        name = f"{DEVICE_ID}_{TS_WORK_INDATE}"
+        for kwargs, use_ffmpeg, file_name in (
+            ({}, False, f"{name}.ts"),
+            ({"media_ffmpeg": False}, False, f"{name}.ts"),
+            ({"media_ffmpeg": True}, True, f"{name}.mp4"),
+        ):
+            downloader = DownloadDecryptMedia(self.download_path, self.client, **kwargs)
+            downloader.file_data = self.dl_decrypt_media.file_data
+            downloader._get_m3u8_segments = AsyncMock(return_value=segments)
+            downloader._stream_segments = AsyncMock()
+            downloader._get_video_ffmpeg = AsyncMock()
+
+            await downloader._get_video_m3u8()
+
+            used = (
+                downloader._get_video_ffmpeg
+                if use_ffmpeg
+                else downloader._stream_segments
+            )
+            unused = (
+                downloader._stream_segments
+                if use_ffmpeg
+                else downloader._get_video_ffmpeg
+            )
+            used.assert_awaited_once_with(segments[2], AES_KEY, file_name)
+            unused.assert_not_awaited()
+
+    async def test_video_saved_either_way_not_downloaded_again(self):
+        """A video already saved as .ts or as .mp4 is skipped"""
+        downloader = self.dl_decrypt_media
+        downloader._get_video_m3u8 = AsyncMock(return_value=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            downloader.download_path = Path(tmp)
+            for extension in ("ts", "mp4"):
+                path = await downloader.get_fpath(
+                    f"{downloader.file_data.event_id}.{extension}"
+                )
+                self.assertEqual(path.parent.name, "video")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                path.touch()
+
+                await downloader.download_file(downloader.file_data, [MediaType.VIDEO])
+
+                downloader._get_video_m3u8.assert_not_awaited()
+                path.unlink()
+
+    async def test_failed_video_invalidates_playlist(self):
+        """Fresh segment URLs are resolved after a failed video"""
+        downloader = self.dl_decrypt_media
+        downloader._use_ffmpeg = False
+        downloader.resolve_playlist = AsyncMock(
+            return_value=(AES_KEY, "iv", ["1.ts", "2.ts"])
         )
+        downloader._stream_segments = AsyncMock(side_effect=[False, True])
 
-        self.assertTrue(result)
-        mock_get.assert_called_once_with("http://example.com/file")
-        mock_decrypt_data.assert_called_once_with(ENCRYPTED_DATA, AES_KEY)
-        mock_save_file.assert_called_once_with(DECRYPTED_DATA, "test_file.jpg")
+        self.assertFalse(await downloader._get_video_m3u8())
+        self.assertTrue(await downloader._get_video_m3u8())
+
+        self.assertEqual(downloader.resolve_playlist.await_count, 2)
 
     @patch("pypetkitapi.media.aiohttp.ClientSession.get")
     async def test_get_file_download_failure(self, mock_get):
@@ -404,14 +829,114 @@ class TestMediaManager(unittest.IsolatedAsyncioTestCase):
         )
 
         self.assertFalse(result)
-        mock_get.assert_called_once_with("http://example.com/file")
+        mock_get.assert_called_once_with("http://example.com/file", headers=None)
+
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_get_file_dedupe(self, mock_get):
+        """Copies of a URL or of a content are hard linked, not saved again"""
+        mock_get.side_effect = lambda *args, **kwargs: _response(200)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            self.dl_decrypt_media.download_path = Path(tmp)
+            results = await asyncio.gather(
+                self.dl_decrypt_media._get_file(IMG_URL, AES_KEY, "a.jpg"),
+                self.dl_decrypt_media._get_file(IMG_URL, AES_KEY, "b.jpg"),
+            )
+            await self.dl_decrypt_media._get_file(
+                "http://example.com/other.jpg", AES_KEY, "c.jpg"
+            )
+
+            self.assertEqual(results, [True, True])
+            self.assertEqual(mock_get.call_count, 2)
+            paths = [
+                await self.dl_decrypt_media.get_fpath(name)
+                for name in ("a.jpg", "b.jpg", "c.jpg")
+            ]
+            self.assertEqual(paths[2].read_bytes(), DECRYPTED_DATA)
+            self.assertEqual(len({path.stat().st_ino for path in paths}), 1)
+            self.assertEqual(sorted(paths[0].parent.iterdir()), paths)
+
+            # A deleted copy is downloaded again
+            paths[0].unlink()
+            paths[1].unlink()
+            paths[2].unlink()
+            self.assertTrue(
+                await self.dl_decrypt_media._get_file(IMG_URL, AES_KEY, "d.jpg")
+            )
+            self.assertEqual(mock_get.call_count, 3)
 
-    async def test_decrypt_data(self):
-        """Test _decrypt_data method"""
-        decrypted_data = await DownloadDecryptMedia._decrypt_data(
-            ENCRYPTED_DATA, AES_KEY
+    @patch("pypetkitapi.media.aiohttp.ClientSession.get")
+    async def test_get_file_dedupe_copy_or_disabled(self, mock_get):
+        """Files are copied without hard links, and saved twice when disabled"""
+        mock_get.side_effect = lambda *args, **kwargs: _response(200)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for dedupe, downloads in ((True, 1), (False, 2)):
+                mock_get.reset_mock()
+                downloader = DownloadDecryptMedia(
+                    Path(tmp) / str(dedupe), self.client, media_dedupe=dedupe
+                )
+                self.addAsyncCleanup(downloader.close)
+                downloader.file_data = self.dl_decrypt_media.file_data
+                with patch(
+                    "pypetkitapi.media.aiofiles.os.link", side_effect=OSError("EXDEV")
+                ):
+                    for name in ("a.jpg", "b.jpg"):
+                        self.assertTrue(
+                            await downloader._get_file(IMG_URL, AES_KEY, name)
+                        )
+
+                self.assertEqual(mock_get.call_count, downloads)
+                first = await downloader.get_fpath("a.jpg")
+                second = await downloader.get_fpath("b.jpg")
+                self.assertEqual(second.read_bytes(), DECRYPTED_DATA)
+                self.assertNotEqual(first.stat().st_ino, second.stat().st_ino)
+
+    async def test_client_session_used_by_default(self):
+        """Without options, the session of the client is used and left open"""
+        async with aiohttp.ClientSession() as session:
+            self.client.req.session = session
+            downloader = DownloadDecryptMedia(self.download_path, self.client)
+            self.assertIs(downloader._get_session(), session)
+            await downloader.close()
+            self.assertFalse(session.closed)
+
+    async def test_pooled_session_reused(self):
+        """Downloads share one pooled session, closed by close()"""
+        downloader = DownloadDecryptMedia(
+            self.download_path,
+            self.client,
+            media_max_connections_per_host=3,
+            media_pooled_session=True,
         )
-        self.assertEqual(decrypted_data, DECRYPTED_DATA)
+        session = downloader._get_session()
+        self.assertIs(downloader._get_session(), session)
+        self.assertEqual(session.connector.limit_per_host, 3)
+
+        await downloader.close()
+        self.assertTrue(session.closed)
+
+    async def test_injected_session_not_closed(self):
+        """A session provided by the caller is used and left open"""
+        async with aiohttp.ClientSession() as session:
+            async with DownloadDecryptMedia(
+                self.download_path, self.client, session=session
+            ) as downloader:
+                self.assertIs(downloader._get_session(), session)
+            self.assertFalse(session.closed)
+
+    def test_stream_decryptor_any_chunk_size(self):
+        """Incremental decryption matches the one-shot decryption"""
+        for size in (1, 15, 16, 17, 64, 1000):
+            decryptor = StreamDecryptor(AES_KEY)
+            decrypted = b"".join(
+                decrypt_blocks(
+                    decryptor.key, *decryptor.feed(ENCRYPTED_DATA[start : start + size])
+                )
+                for start in range(0, len(ENCRYPTED_DATA), size)
+            )
+            decrypted += decrypt_blocks(decryptor.key, *decryptor.tail(), final=True)
+            self.assertEqual(decrypted, DECRYPTED_DATA)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,309 @@
+"""Persistent media index."""
+
+from pathlib import Path
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pypetkitapi.const import MediaType, RecordType
+from pypetkitapi.media import DownloadDecryptMedia, MediaCloud, MediaFile, MediaManager
+from pypetkitapi.media_index import MediaIndex
+
+DEVICE_ID = 42
+
+
+def _media_file(
+    event_id: str,
+    timestamp: int,
+    media_type=MediaType.IMAGE,
+    event_type=RecordType.EAT,
+):
+    return MediaFile(
+        event_id=event_id,
+        device_id=DEVICE_ID,
+        timestamp=timestamp,
+        media_type=media_type,
+        event_type=event_type,
+        full_file_path=Path(f"/media/{event_type}/{event_id}.{media_type}"),
+    )
+
+
+class TestMediaIndex(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.index = MediaIndex()
+        self.addAsyncCleanup(self.index.close)
+
+    async def test_add_contains_remove(self):
+        await self.index.add(
+            [_media_file("a", 1), _media_file("a", 1, MediaType.VIDEO)]
+        )
+
+        self.assertTrue(await self.index.contains("a", RecordType.EAT, MediaType.IMAGE))
+        self.assertEqual(await self.index.count(), 2)
+
+        await self.index.remove("a", RecordType.EAT, MediaType.IMAGE)
+        self.assertFalse(
+            await self.index.contains("a", RecordType.EAT, MediaType.IMAGE)
+        )
+        self.assertTrue(await self.index.contains("a", RecordType.EAT, MediaType.VIDEO))
+
+    async def test_record_types_sharing_an_event_id(self):
+        await self.index.add(
+            [
+                _media_file("1_100", 1, event_type=RecordType.TOILETING),
+                _media_file("1_100", 1, event_type=RecordType.WASTE_CHECK),
+            ]
+        )
+
+        self.assertEqual(await self.index.count(), 2)
+        self.assertEqual(
+            await self.index.indexed(
+                [
+                    ("1_100", RecordType.TOILETING, MediaType.IMAGE),
+                    ("1_100", RecordType.WASTE_CHECK, MediaType.IMAGE),
+                    ("1_100", RecordType.WASTE_CHECK, MediaType.VIDEO),
+                    ("other", RecordType.TOILETING, MediaType.IMAGE),
+                ]
+            ),
+            {
+                ("1_100", RecordType.TOILETING, MediaType.IMAGE),
+                ("1_100", RecordType.WASTE_CHECK, MediaType.IMAGE),
+            },
+        )
+        await self.index.remove("1_100", RecordType.TOILETING, MediaType.IMAGE)
+        self.assertTrue(
+            await self.index.contains("1_100", RecordType.WASTE_CHECK, MediaType.IMAGE)
+        )
+
+    async def test_query_filters(self):
+        await self.index.add(
+            [
+                _media_file("a", 100),
+                _media_file("b", 200, MediaType.VIDEO),
+                _media_file("c", 300),
+            ]
+        )
+
+        self.assertEqual(
+            [
+                m.event_id
+                for m in await self.index.query(device_id=DEVICE_ID, start=200)
+            ],
+            ["b", "c"],
+        )
+        self.assertEqual(
+            [
+                m.event_id
+                for m in await self.index.query(end=300, media_types=[MediaType.IMAGE])
+            ],
+            ["a"],
+        )
+        self.assertEqual(await self.index.query(event_types=[RecordType.MOVE]), [])
+        self.assertEqual(await self.index.query(device_id=1), [])
+        self.assertEqual(await self.index.query(start=300), [_media_file("c", 300)])
+
+    async def test_content(self):
+        media_file = _media_file("a", 1)
+        await self.index.add([media_file])
+        await self.index.add_content("http://a", "digest", media_file.full_file_path)
+
+        self.assertEqual(
+            await self.index.find_content(url="http://a"), media_file.full_file_path
+        )
+        self.assertEqual(
+            await self.index.find_content(url="http://b", digest="digest"),
+            media_file.full_file_path,
+        )
+        self.assertIsNone(await self.index.find_content(digest="other"))
+
+        await self.index.remove("a", RecordType.EAT, MediaType.IMAGE)
+        self.assertIsNone(await self.index.find_content(url="http://a"))
+
+    async def test_content_urls_sharing_a_file(self):
+        """URLs linked to the same file are all found after a restart"""
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "media.db"
+            path = Path(tmp) / "a.jpg"
+            index = MediaIndex(db_path)
+            await index.add_content("http://a", "digest", path)
+            await index.add_content("http://b", "digest", path)
+            await index.close()
+
+            index = MediaIndex(db_path)
+            self.assertEqual(await index.find_content(url="http://a"), path)
+            self.assertEqual(await index.find_content(url="http://b"), path)
+            await index.close()
+
+    async def test_queries_run_off_the_event_loop(self):
+        loop_thread = threading.get_ident()
+        threads = set()
+        with patch.object(
+            MediaIndex,
+            "_select",
+            autospec=True,
+            side_effect=lambda *_: threads.add(threading.get_ident()) or [],
+        ):
+            await self.index.query()
+            await self.index.eviction_order()
+
+        self.assertEqual(len(threads), 1)
+        self.assertNotIn(loop_thread, threads)
+
+    async def test_persistent(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "media.db"
+            index = MediaIndex(db_path)
+            await index.add([_media_file("a", 1)])
+            await index.mark_scanned(DEVICE_ID)
+            await index.close()
+
+            index = MediaIndex(db_path)
+            self.assertTrue(await index.contains("a", RecordType.EAT, MediaType.IMAGE))
+            self.assertTrue(await index.is_scanned(DEVICE_ID))
+            await index.close()
+
+    async def test_older_index_upgraded(self):
+        """An index without sizes and with the older table keys is upgraded"""
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = Path(tmp) / "media.db"
+            db = sqlite3.connect(db_path)
+            db.execute(
+                "CREATE TABLE media (event_id TEXT, media_type TEXT, device_id INTEGER,"
+                " timestamp INTEGER, event_type TEXT, path TEXT,"
+                " PRIMARY KEY (event_id, media_type))"
+            )
+            db.execute("CREATE INDEX media_device_time ON media (device_id, timestamp)")
+            db.execute(
+                "INSERT INTO media VALUES ('a', 'jpg', 42, 1, 'eat', '/media/a.jpg')"
+            )
+            db.execute(
+                "CREATE TABLE content (path TEXT PRIMARY KEY, url TEXT, digest TEXT)"
+            )
+            db.execute("CREATE INDEX content_url ON content (url)")
+            db.execute(
+                "INSERT INTO content VALUES ('/media/a.jpg', 'http://a', 'digest')"
+            )
+            db.commit()
+            db.close()
+
+            index = MediaIndex(db_path)
+            await index.add(
+                [
+                    _media_file("b", 2),
+                    _media_file("a", 1, event_type=RecordType.DISH_BEFORE),
+                ]
+            )
+            self.assertEqual(await index.usage(DEVICE_ID), (3, 0))
+            self.assertEqual(
+                [m.event_id for m in await index.unsized()], ["a", "b", "a"]
+            )
+            await index.add_content("http://b", "digest", Path("/media/a.jpg"))
+            self.assertEqual(
+                await index.find_content(url="http://a"), Path("/media/a.jpg")
+            )
+            await index.close()
+
+
+class TestMediaManagerIndex(unittest.IsolatedAsyncioTestCase):
+
+    async def test_disk_scanned_once(self):
+        index = MediaIndex()
+        manager = MediaManager(media_index=index)
+        now = int(time.time())
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = Path(tmp)
+            for day, timestamp in (("20230101", 1672531200), ("today", now)):
+                folder = storage / str(DEVICE_ID) / day / "eat" / "snapshot"
+                folder.mkdir(parents=True)
+                (folder / f"{DEVICE_ID}_{timestamp}.jpg").touch()
+            # Streamed videos are saved as MPEG-TS
+            video = storage / str(DEVICE_ID) / "20230101" / "eat" / "video"
+            video.mkdir()
+            (video / f"{DEVICE_ID}_1672531200.ts").touch()
+
+            today = await manager.gather_all_media_from_disk(storage, DEVICE_ID)
+
+            with patch("pypetkitapi.media.os.scandir", side_effect=AssertionError):
+                self.assertEqual(
+                    await manager.gather_all_media_from_disk(storage, DEVICE_ID),
+                    today,
+                )
+
+        self.assertEqual([m.timestamp for m in today], [now])
+        self.assertEqual(await index.count(), 3)
+        for media_type in (MediaType.IMAGE, MediaType.VIDEO):
+            self.assertTrue(
+                await index.contains(
+                    f"{DEVICE_ID}_1672531200", RecordType.EAT, media_type
+                )
+            )
+        await index.close()
+
+    async def test_missing_files_by_record_type(self):
+        """Files of record types sharing an event id are listed separately"""
+        index = MediaIndex()
+        self.addAsyncCleanup(index.close)
+        manager = MediaManager(media_index=index)
+        await index.add([_media_file("1_100", 100, event_type=RecordType.EAT)])
+        media_list = [
+            MediaCloud(
+                event_id="1_100",
+                event_type=event_type,
+                device_id=DEVICE_ID,
+                user_id=1,
+                image="http://example.com/image.jpg",
+                video=None,
+                filepath="path",
+                aes_key="key",
+                timestamp=100,
+            )
+            for event_type in (RecordType.EAT, RecordType.DISH_BEFORE)
+        ]
+
+        missing = await manager.list_missing_files(
+            media_list, [MediaType.IMAGE], [RecordType.EAT, RecordType.DISH_BEFORE]
+        )
+
+        self.assertEqual([m.event_type for m in missing], [RecordType.DISH_BEFORE])
+
+    async def test_download_is_indexed(self):
+        index = MediaIndex()
+        downloader = DownloadDecryptMedia(
+            Path("/media"), MagicMock(), media_index=index
+        )
+        downloader._get_file = AsyncMock(side_effect=[True, False])
+        media = MediaCloud(
+            event_id="event",
+            event_type=RecordType.EAT,
+            device_id=DEVICE_ID,
+            user_id=1,
+            image="http://example.com/image.jpg",
+            video=None,
+            filepath="path",
+            aes_key="key",
+            timestamp=1,
+        )
+
+        with patch.object(DownloadDecryptMedia, "needs_download", return_value=True):
+            self.assertTrue(await downloader.download_file(media, [MediaType.IMAGE]))
+            self.assertTrue(
+                await index.contains("event", RecordType.EAT, MediaType.IMAGE)
+            )
+
+            await index.remove("event", RecordType.EAT, MediaType.IMAGE)
+            # Failed download: reported, not indexed
+            self.assertFalse(await downloader.download_file(media, [MediaType.IMAGE]))
+            self.assertFalse(
+                await index.contains("event", RecordType.EAT, MediaType.IMAGE)
+            )
+
+        self.assertEqual(downloader._get_file.await_count, 2)
+        await index.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,182 @@
+"""Media retention: age, size and count limits enforced from the index."""
+
+import asyncio
+from datetime import datetime, timedelta
+from pathlib import Path
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, patch
+
+import aiofiles.os
+
+from pypetkitapi.const import MediaType, RecordType
+from pypetkitapi.media import MediaFile
+from pypetkitapi.media_index import MediaIndex
+from pypetkitapi.media_retention import MediaRetention, RetentionLimits
+
+NOW = int(datetime.now().timestamp())
+DAY = 86400
+
+
+class TestMediaRetention(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = Path(tmp.name)
+        self.index = MediaIndex()
+        self.addAsyncCleanup(self.index.close)
+
+    async def _add(
+        self,
+        name: str,
+        timestamp: int,
+        device_id: int = 1,
+        media_type: MediaType = MediaType.IMAGE,
+        size: int = 10,
+        indexed_size: bool = True,
+        event_type: RecordType = RecordType.EAT,
+    ) -> Path:
+        subdir = "snapshot" if media_type == MediaType.IMAGE else "video"
+        path = (
+            self.storage
+            / str(device_id)
+            / name
+            / event_type
+            / subdir
+            / f"{name}.{media_type}"
+        )
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        await self.index.add(
+            [
+                MediaFile(
+                    event_id=name,
+                    device_id=device_id,
+                    timestamp=timestamp,
+                    media_type=media_type,
+                    event_type=event_type,
+                    full_file_path=path,
+                    size=size if indexed_size else None,
+                )
+            ]
+        )
+        return path
+
+    async def _names(self) -> list[str]:
+        return sorted(media.event_id for media in await self.index.query())
+
+    async def test_max_age(self):
+        old = await self._add("old", NOW - 3 * DAY)
+        await self._add("new", NOW)
+        retention = MediaRetention(
+            self.index, RetentionLimits(max_age=timedelta(days=2)), batch_size=1
+        )
+
+        self.assertEqual(await retention.prune(), 1)
+
+        self.assertEqual(await self._names(), ["new"])
+        self.assertFalse(old.exists())
+        # Empty folders are removed up to the date folder
+        self.assertEqual(
+            [path.name for path in (self.storage / "1").iterdir()], ["new"]
+        )
+
+    async def test_device_bytes_videos_first(self):
+        await self._add("video_new", NOW, media_type=MediaType.VIDEO, size=100)
+        await self._add("image_old", NOW - DAY, size=100, indexed_size=False)
+        await self._add("video_old", NOW - DAY, media_type=MediaType.VIDEO, size=100)
+        await self._add("other", NOW - DAY, device_id=2, size=1000)
+        retention = MediaRetention(
+            self.index, device_limits={1: RetentionLimits(max_bytes=150)}
+        )
+
+        self.assertEqual(await retention.prune(), 2)
+
+        self.assertEqual(await self._names(), ["image_old", "other"])
+        self.assertEqual(await self.index.usage(1), (1, 100))
+
+    async def test_global_count(self):
+        for day in range(4):
+            await self._add(f"day{day}", NOW - day * DAY, device_id=day % 2)
+        retention = MediaRetention(self.index, RetentionLimits(max_files=2))
+
+        self.assertEqual(await retention.prune(), 2)
+        self.assertEqual(await self._names(), ["day0", "day1"])
+        self.assertEqual(await retention.prune(), 0)
+
+    async def test_record_types_of_one_event(self):
+        toileting = await self._add(
+            "event", NOW - 3 * DAY, event_type=RecordType.TOILETING
+        )
+        waste_check = await self._add(
+            "event", NOW - 3 * DAY, event_type=RecordType.WASTE_CHECK
+        )
+        retention = MediaRetention(
+            self.index, RetentionLimits(max_age=timedelta(days=2))
+        )
+
+        self.assertEqual(await retention.prune(), 2)
+
+        self.assertEqual(await self.index.count(), 0)
+        self.assertFalse(toileting.exists())
+        self.assertFalse(waste_check.exists())
+
+    def _lock(self, *paths: Path):
+        """Patch the file removal to fail for some paths."""
+        real_remove = aiofiles.os.remove
+
+        async def remove(path):
+            if path in paths:
+                raise PermissionError(path)
+            await real_remove(path)
+
+        return patch("pypetkitapi.media_retention.aiofiles.os.remove", remove)
+
+    async def test_failed_delete_kept_indexed(self):
+        locked = await self._add("locked", NOW - 3 * DAY)
+        gone = await self._add("gone", NOW - 3 * DAY)
+        await self._add("new", NOW)
+        gone.unlink()
+        retention = MediaRetention(
+            self.index, RetentionLimits(max_age=timedelta(days=2))
+        )
+
+        with self._lock(locked):
+            # The missing file is dropped, the locked one is retried later
+            self.assertEqual(await retention.prune(), 1)
+
+        self.assertEqual(await self._names(), ["locked", "new"])
+        self.assertTrue(locked.exists())
+
+        self.assertEqual(await retention.prune(), 1)
+        self.assertEqual(await self._names(), ["new"])
+
+    async def test_failed_delete_count(self):
+        locked = await self._add("day3", NOW - 3 * DAY)
+        for day in range(3):
+            await self._add(f"day{day}", NOW - day * DAY)
+        retention = MediaRetention(
+            self.index, RetentionLimits(max_files=2), batch_size=2
+        )
+
+        with self._lock(locked):
+            # The locked file is skipped, the next ones deleted in its place
+            self.assertEqual(await retention.prune(), 2)
+
+        self.assertEqual(await self._names(), ["day0", "day3"])
+
+    async def test_background(self):
+        retention = MediaRetention(self.index, interval=0)
+        retention.prune = AsyncMock(side_effect=[OSError("busy"), 0, 0])
+
+        await retention.start()
+        while retention.prune.await_count < 3:
+            await asyncio.sleep(0)
+        await retention.stop()
+
+        self.assertIsNone(retention._task)
+
+
+if __name__ == "__main__":
+    unittest.main()
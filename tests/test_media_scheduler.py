@@ -0,0 +1,184 @@
+"""Media download scheduler: priorities, caps and bounded queue."""
+
+import asyncio
+from pathlib import Path
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pypetkitapi.const import MediaType, RecordType
+from pypetkitapi.media import MediaCloud
+from pypetkitapi.media_scheduler import DownloadProgress, MediaDownloadScheduler
+
+
+def _media(
+    event_id: str,
+    timestamp: int,
+    device_id: int = 1,
+    video=True,
+    event_type: RecordType = RecordType.EAT,
+):
+    return MediaCloud(
+        event_id=event_id,
+        event_type=event_type,
+        device_id=device_id,
+        user_id=1,
+        image="http://example.com/image.jpg",
+        video="http://example.com/video.m3u8" if video else None,
+        filepath="path",
+        aes_key="key",
+        timestamp=timestamp,
+    )
+
+
+class TestMediaDownloadScheduler(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.downloaded: list[tuple[str, MediaType]] = []
+        self.running: dict[int, int] = {}
+        self.max_running: dict[int, int] = {}
+
+        async def download_file(media, file_type):
+            device_id = media.device_id
+            self.running[device_id] = self.running.get(device_id, 0) + 1
+            self.max_running[device_id] = max(
+                self.max_running.get(device_id, 0), self.running[device_id]
+            )
+            await asyncio.sleep(0)
+            self.running[device_id] -= 1
+            if media.event_id == "broken":
+                raise ValueError("broken")
+            if media.event_id == "failed":
+                return False
+            self.downloaded.append((media.event_id, file_type[0]))
+            return True
+
+        patcher = patch(
+            "pypetkitapi.media_scheduler.DownloadDecryptMedia.download_file",
+            new=AsyncMock(side_effect=download_file),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _scheduler(self, **kwargs) -> MediaDownloadScheduler:
+        return MediaDownloadScheduler(Path("/tmp/media"), MagicMock(), **kwargs)
+
+    async def test_priorities(self):
+        scheduler = self._scheduler(media_max_downloads=1)
+        scheduler.add([_media("old", 100), _media("new", 200)])
+
+        await scheduler.run()
+        await scheduler.close()
+
+        self.assertEqual(
+            self.downloaded,
+            [
+                ("new", MediaType.IMAGE),
+                ("old", MediaType.IMAGE),
+                ("new", MediaType.VIDEO),
+                ("old", MediaType.VIDEO),
+            ],
+        )
+
+    async def test_dedupe(self):
+        scheduler = self._scheduler()
+        self.assertEqual(scheduler.add([_media("a", 1, video=False)]), 1)
+        self.assertEqual(scheduler.add([_media("a", 1)], [MediaType.IMAGE]), 0)
+        await scheduler.run()
+        self.assertEqual(self.downloaded, [("a", MediaType.IMAGE)])
+        # Finished jobs are forgotten, the index skips them when listing
+        self.assertEqual(scheduler._seen, set())
+        await scheduler.close()
+
+    async def test_record_types_sharing_an_event_id(self):
+        scheduler = self._scheduler()
+        media_list = [
+            _media("1_100", 100, video=False, event_type=event_type)
+            for event_type in (
+                RecordType.EAT,
+                RecordType.DISH_BEFORE,
+                RecordType.DISH_AFTER,
+            )
+        ]
+
+        self.assertEqual(scheduler.add(media_list), 3)
+        await scheduler.run()
+        self.assertEqual(len(self.downloaded), 3)
+
+    async def test_concurrency_caps(self):
+        scheduler = self._scheduler(media_max_downloads=3, media_max_device_downloads=1)
+        scheduler.add(
+            [_media(f"{d}_{i}", i, device_id=d) for d in (1, 2) for i in range(3)]
+        )
+
+        await scheduler.run()
+
+        self.assertEqual(self.max_running, {1: 1, 2: 1})
+        self.assertEqual(len(self.downloaded), 12)
+
+    async def test_bounded_queue_keeps_highest_priority(self):
+        scheduler = self._scheduler(media_download_queue_size=2)
+        scheduler.add([_media("old", 100), _media("new", 200)])
+
+        self.assertEqual(scheduler.progress.queued, 2)
+        self.assertEqual(scheduler.progress.dropped, 2)
+        await scheduler.run()
+        self.assertCountEqual(
+            self.downloaded, [("new", MediaType.IMAGE), ("old", MediaType.IMAGE)]
+        )
+        # Dropped jobs can be queued again
+        self.assertEqual(scheduler.add([_media("new", 200)], [MediaType.VIDEO]), 1)
+
+    async def test_progress_and_failures(self):
+        scheduler = self._scheduler()
+        updates: list[DownloadProgress] = []
+        remove = scheduler.add_progress_listener(
+            lambda progress: updates.append(DownloadProgress(**vars(progress)))
+        )
+        scheduler.add(
+            [
+                _media("ok", 1, video=False),
+                _media("broken", 2, video=False),
+                _media("failed", 3, video=False),
+            ]
+        )
+
+        progress = await scheduler.run()
+        remove()
+
+        self.assertEqual((progress.completed, progress.failed), (1, 2))
+        self.assertEqual(progress.remaining, 0)
+        self.assertEqual(updates[0].queued, 3)
+        self.assertEqual(updates[-1].remaining, 0)
+        # Failed jobs, raising or not, can be queued again
+        self.assertEqual(
+            scheduler.add(
+                [_media("broken", 2, video=False), _media("failed", 3, video=False)]
+            ),
+            2,
+        )
+
+    async def test_playlists_prefetched_for_next_videos(self):
+        scheduler = self._scheduler(media_max_downloads=1, media_prefetch=2)
+        resolved: list[tuple[str, int]] = []
+
+        async def resolve_playlist(video_url):
+            resolved.append((video_url, len(self.downloaded)))
+            return "key", "iv", ["1.ts"]
+
+        scheduler._downloader.resolve_playlist = resolve_playlist
+        media_list = [_media(str(i), i) for i in range(3)]
+        for media in media_list:
+            media.video = f"http://example.com/{media.event_id}.m3u8"
+        scheduler.add(media_list, [MediaType.VIDEO])
+
+        await scheduler.run()
+
+        # Resolved while the first download was running, before their turn
+        self.assertEqual(
+            resolved,
+            [("http://example.com/1.m3u8", 0), ("http://example.com/0.m3u8", 0)],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,323 @@
+"""MQTT event stream, against a local broker stand-in."""
+
+import asyncio
+import hashlib
+import hmac
+import json
+import struct
+import unittest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.const import DEVICE_DATA, DEVICE_RECORDS
+from pypetkitapi.containers import AccountData, Device, IotInfo
+from pypetkitapi.exceptions import PetkitMqttError
+from pypetkitapi.litter_container import LitterRecord
+from pypetkitapi.mqtt import (
+    DeviceEvent,
+    MqttClient,
+    PetkitEventStream,
+    _wait,
+    decode_event,
+    mqtt_credentials,
+)
+
+IOT_INFO = {
+    "deviceName": "dn",
+    "deviceSecret": "secret",
+    "productKey": "pk",
+    "mqttHost": "mqtt.example.com",
+}
+
+
+def _string(value: str) -> bytes:
+    return struct.pack("!H", len(value)) + value.encode()
+
+
+def _publish(topic: str, payload: dict, packet_id: int = 1) -> bytes:
+    body = _string(topic) + struct.pack("!H", packet_id) + json.dumps(payload).encode()
+    return bytes([0x32, len(body)]) + body  # QoS 1
+
+
+class FakeBroker:
+    """Accept one client, acknowledge CONNECT/SUBSCRIBE, then publish events."""
+
+    def __init__(self, events: list[dict]) -> None:
+        self.events = events
+        self.connect_body = b""
+        self.subscribed: list[str] = []
+        self.pubacks: list[int] = []
+        self.done = asyncio.Event()
+
+    async def start(self) -> int:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def _read(self, reader) -> tuple[int, bytes]:
+        header = (await reader.readexactly(1))[0]
+        length = (await reader.readexactly(1))[0]
+        return header, await reader.readexactly(length)
+
+    async def _handle(self, reader, writer) -> None:
+        _, self.connect_body = await self._read(reader)
+        writer.write(bytes([0x20, 2, 0, 0]))
+        _, body = await self._read(reader)
+        (topic_length,) = struct.unpack_from("!H", body, 2)
+        self.subscribed.append(body[4 : 4 + topic_length].decode())
+        writer.write(bytes([0x90, 3]) + body[:2] + bytes([1]))
+        for packet_id, event in enumerate(self.events, start=1):
+            writer.write(_publish(self.subscribed[0], event, packet_id))
+        await writer.drain()
+        while len(self.pubacks) < len(self.events):
+            header, body = await self._read(reader)
+            if header == 0x40:
+                self.pubacks.append(struct.unpack("!H", body)[0])
+        self.done.set()
+        await reader.read()
+        writer.close()
+
+
+class TestMqttCredentials(unittest.TestCase):
+
+    def test_aliyun_signature(self):
+        credentials = mqtt_credentials(IotInfo(**IOT_INFO), timestamp=1700000000000)
+
+        content = "clientIdpk.dndeviceNamednproductKeypktimestamp1700000000000"
+        expected = hmac.new(b"secret", content.encode(), hashlib.sha1).hexdigest()
+        self.assertEqual(credentials.password, expected)
+        self.assertEqual(credentials.username, "dn&pk")
+        self.assertEqual(credentials.port, 1883)
+        self.assertTrue(credentials.client_id.startswith("pk.dn|securemode=3,"))
+        self.assertEqual(credentials.topics, ["/pk/dn/user/get"])
+
+    def test_host_with_port(self):
+        info = IotInfo(**{**IOT_INFO, "mqttHost": "10.0.0.1:8883"})
+        credentials = mqtt_credentials(info, tls=True)
+        self.assertEqual((credentials.host, credentials.port), ("10.0.0.1", 8883))
+        self.assertIn("securemode=2", credentials.client_id)
+
+
+class TestDecodeEvent(unittest.TestCase):
+
+    def test_nested_device_id_and_record_event(self):
+        event = decode_event(
+            json.dumps(
+                {"type": "feed_record", "content": json.dumps({"deviceId": "42"})}
+            ).encode()
+        )
+        self.assertEqual(event.device_id, 42)
+        self.assertEqual(event.data_types, [DEVICE_DATA, DEVICE_RECORDS])
+
+    def test_state_event(self):
+        event = decode_event(b'{"deviceId": 42, "eventType": "state_change"}')
+        self.assertEqual(event.data_types, [DEVICE_DATA])
+
+    def test_unknown_event_refreshes_everything(self):
+        self.assertIsNone(decode_event(b'{"deviceId": 42}').data_types)
+        # No substring matching: "pet" or "work" in a type is not a record
+        self.assertIsNone(
+            decode_event(b'{"deviceId": 42, "type": "petkit_network"}').data_types
+        )
+
+    def test_record_key(self):
+        event = decode_event(b'{"deviceId": 42, "type": "x", "eventId": "e1"}')
+        self.assertEqual(event.data_types, [DEVICE_DATA, DEVICE_RECORDS])
+
+    def test_ignored_payloads(self):
+        self.assertIsNone(decode_event(b"not json"))
+        self.assertIsNone(decode_event(b'{"type": "state"}'))
+
+
+class TestEventStream(unittest.IsolatedAsyncioTestCase):
+
+    async def test_event_triggers_targeted_refresh(self):
+        broker = FakeBroker(
+            [
+                {"deviceId": 42, "type": "state"},
+                {"deviceId": 7, "type": "eat_record"},
+            ]
+        )
+        port = await broker.start()
+        client = MagicMock()
+        client.get_iot_mqtt_config = AsyncMock(
+            return_value=IotInfo(**{**IOT_INFO, "mqttHost": f"127.0.0.1:{port}"})
+        )
+        release = asyncio.Event()
+
+        async def refresh_device(*_):
+            # Blocks until all the publications are acknowledged
+            await release.wait()
+
+        client.refresh_device = AsyncMock(side_effect=refresh_device)
+        stream = PetkitEventStream(client)
+
+        await stream.start()
+        await asyncio.wait_for(broker.done.wait(), 5)
+        release.set()
+        while client.refresh_device.await_count < 2:
+            await asyncio.sleep(0.01)
+        await stream.stop()
+        await broker.stop()
+
+        self.assertEqual(broker.subscribed, ["/pk/dn/user/get"])
+        self.assertIn(b"dn&pk", broker.connect_body)
+        self.assertEqual(broker.pubacks, [1, 2])
+        self.assertEqual(
+            [c.args for c in client.refresh_device.await_args_list],
+            [(42, [DEVICE_DATA]), (7, [DEVICE_DATA, DEVICE_RECORDS])],
+        )
+        self.assertFalse(stream.connected)
+
+    async def test_unanswered_ping_drops_connection(self):
+        received: list[bytes] = []
+
+        async def handle(reader, writer):
+            length = (await reader.readexactly(2))[1]
+            await reader.readexactly(length)
+            writer.write(bytes([0x20, 2, 0, 0]))
+            await writer.drain()
+            received.append(await reader.readexactly(2))
+            await reader.read()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        mqtt = MqttClient(keepalive=1)
+        await mqtt.connect("127.0.0.1", server.sockets[0].getsockname()[1], "id")
+
+        with self.assertRaises(PetkitMqttError):
+            await asyncio.wait_for(anext(mqtt.messages()), 5)
+        self.assertEqual(received, [bytes([0xC0, 0])])
+
+        await mqtt.close()
+        server.close()
+        await server.wait_closed()
+
+    async def test_refreshes_coalesced_by_device(self):
+        client = MagicMock()
+        release = asyncio.Event()
+
+        async def refresh_device(*_):
+            await release.wait()
+
+        client.refresh_device = AsyncMock(side_effect=refresh_device)
+        stream = PetkitEventStream(client)
+        for device_id, data_types in (
+            (42, [DEVICE_DATA]),
+            (7, [DEVICE_DATA]),
+            (42, [DEVICE_DATA]),
+            (42, [DEVICE_RECORDS]),
+            (7, None),
+            (7, [DEVICE_DATA]),
+        ):
+            stream._handle_event(DeviceEvent(device_id, "x", data_types, {}))
+        await asyncio.sleep(0)
+        release.set()
+        while stream._refreshes:
+            await asyncio.sleep(0)
+
+        # One refresh running per device, the events received meanwhile merged
+        self.assertEqual(
+            [c.args for c in client.refresh_device.await_args_list],
+            [
+                (42, [DEVICE_DATA]),
+                (7, [DEVICE_DATA]),
+                (42, [DEVICE_DATA, DEVICE_RECORDS]),
+                (7, None),
+            ],
+        )
+
+    async def test_malformed_publish(self):
+        mqtt = MqttClient()
+        for header, body in (
+            (0x30, b"\x00"),  # No room for the topic length
+            (0x30, _string("t")[:2] + b"\xff\xfe"),  # Topic is not UTF-8
+            (0x32, _string("topic")),  # QoS 1 without packet ID
+        ):
+            with self.assertRaises(PetkitMqttError):
+                await mqtt._handle_publish(header, body)
+
+        self.assertEqual(decode_event(b'{"deviceId": 1e999}'), None)
+
+    async def test_malformed_publish_reconnects(self):
+        connections = 0
+
+        async def handle(reader, writer):
+            nonlocal connections
+            connections += 1
+            length = (await reader.readexactly(2))[1]
+            await reader.readexactly(length)
+            writer.write(bytes([0x20, 2, 0, 0]))  # CONNACK
+            length = (await reader.readexactly(2))[1]
+            packet_id = (await reader.readexactly(length))[:2]
+            writer.write(bytes([0x90, 3]) + packet_id + b"\x01")  # SUBACK
+            writer.write(bytes([0x30, 1, 0]))  # Truncated PUBLISH
+            await writer.drain()
+            await reader.read()
+
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        client = MagicMock()
+        client.get_iot_mqtt_config = AsyncMock(
+            return_value=IotInfo(**{**IOT_INFO, "mqttHost": f"127.0.0.1:{port}"})
+        )
+        stream = PetkitEventStream(client)
+
+        with patch("pypetkitapi.mqtt.MQTT_RECONNECT_MIN", 0.01):
+            await stream.start()
+            async with asyncio.timeout(5):
+                while connections < 2:
+                    await asyncio.sleep(0.01)
+        self.assertFalse(stream._task.done())
+
+        await stream.stop()
+        server.close()
+        await server.wait_closed()
+
+    async def test_cancellation_not_swallowed_by_timeout(self):
+        future = asyncio.get_running_loop().create_future()
+        task = asyncio.create_task(_wait(future, 10))
+        await asyncio.sleep(0)
+        # The read completes as the stream is stopped
+        future.set_result(None)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        with self.assertRaises(TimeoutError):
+            await _wait(asyncio.sleep(1), 0.01)
+
+
+class TestRefreshDevice(unittest.IsolatedAsyncioTestCase):
+
+    async def test_only_requested_data_types_are_fetched(self):
+        client = PetKitClient("user", "pwd", "DE", "Europe/Paris")
+        client.account_data = [
+            AccountData(
+                deviceList=[
+                    Device(
+                        createdAt=0,
+                        deviceId=42,
+                        deviceType="t4",
+                        groupId=1,
+                        type=0,
+                        uniqueId="u",
+                    )
+                ]
+            )
+        ]
+        client._fetch_device_data = AsyncMock()
+
+        self.assertTrue(await client.refresh_device(42, [DEVICE_RECORDS]))
+        self.assertFalse(await client.refresh_device(1))
+
+        self.assertEqual(
+            [c.args[1] for c in client._fetch_device_data.await_args_list],
+            [LitterRecord],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
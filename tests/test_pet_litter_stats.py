@@ -0,0 +1,142 @@
+"""Per-pet litter stats, from the records grouped by pet."""
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.containers import Device, Pet
+from pypetkitapi.litter_container import Litter, LitterRecord, PetOutGraph
+
+
+def _pet(pet_id: int, name: str) -> Pet:
+    return Pet(avatar="", createdAt=0, petId=pet_id, petName=name)
+
+
+def _litter(device_type: str) -> Litter:
+    litter = Litter(id=1, sn="SN0001", hardware=1, firmwareDetails=[])
+    litter.device_nfo = Device(
+        createdAt=0,
+        deviceId=1,
+        deviceName="litter",
+        deviceType=device_type,
+        groupId=1,
+        type=1,
+        typeCode=1,
+        uniqueId="u0001",
+    )
+    return litter
+
+
+def _record(pet_id: int | None, timestamp: int, weight: int, **kwargs) -> LitterRecord:
+    content = {"petWeight": weight, "timeIn": timestamp, "timeOut": timestamp + 30}
+    content.update(kwargs.pop("content", {}))
+    return LitterRecord(petId=pet_id, timestamp=timestamp, content=content, **kwargs)
+
+
+class TestPetLitterStats(unittest.IsolatedAsyncioTestCase):
+    """Per-pet litter stats derived from litter records."""
+
+    async def asyncSetUp(self) -> None:
+        self.client = PetKitClient.__new__(PetKitClient)
+        self.pet_a = _pet(101, "Pet A")
+        self.pet_b = _pet(102, "Pet B")
+        self.pet_c = _pet(103, "Pet C")
+        self.client.petkit_entities = {
+            101: self.pet_a,
+            102: self.pet_b,
+            103: self.pet_c,
+        }
+
+    async def test_no_camera_latest_record_of_each_pet(self) -> None:
+        litter = _litter("t4")
+        litter.device_records = [
+            _record(101, 1000, 4000),
+            _record(102, 1500, 5000),
+            _record(101, 2000, 4100),
+            _record(None, 3000, 6000),
+        ]
+
+        await self.client.populate_pet_stats(litter)
+
+        self.assertEqual(self.pet_a.last_litter_usage, 2000)
+        self.assertEqual(self.pet_a.last_measured_weight, 4100)
+        self.assertEqual(self.pet_a.last_duration_usage, 30)
+        self.assertEqual(self.pet_b.last_litter_usage, 1500)
+        self.assertEqual(self.pet_b.last_device_used, "Litter")
+        # The unattributed record is counted against nobody
+        self.assertEqual(self.pet_c.last_litter_usage, 0)
+        self.assertEqual(self.pet_c.last_device_used, "Unknown")
+
+    async def test_camera_records_joined_on_last_event(self) -> None:
+        litter = _litter("t6")
+        litter.device_pet_graph_out = [
+            PetOutGraph(petId=101, eventId="a1", time=1000, content={"petWeight": 1}),
+            PetOutGraph(petId=101, eventId="a2", time=2000, content={"petWeight": 2}),
+            PetOutGraph(petId=102, eventId="b1", time=1500, content={"petWeight": 3}),
+        ]
+        litter.device_records = [
+            _record(101, 1000, 1, eventId="a1", content={"petVoice": 0}),
+            _record(
+                101,
+                2000,
+                2,
+                eventId="a2",
+                content={"petVoice": 1},
+                subContent=[
+                    {
+                        "content": {
+                            "phState": 1,
+                            "detectionInfo": [{"ph": 6}, {"ph": 8}],
+                            "urineBolus": 1,
+                        }
+                    }
+                ],
+            ),
+            # Same event id, another pet: not joined
+            _record(102, 2500, 3, eventId="a2", content={"petVoice": 1}),
+        ]
+
+        await self.client.populate_pet_stats(litter)
+
+        self.assertEqual(self.pet_a.last_event_id, "a2")
+        self.assertEqual(self.pet_a.last_measured_weight, 2)
+        self.assertEqual(self.pet_a.yowling_detected, 1)
+        self.assertEqual(self.pet_a.abnormal_ph_detected, 1)
+        self.assertEqual(self.pet_a.measured_ph, 7)
+        self.assertEqual(self.pet_a.last_urination, 2000)
+        self.assertEqual(self.pet_b.last_event_id, "b1")
+        self.assertIsNone(self.pet_b.yowling_detected)
+
+    async def test_pets_read_once_per_poll(self) -> None:
+        litters = [_litter("t4"), _litter("t6")]
+        self.client.petkit_entities = {
+            101: self.pet_a,
+            1: litters[0],
+            2: litters[1],
+        }
+        self.client.get_pets_list = AsyncMock(return_value=[self.pet_a])
+
+        await self.client._execute_stats_tasks()
+
+        self.client.get_pets_list.assert_awaited_once()
+        self.assertEqual(self.pet_a.last_litter_usage, 0)
+
+    async def test_pets_read_once_per_pipeline_poll(self) -> None:
+        litters = [_litter("t4"), _litter("t4")]
+        self.client.petkit_entities = {101: self.pet_a, 1: litters[0], 2: litters[1]}
+        self.client.get_pets_list = AsyncMock(return_value=[self.pet_a])
+        self.client._device_semaphore = asyncio.Semaphore(2)
+        self.client._fetch_device_data = AsyncMock()
+        litters[1].device_nfo.device_id = 2
+        litters[0].device_records = [_record(101, 1000, 4000)]
+        devices = [litter.device_nfo for litter in litters]
+
+        await self.client._run_device_pipelines(devices, None)
+
+        self.client.get_pets_list.assert_awaited_once()
+        self.assertEqual(self.pet_a.last_litter_usage, 1000)
+
+
+if __name__ == "__main__":
+    unittest.main()
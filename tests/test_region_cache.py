@@ -0,0 +1,126 @@
+import json
+from pathlib import Path
+import tempfile
+import time
+import unittest
+from unittest.mock import AsyncMock, MagicMock
+
+from pypetkitapi.cache import REGION_CACHE_FILE, RegionServerCache
+from pypetkitapi.client import _refresh_region_servers
+from pypetkitapi.exceptions import PetkitTimeoutError
+
+EU_GATEWAY = "https://api.eu-pet.com/latest/"
+SAMPLE_PAYLOAD = {
+    "list": [
+        {"accountType": "1", "gateway": EU_GATEWAY, "id": "DE", "name": "Germany"},
+        {"accountType": "1", "gateway": EU_GATEWAY, "id": "FR", "name": "France"},
+    ]
+}
+ETAG = '"abc123"'
+
+
+class TestRegionServerCache(unittest.IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_find_by_id_and_name(self):
+        cache = RegionServerCache(None, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+
+        self.assertEqual(cache.find("fr").gateway, EU_GATEWAY)
+        self.assertEqual(cache.find("Germany").id, "DE")
+        self.assertIsNone(cache.find("zz"))
+        self.assertTrue(cache.is_fresh())
+
+    def test_stale_after_ttl(self):
+        cache = RegionServerCache(None, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+        cache.fetched_at = time.time() - 3601
+        self.assertFalse(cache.is_fresh())
+        cache.touch()
+        self.assertTrue(cache.is_fresh())
+
+    async def test_save_and_load(self):
+        cache = RegionServerCache(self.cache_dir, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+        await cache.save()
+
+        reloaded = RegionServerCache(self.cache_dir, 3600)
+        await reloaded.load()
+        self.assertEqual(reloaded.etag, ETAG)
+        self.assertTrue(reloaded.is_fresh())
+        self.assertEqual(reloaded.find("DE").gateway, EU_GATEWAY)
+
+    async def test_corrupted_file_is_ignored(self):
+        (self.cache_dir / REGION_CACHE_FILE).write_text("{not json")
+        cache = RegionServerCache(self.cache_dir, 3600)
+        await cache.load()
+        self.assertFalse(cache.is_fresh())
+        self.assertEqual(cache.entries, [])
+
+
+class TestRefreshRegionServers(unittest.IsolatedAsyncioTestCase):
+
+    def _req(self, **kwargs) -> MagicMock:
+        req = MagicMock()
+        req.request_if_none_match = AsyncMock(**kwargs)
+        return req
+
+    async def test_fresh_cache_skips_request(self):
+        cache = RegionServerCache(None, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+        req = self._req()
+
+        await _refresh_region_servers(req, cache)
+
+        req.request_if_none_match.assert_not_awaited()
+
+    async def test_stale_cache_revalidated_with_etag(self):
+        cache = RegionServerCache(None, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+        cache.fetched_at = 0
+        req = self._req(return_value=(None, ETAG))
+
+        await _refresh_region_servers(req, cache)
+
+        self.assertEqual(req.request_if_none_match.await_args.kwargs["etag"], ETAG)
+        self.assertTrue(cache.is_fresh())
+        self.assertEqual(cache.find("DE").gateway, EU_GATEWAY)
+
+    async def test_empty_cache_fetches_and_saves(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cache = RegionServerCache(tmp, 3600)
+            req = self._req(return_value=(SAMPLE_PAYLOAD, ETAG))
+
+            await _refresh_region_servers(req, cache)
+
+            self.assertIsNone(req.request_if_none_match.await_args.kwargs["etag"])
+            data = json.loads((Path(tmp) / REGION_CACHE_FILE).read_text())
+            self.assertEqual(data["etag"], ETAG)
+            self.assertEqual(len(data["list"]), 2)
+
+    async def test_network_error_keeps_stale_cache(self):
+        cache = RegionServerCache(None, 3600)
+        cache.update(SAMPLE_PAYLOAD, ETAG)
+        cache.fetched_at = 0
+        req = self._req(side_effect=PetkitTimeoutError("down"))
+
+        await _refresh_region_servers(req, cache)
+
+        self.assertEqual(cache.find("FR").gateway, EU_GATEWAY)
+
+    async def test_network_error_without_cache_raises(self):
+        cache = RegionServerCache(None, 3600)
+        req = self._req(side_effect=PetkitTimeoutError("down"))
+
+        with self.assertRaises(PetkitTimeoutError):
+            await _refresh_region_servers(req, cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
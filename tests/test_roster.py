@@ -0,0 +1,130 @@
+"""Roster refresh: device and pet list diffs on long-lived clients."""
+
+import asyncio
+import unittest
+from unittest.mock import AsyncMock
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.const import ROSTER_REFRESH_INTERVAL
+from pypetkitapi.containers import AccountData, Device, Pet
+from pypetkitapi.feeder_container import Feeder
+from pypetkitapi.roster import diff_roster
+
+
+def _device(device_id: int, name: str = "Device") -> Device:
+    return Device(
+        createdAt=0,
+        deviceId=device_id,
+        deviceName=name,
+        deviceType="d4",
+        groupId=1,
+        type=0,
+        uniqueId=str(device_id),
+    )
+
+
+def _pet(pet_id: int, name: str = "Pet") -> Pet:
+    return Pet(avatar="", createdAt=0, petId=pet_id, petName=name)
+
+
+def _account(devices: list[Device], pets: list[Pet]) -> AccountData:
+    return AccountData(groupId=1, deviceList=devices, petList=pets)
+
+
+class TestDiffRoster(unittest.TestCase):
+
+    def test_added_removed_changed(self):
+        old = [_account([_device(1), _device(2)], [_pet(10), _pet(11)])]
+        new = [_account([_device(2, "Renamed"), _device(3)], [_pet(10), _pet(12)])]
+
+        diff = diff_roster(old, new)
+
+        self.assertEqual([d.device_id for d in diff.added_devices], [3])
+        self.assertEqual([d.device_id for d in diff.removed_devices], [1])
+        self.assertEqual([d.device_id for d in diff.changed_devices], [2])
+        self.assertEqual([p.pet_id for p in diff.added_pets], [12])
+        self.assertEqual([p.pet_id for p in diff.removed_pets], [11])
+        self.assertEqual(diff.changed_pets, [])
+
+    def test_pet_stats_are_not_changes(self):
+        pet = _pet(10)
+        pet.last_litter_usage = 1700000000
+        diff = diff_roster([_account([], [pet])], [_account([], [_pet(10)])])
+        self.assertFalse(diff)
+
+
+class TestRefreshRoster(unittest.IsolatedAsyncioTestCase):
+
+    def _client(self, **kwargs) -> PetKitClient:
+        client = PetKitClient("user", "pwd", "DE", "Europe/Paris", **kwargs)
+        client.account_data = [_account([_device(1), _device(2)], [_pet(10)])]
+        client._register_pets()
+        client.petkit_entities[1] = Feeder(id=1, sn="1", firmware="1.0", hardware=1)
+        client.petkit_entities[1].device_nfo = _device(1)
+        client._get_pet_details = AsyncMock(return_value=[])
+        client._fetch_device_data = AsyncMock()
+        return client
+
+    async def test_refresh_applies_diff_and_notifies(self):
+        client = self._client()
+        pet = client.petkit_entities[10]
+        pet.last_litter_usage = 1700000000
+        client._fetch_account_data = AsyncMock(
+            return_value=[_account([_device(2), _device(3)], [_pet(10, "Renamed")])]
+        )
+        received = []
+        remove = client.add_roster_listener(received.append)
+
+        diff = await client.refresh_roster()
+
+        self.assertEqual(received, [diff])
+        self.assertNotIn(1, client.petkit_entities)
+        self.assertEqual([d.device_id for d in client._collect_devices()], [2, 3])
+        # The pet object is kept, with its stats, and renamed
+        self.assertIs(client.petkit_entities[10], pet)
+        self.assertEqual(pet.pet_name, "Renamed")
+        self.assertEqual(pet.device_nfo.device_name, "renamed")
+        self.assertEqual(pet.last_litter_usage, 1700000000)
+
+        remove()
+        client._fetch_account_data.return_value = [_account([], [])]
+        await client.refresh_roster()
+        self.assertEqual(len(received), 1)
+
+    async def test_unchanged_roster_does_not_notify(self):
+        client = self._client()
+        client._fetch_account_data = AsyncMock(
+            return_value=[_account([_device(1), _device(2)], [_pet(10)])]
+        )
+        listener = AsyncMock()
+        client.add_roster_listener(listener)
+
+        self.assertFalse(await client.refresh_roster())
+        listener.assert_not_called()
+
+    async def test_background_refresh_from_poll(self):
+        client = self._client(**{ROSTER_REFRESH_INTERVAL: 3600})
+        client._fetch_account_data = AsyncMock(
+            return_value=[_account([_device(1)], [_pet(10)])]
+        )
+
+        await client.get_devices_data()
+        await asyncio.sleep(0)
+        await client._roster_task
+        await client.get_devices_data()
+
+        client._fetch_account_data.assert_awaited_once()
+        self.assertEqual([d.device_id for d in client._collect_devices()], [1])
+
+    async def test_disabled_by_default(self):
+        client = self._client()
+        client._fetch_account_data = AsyncMock()
+
+        await client.get_devices_data()
+
+        self.assertIsNone(client._roster_task)
+        client._fetch_account_data.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
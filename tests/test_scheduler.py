@@ -0,0 +1,129 @@
+"""Adaptive polling: per data class intervals with backoff."""
+
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.command import DeviceCommand
+from pypetkitapi.const import ADAPTIVE_POLL, POLL_INTERVALS
+from pypetkitapi.containers import Device
+from pypetkitapi.feeder_container import Feeder, FeederRecord
+from pypetkitapi.purifier_container import Purifier
+from pypetkitapi.scheduler import PollScheduler
+
+DEVICE_ID = 42
+
+
+class TestPollScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = patch(
+            "pypetkitapi.scheduler.time.monotonic", side_effect=lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.scheduler = PollScheduler({"Purifier": (60, 200)})
+
+    def test_backoff_while_unchanged(self):
+        self.assertTrue(self.scheduler.is_due(DEVICE_ID, "Purifier"))
+        intervals = []
+        for _ in range(4):
+            self.scheduler.record(DEVICE_ID, "Purifier", {"mode": 1})
+            intervals.append(self.scheduler._states[(DEVICE_ID, "Purifier")].interval)
+        self.assertEqual(intervals, [60, 120, 200, 200])
+
+        self.now += 199
+        self.assertFalse(self.scheduler.is_due(DEVICE_ID, "Purifier"))
+        self.now += 1
+        self.assertTrue(self.scheduler.is_due(DEVICE_ID, "Purifier"))
+
+    def test_change_resets_interval(self):
+        for _ in range(3):
+            self.scheduler.record(DEVICE_ID, "Purifier", {"mode": 1})
+        self.scheduler.record(DEVICE_ID, "Purifier", {"mode": 2})
+        self.assertEqual(self.scheduler._states[(DEVICE_ID, "Purifier")].interval, 60)
+
+    def test_zero_min_interval_backs_off_from_start(self):
+        self.scheduler.record(DEVICE_ID, "Feeder", {"state": 1})
+        self.assertTrue(self.scheduler.is_due(DEVICE_ID, "Feeder"))
+        self.scheduler.record(DEVICE_ID, "Feeder", {"state": 1})
+        self.assertFalse(self.scheduler.is_due(DEVICE_ID, "Feeder"))
+
+    def test_unknown_data_class_always_due(self):
+        for _ in range(3):
+            self.scheduler.record(DEVICE_ID, "Unknown", {})
+        self.assertTrue(self.scheduler.is_due(DEVICE_ID, "Unknown"))
+
+    def test_mark_dirty(self):
+        self.scheduler.record(DEVICE_ID, "Purifier", {"mode": 1})
+        self.scheduler.record(7, "Purifier", {"mode": 1})
+
+        self.scheduler.mark_dirty(DEVICE_ID)
+
+        self.assertTrue(self.scheduler.is_due(DEVICE_ID, "Purifier"))
+        self.assertFalse(self.scheduler.is_due(7, "Purifier"))
+
+
+class TestClientAdaptivePoll(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.client = PetKitClient(
+            "user",
+            "pwd",
+            "DE",
+            "Europe/Paris",
+            **{ADAPTIVE_POLL: True, POLL_INTERVALS: {"Purifier": (60, 600)}},
+        )
+        self.client.get_session_id = AsyncMock(return_value={})
+        self.client.req.request = AsyncMock(
+            return_value={"id": DEVICE_ID, "sn": "sn", "name": "k2"}
+        )
+        self.device = Device(
+            createdAt=0,
+            deviceId=DEVICE_ID,
+            deviceType="k2",
+            groupId=1,
+            type=0,
+            uniqueId="u",
+        )
+
+    async def test_skips_data_class_not_due(self):
+        await self.client._fetch_device_data(self.device, Purifier)
+        await self.client._fetch_device_data(self.device, Purifier)
+
+        self.client.req.request.assert_awaited_once()
+        self.assertIsInstance(self.client.petkit_entities[DEVICE_ID], Purifier)
+
+    async def test_command_makes_device_due(self):
+        await self.client._fetch_device_data(self.device, Purifier)
+
+        await self.client.send_api_request(
+            DEVICE_ID, DeviceCommand.UPDATE_SETTING, {"lightMode": 1}
+        )
+        await self.client._fetch_device_data(self.device, Purifier)
+
+        self.assertEqual(self.client.req.request.await_count, 3)
+
+    async def test_skipped_records_kept_when_data_refreshed(self):
+        feeder = Device(
+            createdAt=0, deviceId=7, deviceType="d4", groupId=1, type=0, uniqueId="f"
+        )
+        payload = {"id": 7, "sn": "sn", "name": "d4", "firmware": "1", "hardware": 1}
+        self.client.req.request.return_value = payload
+        await self.client._fetch_device_data(feeder, Feeder)
+        records = FeederRecord(feed=[])
+        self.client.petkit_entities[7].device_records = records
+
+        self.client.poll_scheduler.mark_dirty(7)
+        await self.client._fetch_device_data(feeder, Feeder)
+
+        self.assertIs(self.client.petkit_entities[7].device_records, records)
+
+    async def test_disabled_by_default(self):
+        client = PetKitClient("user", "pwd", "DE", "Europe/Paris")
+        self.assertIsNone(client.poll_scheduler)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,149 @@
+"""Session validation, single-flight login and proactive refresh."""
+
+import asyncio
+from datetime import datetime, timedelta, timezone
+import time
+import unittest
+from unittest.mock import AsyncMock
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.const import SESSION_REFRESH_RATIO
+from pypetkitapi.containers import SessionInfo
+from pypetkitapi.exceptions import PypetkitError
+
+EXPIRES_IN = 604800
+
+
+def _session(session_id: str, age: timedelta) -> SessionInfo:
+    created = datetime.now(tz=timezone.utc) - age
+    return SessionInfo(
+        id=session_id,
+        userId="1",
+        expiresIn=EXPIRES_IN,
+        createdAt=created.strftime("%Y-%m-%dT%H:%M:%S.%f") + "+0000",
+    )
+
+
+class TestSessionInfoDeadlines(unittest.TestCase):
+
+    def test_deadline_from_created_at(self):
+        session = _session("s", timedelta(seconds=100))
+        remaining = session.expires_at - time.monotonic()
+        self.assertAlmostEqual(remaining, EXPIRES_IN - 100, delta=2)
+        self.assertFalse(session.is_expired())
+
+    def test_expired(self):
+        session = _session("s", timedelta(seconds=EXPIRES_IN + 5))
+        self.assertTrue(session.is_expired())
+
+    def test_mark_refreshed_restarts_lifetime(self):
+        session = _session("s", timedelta(seconds=EXPIRES_IN + 5))
+        session.mark_refreshed()
+        self.assertFalse(session.is_expired())
+        self.assertIsNotNone(session.refreshed_at)
+        self.assertAlmostEqual(
+            session.refresh_at(0.5) - time.monotonic(), EXPIRES_IN / 2, delta=2
+        )
+
+    def test_refreshed_at_survives_reload(self):
+        session = _session("s", timedelta(seconds=EXPIRES_IN + 5))
+        session.mark_refreshed()
+        reloaded = SessionInfo(**session.model_dump(by_alias=True))
+        self.assertFalse(reloaded.is_expired())
+
+    def test_other_date_formats(self):
+        created = datetime.now(tz=timezone.utc) - timedelta(seconds=100)
+        for created_at in (
+            created.isoformat(),
+            str(int(created.timestamp())),
+            str(int(created.timestamp() * 1000)),
+        ):
+            session = SessionInfo(
+                id="s", userId="1", expiresIn=EXPIRES_IN, createdAt=created_at
+            )
+            remaining = session.expires_at - time.monotonic()
+            self.assertAlmostEqual(remaining, EXPIRES_IN - 100, delta=2)
+
+    def test_unparsable_date_counts_from_reception(self):
+        SessionInfo._date_warned = False
+        with self.assertLogs("pypetkitapi.containers", "WARNING") as logs:
+            for _ in range(2):
+                session = SessionInfo(
+                    id="s", userId="1", expiresIn=EXPIRES_IN, createdAt="not a date"
+                )
+        self.assertEqual(len(logs.records), 1)
+        self.assertFalse(session.is_expired())
+        remaining = session.expires_at - time.monotonic()
+        self.assertAlmostEqual(remaining, EXPIRES_IN, delta=2)
+
+
+class TestSession(unittest.IsolatedAsyncioTestCase):
+
+    def _client(self, **kwargs) -> PetKitClient:
+        client = PetKitClient("user", "pwd", "DE", "Europe/Paris", **kwargs)
+
+        async def fake_login(valid_code=None):
+            await asyncio.sleep(0.01)
+            client._session = _session("fresh", timedelta())
+
+        client._login = AsyncMock(side_effect=fake_login)
+        return client
+
+    async def test_concurrent_callers_share_one_login(self):
+        client = self._client()
+
+        results = await asyncio.gather(*(client.get_session_id() for _ in range(10)))
+
+        client._login.assert_awaited_once()
+        self.assertTrue(all(r["X-Session"] == "fresh" for r in results))
+
+    async def test_expired_session_logs_in_once(self):
+        client = self._client()
+        client._session = _session("old", timedelta(seconds=EXPIRES_IN + 1))
+
+        await asyncio.gather(*(client.get_session_id() for _ in range(5)))
+
+        client._login.assert_awaited_once()
+
+    async def test_valid_session_no_login(self):
+        client = self._client()
+        client._session = _session("current", timedelta(hours=1))
+
+        headers = await client.get_session_id()
+
+        self.assertEqual(headers["F-Session"], "current")
+        client._login.assert_not_awaited()
+
+    async def test_proactive_refresh_in_background(self):
+        client = self._client(**{SESSION_REFRESH_RATIO: 0.5})
+        client._session = _session("aging", timedelta(seconds=EXPIRES_IN * 0.6))
+        refreshed = asyncio.Event()
+
+        async def fake_refresh():
+            client._session = _session("refreshed", timedelta())
+            refreshed.set()
+
+        client._refresh_session = AsyncMock(side_effect=fake_refresh)
+
+        headers = await asyncio.gather(*(client.get_session_id() for _ in range(5)))
+
+        # Callers are not delayed by the refresh and keep the still valid token
+        self.assertTrue(all(h["X-Session"] == "aging" for h in headers))
+        await asyncio.wait_for(refreshed.wait(), 1)
+        client._refresh_session.assert_awaited_once()
+        self.assertEqual((await client.get_session_id())["X-Session"], "refreshed")
+
+    async def test_failed_refresh_is_not_retried_immediately(self):
+        client = self._client(**{SESSION_REFRESH_RATIO: 0.5})
+        client._session = _session("aging", timedelta(seconds=EXPIRES_IN * 0.6))
+        client._refresh_session = AsyncMock(side_effect=PypetkitError("boom"))
+
+        await client.get_session_id()
+        await client._refresh_task
+        await client.get_session_id()
+
+        client._refresh_session.assert_awaited_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
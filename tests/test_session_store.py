@@ -0,0 +1,131 @@
+"""Session persistence and warm start across process restarts."""
+
+from datetime import datetime, timedelta, timezone
+import os
+from pathlib import Path
+import stat
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+
+from pypetkitapi.client import PetKitClient
+from pypetkitapi.const import SESSION_STORE
+from pypetkitapi.containers import AccountData, SessionInfo
+from pypetkitapi.session_store import CallbackSessionStore, FileSessionStore
+
+GATEWAY = "https://api.eu-pet.com/latest/"
+PET_ID = 101401310
+DEVICE_ID = 300035322
+ACCOUNT = {
+    "groupId": 1,
+    "deviceList": [
+        {
+            "createdAt": 0,
+            "deviceId": DEVICE_ID,
+            "deviceName": "Feeder",
+            "deviceType": "d4",
+            "groupId": 1,
+            "type": 0,
+            "uniqueId": "u0001",
+        }
+    ],
+    "petList": [
+        {"avatar": "", "createdAt": 0, "petId": PET_ID, "petName": "Pet A"},
+    ],
+}
+
+
+def _session(age: timedelta) -> SessionInfo:
+    created = datetime.now(tz=timezone.utc) - age
+    return SessionInfo(
+        id="stored-token",
+        userId="1",
+        expiresIn=604800,
+        createdAt=created.strftime("%Y-%m-%dT%H:%M:%S.%f") + "+0000",
+    )
+
+
+class TestFileSessionStore(unittest.IsolatedAsyncioTestCase):
+
+    async def test_roundtrip_owner_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "sub" / "session.json"
+            store = FileSessionStore(path)
+            self.assertIsNone(await store.load())
+
+            await store.save({"a": 1})
+
+            self.assertEqual(await store.load(), {"a": 1})
+            if os.name == "posix":
+                self.assertEqual(stat.S_IMODE(path.stat().st_mode), 0o600)
+
+    async def test_unreadable_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / "session.json"
+            path.write_text("{broken")
+            self.assertIsNone(await FileSessionStore(path).load())
+
+
+class TestWarmStart(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        self.saved: dict | None = None
+
+        async def load():
+            return self.saved
+
+        async def save(data):
+            self.saved = data
+
+        self.store = CallbackSessionStore(load, save)
+
+    def _client(self, username: str = "user") -> PetKitClient:
+        client = PetKitClient(
+            username, "pwd", "DE", "Europe/Paris", **{SESSION_STORE: self.store}
+        )
+        client._login = AsyncMock()
+        client._fetch_device_data = AsyncMock()
+        return client
+
+    async def _save_from_previous_run(self, age: timedelta = timedelta(hours=1)):
+        previous = self._client()
+        previous._session = _session(age)
+        previous.req.base_url = GATEWAY
+        previous.account_data = [AccountData(**ACCOUNT)]
+        await previous._save_session_state()
+
+    async def test_warm_start_skips_login_and_account_data(self):
+        await self._save_from_previous_run()
+        client = self._client()
+        client._get_account_data = AsyncMock()
+
+        await client.get_devices_data()
+
+        client._login.assert_not_awaited()
+        client._get_account_data.assert_not_awaited()
+        self.assertEqual(client.req.base_url, GATEWAY)
+        self.assertEqual((await client.get_session_id())["X-Session"], "stored-token")
+        self.assertIn(PET_ID, client.petkit_entities)
+        self.assertEqual(client.petkit_entities[PET_ID].device_nfo.device_type, "pet")
+        client._fetch_device_data.assert_awaited()
+
+    async def test_expired_stored_session_is_ignored(self):
+        await self._save_from_previous_run(age=timedelta(days=8))
+        client = self._client()
+
+        await client.validate_session()
+
+        client._login.assert_awaited_once()
+
+    async def test_other_account_is_ignored(self):
+        await self._save_from_previous_run()
+        client = self._client(username="someone-else")
+
+        await client.validate_session()
+
+        client._login.assert_awaited_once()
+        self.assertEqual(client.account_data, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
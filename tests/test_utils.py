@@ -1,12 +1,21 @@
+from datetime import datetime, timezone
 import unittest
 from unittest.mock import patch
 from zoneinfo import ZoneInfoNotFoundError
 
-from pypetkitapi.utils import get_timezone_offset
+from pypetkitapi import utils
+from pypetkitapi.utils import _compute_timezone_offset, get_timezone_offset
+
+# 2026-03-29 00:00 UTC, one hour before the spring DST change in Europe
+BEFORE_DST_TS = int(datetime(2026, 3, 29, tzinfo=timezone.utc).timestamp())
+DST_TS = int(datetime(2026, 3, 29, 1, tzinfo=timezone.utc).timestamp())
 
 
 class TestUtils(unittest.IsolatedAsyncioTestCase):
 
+    def setUp(self):
+        utils._TZ_OFFSET_CACHE.clear()
+
     @patch("pypetkitapi.utils.ZoneInfo")
     @patch("pypetkitapi.utils.datetime")
     async def test_get_timezone_offset_valid(self, mock_datetime, mock_zoneinfo):
@@ -46,6 +55,35 @@ class TestUtils(unittest.IsolatedAsyncioTestCase):
         offset = await get_timezone_offset("MockedZone")
         self.assertEqual(offset, "0.0")
 
+    def test_offset_valid_until_next_dst_transition(self):
+        offset, valid_until = _compute_timezone_offset("Europe/Paris", BEFORE_DST_TS)
+        self.assertEqual(offset, "1.0")
+        self.assertEqual(valid_until, DST_TS)
+
+        offset, _ = _compute_timezone_offset("Europe/Paris", DST_TS)
+        self.assertEqual(offset, "2.0")
+
+    def test_offset_without_dst(self):
+        offset, valid_until = _compute_timezone_offset("Asia/Tokyo", BEFORE_DST_TS)
+        self.assertEqual(offset, "9.0")
+        # No transition: checked again in about a year
+        self.assertGreater(valid_until, BEFORE_DST_TS + 365 * 86400)
+
+    async def test_offset_is_cached(self):
+        with patch(
+            "pypetkitapi.utils._compute_timezone_offset", return_value=("1.0", 2e9)
+        ) as mock_compute, patch("pypetkitapi.utils.time.time", return_value=1e9):
+            self.assertEqual(await get_timezone_offset("Europe/Paris"), "1.0")
+            self.assertEqual(await get_timezone_offset("Europe/Paris"), "1.0")
+        mock_compute.assert_called_once()
+
+    async def test_cache_expires_at_transition(self):
+        utils._TZ_OFFSET_CACHE["Europe/Paris"] = ("1.0", 1e9)
+        with patch(
+            "pypetkitapi.utils._compute_timezone_offset", return_value=("2.0", 2e9)
+        ), patch("pypetkitapi.utils.time.time", return_value=1e9):
+            self.assertEqual(await get_timezone_offset("Europe/Paris"), "2.0")
+
 
 if __name__ == "__main__":
     unittest.main()